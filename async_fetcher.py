@@ -0,0 +1,85 @@
+import asyncio
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Dict, Mapping, Optional
+import aiohttp
+from rate_limit import TokenBucket
+
+# Responses worth another attempt, everything else is returned to the caller as is
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+@dataclass
+class FetchResult:
+    status_code: int
+    headers: Mapping[str, str]
+    text: str
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Retry-After is either a number of seconds or an HTTP date."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+class AsyncFetcher:
+    """
+    aiohttp client that limits requests to a token bucket rate and at most `concurrency` requests in flight.
+    Failed requests are retried with exponential backoff (or the server's Retry-After) without holding a
+    concurrency slot while waiting.
+    """
+    def __init__(self, concurrency: int, rate_limiter: TokenBucket, timeout: float, retries: int = 3,
+                 delay: float = 2, backoff: float = 2, headers: Optional[Dict[str, str]] = None):
+        self.concurrency = concurrency
+        self.rate_limiter = rate_limiter
+        self.timeout = timeout
+        self.retries = retries
+        self.delay = delay
+        self.backoff = backoff
+        self.headers = {'Accept-Encoding': 'gzip, deflate', **(headers or {})}
+        self.logger = logging.getLogger('openinsider')
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    async def __aenter__(self) -> "AsyncFetcher":
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        self._session = aiohttp.ClientSession(
+            headers=self.headers,
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+            connector=aiohttp.TCPConnector(limit=self.concurrency),
+        )
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self._session.close()
+
+    async def get(self, url: str, headers: Optional[Dict[str, str]] = None) -> FetchResult:
+        delay = self.delay
+        retries = max(1, self.retries)
+        for attempt in range(1, retries + 1):
+            await self.rate_limiter.acquire_async()
+            try:
+                async with self._semaphore:
+                    async with self._session.get(url, headers=headers) as response:
+                        if response.status not in RETRY_STATUSES or attempt == retries:
+                            return FetchResult(response.status, response.headers, await response.text())
+                        wait = parse_retry_after(response.headers.get('Retry-After'))
+                        wait = delay if wait is None else wait
+                        self.logger.warning(f"HTTP {response.status} for {url}, retrying in {wait:.1f}s")
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if attempt == retries:
+                    raise
+                wait = delay
+                self.logger.warning(f"{type(e).__name__} for {url}, retrying in {wait:.1f}s")
+            await asyncio.sleep(wait)
+            delay *= self.backoff
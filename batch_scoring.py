@@ -0,0 +1,68 @@
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, Iterator, Optional
+
+@dataclass
+class ScoreResult:
+    ticker: str
+    score: Optional[float]
+    result: dict = field(default_factory=dict)
+    error: Optional[str] = None
+    seconds: float = 0.0
+
+def _run(score_fn: Callable[[str], dict], ticker: str, future: Future) -> None:
+    try:
+        future.set_result(score_fn(ticker))
+    except BaseException as e:
+        future.set_exception(e)
+
+def _to_result(ticker: str, future: Future, seconds: float) -> ScoreResult:
+    try:
+        result = future.result()
+    except Exception as e:
+        return ScoreResult(ticker, None, error=f"{type(e).__name__}: {e}", seconds=seconds)
+    if result.get("error") is not None or result.get("score") is None:
+        return ScoreResult(ticker, None, result, error=str(result.get("error", "no score")), seconds=seconds)
+    return ScoreResult(ticker, result["score"], result, seconds=seconds)
+
+def score_batch(tickers: Iterable[str], score_fn: Callable[[str], dict], max_workers: int = 8,
+                timeout: Optional[float] = 60) -> Iterator[ScoreResult]:
+    """
+    Score tickers concurrently and yield every result as soon as it is available, in completion order.
+    At most max_workers tickers are scored at a time. A ticker that raises or reports an error yields a
+    result with error set instead of stopping the batch. A ticker still running after timeout seconds
+    yields a timeout error and frees its slot; its thread is left to finish in the background and its
+    late result is dropped. Request rates are limited where the requests are made, in the fundamentals store.
+    """
+    pending = iter(dict.fromkeys(tickers))
+    running: Dict[Future, tuple] = {}
+    exhausted = False
+
+    while running or not exhausted:
+        while not exhausted and len(running) < max_workers:
+            ticker = next(pending, None)
+            if ticker is None:
+                exhausted = True
+                break
+            future = Future()
+            threading.Thread(target=_run, args=(score_fn, ticker, future), daemon=True).start()
+            running[future] = (ticker, time.monotonic())
+        if not running:
+            break
+
+        wait_for = None
+        if timeout is not None:
+            wait_for = max(0.0, min(started for _, started in running.values()) + timeout - time.monotonic())
+        done, _ = wait(running, timeout=wait_for, return_when=FIRST_COMPLETED)
+
+        now = time.monotonic()
+        for future in done:
+            ticker, started = running.pop(future)
+            yield _to_result(ticker, future, now - started)
+        if timeout is not None:
+            for future, (ticker, started) in list(running.items()):
+                if now - started >= timeout:
+                    del running[future]
+                    yield ScoreResult(ticker, None, error=f"Timed out after {timeout}s", seconds=now - started)
@@ -0,0 +1,79 @@
+import json
+import platform
+import statistics
+import subprocess
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+RESULTS_DIR = Path(__file__).parent / "results"
+
+@dataclass
+class BenchmarkResult:
+    name: str
+    size: Optional[int]
+    seconds: List[float]
+    items: Optional[int] = None
+    params: Dict[str, object] = field(default_factory=dict)
+
+    @property
+    def best(self) -> float:
+        return min(self.seconds)
+
+    @property
+    def median(self) -> float:
+        return statistics.median(self.seconds)
+
+    def describe(self) -> str:
+        size = f"[{self.size:,}]" if self.size is not None else ""
+        rate = f"  {self.items / self.best:,.0f}/s" if self.items else ""
+        return f"{self.name + size:<45} best {self.best:9.4f}s  median {self.median:9.4f}s{rate}"
+
+def measure(fn: Callable[[], object], repeat: int = 5, setup: Optional[Callable[[], None]] = None) -> List[float]:
+    """Wall clock seconds of repeat calls of fn, setup runs untimed before every call."""
+    seconds = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        started = time.perf_counter()
+        fn()
+        seconds.append(time.perf_counter() - started)
+    return seconds
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def save_results(results: List[BenchmarkResult], path: Optional[Path] = None) -> Path:
+    """Write the results with the revision and machine they were measured on, so runs can be compared later."""
+    revision = _git_revision()
+    if path is None:
+        RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+        path = RESULTS_DIR / f"{time.strftime('%Y%m%dT%H%M%S')}-{revision or 'unknown'}.json"
+    payload = {
+        'revision': revision,
+        'created_at': time.time(),
+        'machine': {'python': platform.python_version(), 'platform': platform.platform(), 'processor': platform.processor()},
+        'results': [asdict(result) for result in results],
+    }
+    with open(path, 'w') as f:
+        json.dump(payload, f, indent=1, default=str)
+    return path
+
+def compare(results: List[BenchmarkResult], baseline_path: str, threshold: float = 1.1) -> List[str]:
+    """Lines comparing the best times with a saved run, flagging everything slower than threshold x the baseline."""
+    with open(baseline_path, 'r') as f:
+        baseline = {(result['name'], result['size']): min(result['seconds']) for result in json.load(f)['results']}
+    lines = []
+    for result in results:
+        before = baseline.get((result.name, result.size))
+        if before is None:
+            continue
+        ratio = result.best / before if before > 0 else float('inf')
+        flag = "  REGRESSION" if ratio > threshold else ""
+        size = f"[{result.size:,}]" if result.size is not None else ""
+        lines.append(f"{result.name + size:<45} {before:9.4f}s -> {result.best:9.4f}s  x{ratio:5.2f}{flag}")
+    return lines
@@ -0,0 +1,48 @@
+"""
+Copy screener pages from the raw response cache into benchmarks/fixtures/pages, so the parse benchmarks run
+on real pages. Without recorded pages they fall back to pages rendered by benchmarks.synthetic.
+
+    python -m benchmarks.record_fixtures --count 20
+"""
+import argparse
+import gzip
+from pathlib import Path
+from typing import List
+import yaml
+from raw_cache import RawResponseCache
+
+FIXTURE_DIR = Path(__file__).parent / "fixtures" / "pages"
+
+def record_fixtures(cache_dir: str, count: int) -> int:
+    cache = RawResponseCache(cache_dir, float('inf'))
+    FIXTURE_DIR.mkdir(parents=True, exist_ok=True)
+    # the largest pages first, they are the ones that matter for parse time
+    entries = sorted(cache.entries(), key=lambda entry: entry.get('size', 0), reverse=True)
+    recorded = 0
+    for entry in entries:
+        if recorded >= count:
+            break
+        page = cache.get(entry['url'])
+        if page is None:
+            continue
+        with gzip.open(FIXTURE_DIR / f"page_{recorded:03d}.html.gz", 'wt', encoding='utf-8') as f:
+            f.write(page)
+        recorded += 1
+    return recorded
+
+def load_fixture_pages() -> List[str]:
+    pages = []
+    for path in sorted(FIXTURE_DIR.glob("*.html.gz")):
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            pages.append(f.read())
+    return pages
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Record screener pages from the raw response cache as benchmark fixtures")
+    parser.add_argument("--config", default="config.yaml")
+    parser.add_argument("--count", type=int, default=20)
+    args = parser.parse_args()
+    with open(args.config, 'r') as f:
+        config = yaml.safe_load(f)
+    recorded = record_fixtures(str(Path(config['cache']['directory']) / "raw"), args.count)
+    print(f"Recorded {recorded} pages to {FIXTURE_DIR}")
@@ -0,0 +1,184 @@
+"""
+Offline benchmarks of the hot paths, run from the repository root:
+
+    python -m benchmarks.run                          # everything at 100k bronze rows
+    python -m benchmarks.run --sizes 100k 1m 10m      # scaling curve
+    python -m benchmarks.run --only parse clean       # some groups
+    python -m benchmarks.run --compare benchmarks/results/<earlier run>.json
+
+Every run is saved to benchmarks/results/ with the git revision, --compare flags what got slower.
+"""
+import argparse
+import hashlib
+import shutil
+import sqlite3
+import tempfile
+from pathlib import Path
+from typing import Callable, List
+import pandas as pd
+import cleaner
+import scorer
+from benchmarks.harness import BenchmarkResult, compare, measure, save_results
+from benchmarks.record_fixtures import load_fixture_pages
+from benchmarks.synthetic import FIELD_NAMES, generate_bronze_rows, screener_page, write_bronze
+from fundamentals import FundamentalsProvider, FundamentalsStore
+from parse_worker import PageFilters, parse_page
+from scorer2 import score_stock
+from scoring_engine import model, score_metrics
+from screener_parser import lxml_html, parse_rows
+from screener_transform import clean_batch, filter_mask
+from signal_engine import cluster_buy_signals, load_purchases
+
+GROUPS = ["parse", "clean", "bronze", "gold", "signals", "scoring"]
+SIZES = {"100k": 100_000, "1m": 1_000_000, "10m": 10_000_000}
+# A typical filter setup: purchases above $10k
+FILTERS = PageFilters(min_transaction_value=10_000, transaction_types=("P",), exclude_companies=(),
+                      include_companies=(), min_shares_traded=0)
+
+def _pages() -> List[str]:
+    """Recorded screener pages, or 10 synthetic pages of 1000 rows when none were recorded."""
+    pages = load_fixture_pages()
+    if pages:
+        return pages
+    rows = next(generate_bronze_rows(10_000, seed=1, chunk_size=10_000))
+    return [screener_page(rows[start:start + 1000]) for start in range(0, len(rows), 1000)]
+
+def bench_parse(results: List[BenchmarkResult], repeat: int) -> None:
+    pages = _pages()
+    n_rows = sum(len(parse_rows(page, len(FIELD_NAMES))) for page in pages)
+    backends = ["lxml", "bs4"] if lxml_html is not None else ["bs4"]
+    for backend in backends:
+        results.append(BenchmarkResult(f"parse_rows.{backend}", None, measure(
+            lambda: [parse_rows(page, len(FIELD_NAMES), backend) for page in pages], repeat), n_rows))
+    # What a parse worker does per page: parse, clean and filter
+    encoded = [page.encode('utf-8') for page in pages]
+    results.append(BenchmarkResult("parse_worker.parse_page", None, measure(
+        lambda: [parse_page(page, tuple(FIELD_NAMES), "auto", FILTERS) for page in encoded], repeat), n_rows))
+
+def bench_clean(results: List[BenchmarkResult], repeat: int) -> None:
+    rows = [row for page in _pages() for row in parse_rows(page, len(FIELD_NAMES))]
+    results.append(BenchmarkResult("clean_batch", None, measure(lambda: clean_batch(rows, FIELD_NAMES), repeat), len(rows)))
+    batch = clean_batch(rows, FIELD_NAMES)
+    results.append(BenchmarkResult("filter_mask", None, measure(lambda: filter_mask(batch, FILTERS), repeat), len(rows)))
+
+def bench_bronze(results: List[BenchmarkResult], size: int, db_file: Path) -> None:
+    # Loads the bronze table the other groups of this size run on
+    results.append(BenchmarkResult("bronze.write_many", size, measure(lambda: write_bronze(str(db_file), size), 1), size))
+
+def bench_gold(results: List[BenchmarkResult], size: int, db_file: Path, repeat: int) -> None:
+    with sqlite3.connect(db_file) as conn:
+        results.append(BenchmarkResult("gold.full_rebuild", size, measure(
+            lambda: cleaner.update_gold(conn, True, [30]), repeat), size))
+        results.append(BenchmarkResult("gold.no_new_rows", size, measure(
+            lambda: cleaner.update_gold(conn, False, [30]), repeat), size))
+
+def bench_signals(results: List[BenchmarkResult], size: int, db_file: Path, repeat: int, sql_max_rows: int) -> None:
+    with sqlite3.connect(db_file) as conn:
+        results.append(BenchmarkResult("signals.stats_query", size, measure(
+            lambda: conn.execute(scorer.create_stats_query()).fetchall(), repeat)))
+        results.append(BenchmarkResult("signals.engine", size, measure(
+            lambda: cluster_buy_signals(load_purchases(conn)), repeat)))
+        # The correlated subqueries grow with the square of the purchases per company
+        if size <= sql_max_rows:
+            main_sql = (Path(__file__).parent.parent / "main.sql").read_text()
+            results.append(BenchmarkResult("signals.create_sql_query", size, measure(
+                lambda: conn.execute(scorer.create_sql_query()).fetchall(), 1)))
+            results.append(BenchmarkResult("signals.main_sql", size, measure(
+                lambda: conn.execute(main_sql).fetchall(), 1)))
+
+class StubProvider(FundamentalsProvider):
+    """Deterministic fundamentals derived from the ticker, no network."""
+    def fetch(self, ticker: str, dataset: str):
+        if dataset != "info":
+            return pd.DataFrame()
+        seed = int(hashlib.md5(ticker.encode()).hexdigest(), 16)
+        value = lambda shift, scale, offset=0.0: ((seed >> shift) % 1000) / 1000 * scale + offset
+        return {
+            "grossMargins": value(0, 0.8), "operatingMargins": value(10, 0.6, -0.1), "profitMargins": value(20, 0.5, -0.1),
+            "returnOnEquity": value(30, 0.6, -0.1), "returnOnAssets": value(40, 0.3, -0.05), "revenueGrowth": value(50, 0.6, -0.2),
+            "earningsQuarterlyGrowth": value(60, 0.8, -0.3), "debtToEquity": value(70, 300), "currentRatio": value(80, 4),
+            "trailingPE": value(90, 80, -10), "priceToBook": value(100, 15),
+        }
+
+def bench_scoring(results: List[BenchmarkResult], repeat: int, workdir: Path) -> None:
+    tickers = [f"T{i:04d}" for i in range(200)]
+    # Cold: every ticker goes through the provider and is written to the cache, warm: read from the cache only
+    cold = FundamentalsStore(StubProvider(), str(workdir / "cold.db"), {"info": 0})
+    results.append(BenchmarkResult("score_stock.cold_cache", None, measure(
+        lambda: [score_stock(ticker, cold) for ticker in tickers], repeat), len(tickers)))
+    warm = FundamentalsStore(StubProvider(), str(workdir / "warm.db"), {"info": 24})
+    for ticker in tickers:
+        score_stock(ticker, warm)
+    results.append(BenchmarkResult("score_stock.warm_cache", None, measure(
+        lambda: [score_stock(ticker, warm) for ticker in tickers], repeat), len(tickers)))
+    cold.close()
+    warm.close()
+
+    # The rule model alone on a metrics table of 10k tickers
+    provider = StubProvider()
+    metrics = pd.DataFrame([provider.fetch(f"T{i:05d}", "info") for i in range(10_000)]).rename(columns={
+        "grossMargins": "gross_margin", "operatingMargins": "operating_margin", "profitMargins": "net_margin",
+        "returnOnEquity": "roe", "returnOnAssets": "roa", "revenueGrowth": "revenue_growth",
+        "earningsQuarterlyGrowth": "eps_growth", "debtToEquity": "de_ratio", "currentRatio": "current_ratio",
+        "trailingPE": "pe_ratio", "priceToBook": "pb_ratio",
+    })
+    results.append(BenchmarkResult("score_metrics.fundamentals", None, measure(
+        lambda: score_metrics(metrics, model("fundamentals")), repeat), len(metrics)))
+
+def run(groups: List[str], sizes: List[int], repeat: int, sql_max_rows: int, workdir: Path) -> List[BenchmarkResult]:
+    results: List[BenchmarkResult] = []
+
+    def report(run_group: Callable[[], None]) -> None:
+        already = len(results)
+        run_group()
+        for result in results[already:]:
+            print(result.describe())
+
+    if "parse" in groups:
+        report(lambda: bench_parse(results, repeat))
+    if "clean" in groups:
+        report(lambda: bench_clean(results, repeat))
+    if "scoring" in groups:
+        report(lambda: bench_scoring(results, repeat, workdir))
+
+    # The database groups run on one synthetic bronze table per size, large sizes are only repeated once.
+    # A group that wasn't asked for still builds the tables the later ones read, untimed and unreported.
+    for size in sizes if {"bronze", "gold", "signals"} & set(groups) else []:
+        db_file = workdir / f"bronze_{size}.db"
+        size_repeat = repeat if size <= 100_000 else 1
+        if "bronze" in groups:
+            report(lambda: bench_bronze(results, size, db_file))
+        else:
+            write_bronze(str(db_file), size)
+        if "gold" in groups:
+            report(lambda: bench_gold(results, size, db_file, size_repeat))
+        elif "signals" in groups:
+            with sqlite3.connect(db_file) as conn:
+                cleaner.update_gold(conn, True, [30])
+        if "signals" in groups:
+            report(lambda: bench_signals(results, size, db_file, size_repeat, sql_max_rows))
+        db_file.unlink()
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the offline benchmarks")
+    parser.add_argument("--only", nargs="*", choices=GROUPS, default=GROUPS)
+    parser.add_argument("--sizes", nargs="*", choices=list(SIZES), default=["100k"], help="Synthetic bronze sizes for the database groups")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--sql-max-rows", type=int, default=100_000, help="Largest size the legacy SQL signal queries run at")
+    parser.add_argument("--workdir", help="Where the synthetic databases go, a temporary directory by default")
+    parser.add_argument("--compare", help="Results file of an earlier run to compare with")
+    parser.add_argument("--no-save", action="store_true")
+    args = parser.parse_args()
+
+    workdir = Path(args.workdir) if args.workdir else Path(tempfile.mkdtemp(prefix="openinsider-bench-"))
+    workdir.mkdir(parents=True, exist_ok=True)
+    try:
+        results = run(args.only, [SIZES[size] for size in args.sizes], args.repeat, args.sql_max_rows, workdir)
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+    if not args.no_save:
+        print(f"Saved to {save_results(results)}")
+    if args.compare:
+        print("\n".join(compare(results, args.compare)))
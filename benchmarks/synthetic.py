@@ -0,0 +1,144 @@
+"""
+Synthetic transactions_bronze data for the benchmarks.
+
+Rows look like what the scraper stores: a few heavily traded tickers and a long tail (Zipf), a small pool
+of insiders per company who each keep one title (directors and 10% owners dominate, CEOs and CFOs are
+rarer), mostly sales with about a fifth purchases, log-normal prices and share counts, sales with negative
+quantity and value, and trade dates a few days before the filing.
+
+    python -m benchmarks.synthetic --rows 1000000 --db bench_1m.db
+"""
+import argparse
+import html
+from datetime import date
+from typing import Iterator, List
+import numpy as np
+from database_handler import insider_trading_db_handler
+
+FIELD_NAMES = ["X", "filing_date", "trade_date", "ticker", "company_name", "insider_name", "title", "trade_type",
+               "price", "quantity", "owned", "dOwnedPc", "value"]
+
+# (title, share of insiders), spellings as they appear on the screener
+TITLES = [
+    ("Dir", 0.36), ("10%", 0.07), ("Dir, 10%", 0.04), ("CEO", 0.05), ("Pres, CEO", 0.03), ("COB, CEO", 0.02),
+    ("CFO", 0.05), ("EVP, CFO", 0.02), ("COO", 0.03), ("Pres", 0.02), ("COB", 0.02), ("EVP", 0.06),
+    ("SVP", 0.05), ("VP", 0.05), ("GC", 0.03), ("CAO", 0.02), ("CTO", 0.02), ("Sec", 0.01),
+    ("Chief Executive Officer", 0.01), ("Director", 0.02),
+]
+TRADE_TYPES = [
+    ("S - Sale", 0.45), ("S - Sale+OE", 0.15), ("P - Purchase", 0.20), ("A - Grant", 0.10),
+    ("M - OptEx", 0.05), ("F - Tax", 0.05),
+]
+X_FLAGS = [("", 0.80), ("D", 0.08), ("M", 0.05), ("DM", 0.04), ("A", 0.03)]
+FIRST_NAMES = ["James", "Mary", "Robert", "Patricia", "John", "Jennifer", "Michael", "Linda", "David", "Elizabeth",
+               "William", "Barbara", "Richard", "Susan", "Joseph", "Jessica", "Thomas", "Sarah", "Charles", "Karen"]
+LAST_NAMES = ["Smith", "Johnson", "Williams", "Brown", "Jones", "Garcia", "Miller", "Davis", "Rodriguez", "Martinez",
+              "Hernandez", "Lopez", "Gonzalez", "Wilson", "Anderson", "Thomas", "Taylor", "Moore", "Jackson", "Martin"]
+SECONDS_PER_DAY = 24 * 60 * 60
+
+def _choice(rng: np.random.Generator, weighted: list, size: int) -> np.ndarray:
+    values, weights = zip(*weighted)
+    weights = np.array(weights) / sum(weights)
+    return np.array(values, dtype=object)[rng.choice(len(values), size=size, p=weights)]
+
+def _ticker(index: int) -> str:
+    # AAA, AAB, ... four letters for the long tail
+    letters = []
+    for _ in range(3 if index < 26 ** 3 else 4):
+        index, letter = divmod(index, 26)
+        letters.append(chr(ord('A') + letter))
+    return ''.join(reversed(letters))
+
+class _Universe:
+    """Companies, their insiders and the insiders' titles, fixed by the seed."""
+    def __init__(self, rows: int, rng: np.random.Generator):
+        # ~1 company per 50 rows, capped at roughly the number of companies with Form 4 filings
+        self.n_companies = int(np.clip(rows // 50, 50, 12_000))
+        ranks = np.arange(1, self.n_companies + 1)
+        # the busiest ticker gets a few percent of all filings
+        self.company_weights = 1 / ranks ** 0.8
+        self.company_weights /= self.company_weights.sum()
+        self.tickers = np.array([_ticker(i) for i in rng.permutation(self.n_companies)], dtype=object)
+        self.company_names = np.array([f"{ticker.title()} Holdings Inc" for ticker in self.tickers], dtype=object)
+        self.base_price = rng.lognormal(3.0, 1.2, self.n_companies)
+
+        # 3 to 30 insiders per company, the busiest companies have the most
+        self.insider_counts = np.clip(3 + rng.poisson(6, self.n_companies) + (ranks < self.n_companies / 20) * 12, 3, 30)
+        self.insider_offsets = np.concatenate(([0], np.cumsum(self.insider_counts)[:-1]))
+        n_insiders = int(self.insider_counts.sum())
+        self.insider_titles = _choice(rng, TITLES, n_insiders)
+        self.insider_names = np.array([
+            f"{LAST_NAMES[i % len(LAST_NAMES)]} {FIRST_NAMES[(i // len(LAST_NAMES)) % len(FIRST_NAMES)]} {chr(ord('A') + i % 26)}. {i}"
+            for i in range(n_insiders)
+        ], dtype=object)
+
+def generate_bronze_rows(rows: int, seed: int = 0, start: date = date(2015, 1, 1), end: date = date(2025, 1, 1),
+                         chunk_size: int = 100_000) -> Iterator[List[tuple]]:
+    """Synthetic bronze rows in FIELD_NAMES order, in chunks of chunk_size so 10M rows never sit in memory at once."""
+    rng = np.random.default_rng(seed)
+    universe = _Universe(rows, rng)
+    first, span = (start - date(1970, 1, 1)).days * SECONDS_PER_DAY, (end - start).days * SECONDS_PER_DAY
+
+    for chunk_start in range(0, rows, chunk_size):
+        n = min(chunk_size, rows - chunk_start)
+        company = rng.choice(universe.n_companies, size=n, p=universe.company_weights)
+        # within a company a few insiders file most of the forms
+        position = np.minimum(rng.geometric(0.35, n) - 1, universe.insider_counts[company] - 1)
+        insider = universe.insider_offsets[company] + position
+
+        filed = first + rng.integers(0, span, n)
+        filed = filed - filed % SECONDS_PER_DAY + rng.integers(8 * 3600, 20 * 3600, n)
+        traded = filed - rng.integers(0, 5, n) * SECONDS_PER_DAY
+        filing_date = np.datetime_as_string(filed.astype('datetime64[s]'), unit='s')
+        trade_date = np.datetime_as_string(traded.astype('datetime64[s]'), unit='D')
+
+        trade_type = _choice(rng, TRADE_TYPES, n)
+        sign = np.where([kind.startswith(("S", "F")) for kind in trade_type], -1.0, 1.0)
+        price = np.round(universe.base_price[company] * rng.lognormal(0, 0.15, n), 2)
+        quantity = sign * np.round(rng.lognormal(8, 1.5, n))
+        owned = np.round(np.abs(quantity) * rng.lognormal(2, 1, n))
+        owned_change = np.round(np.clip(quantity / np.maximum(owned - quantity, 1) * 100, -100, 999))
+        value = np.round(price * quantity)
+
+        yield list(zip(
+            _choice(rng, X_FLAGS, n).tolist(), [s.replace('T', ' ') for s in filing_date.tolist()], trade_date.tolist(),
+            universe.tickers[company].tolist(), universe.company_names[company].tolist(),
+            universe.insider_names[insider].tolist(), universe.insider_titles[insider].tolist(), trade_type.tolist(),
+            price.tolist(), quantity.tolist(), owned.tolist(), owned_change.tolist(), value.tolist(),
+        ))
+
+def write_bronze(db_file: str, rows: int, seed: int = 0, batch_size: int = 5000) -> int:
+    """Recreate transactions_bronze in db_file with synthetic rows, through the scraper's bulk writer."""
+    handler = insider_trading_db_handler("transactions_bronze", db_file, recreate=True, max_backlog_size=batch_size)
+    written = 0
+    for chunk in generate_bronze_rows(rows, seed):
+        written += handler.write_many(FIELD_NAMES, chunk)
+    handler.close()
+    return written
+
+def _money(value: float) -> str:
+    return f"{'-' if value < 0 else '+'}${abs(value):,.0f}"
+
+def screener_page(rows: List[tuple]) -> str:
+    """Rows rendered as the screener's result table, for parse benchmarks without recorded pages."""
+    body = []
+    for x, filing_date, trade_date, ticker, company, insider, title, trade_type, price, quantity, owned, owned_change, value in rows:
+        cells = [
+            x, f'<div><a href="/{ticker}">{filing_date}</a></div>', f"<div>{trade_date}</div>",
+            f'<b><a href="/{ticker}">{ticker}</a></b>', f'<a href="/{ticker}">{html.escape(company)}</a>',
+            f'<a href="/insider/{insider.replace(" ", "-")}">{html.escape(insider)}</a>', title, trade_type,
+            f"${price:,.2f}", f"{quantity:+,.0f}", f"{owned:,.0f}", "New" if owned_change >= 999 else f"{owned_change:+.0f}%",
+            _money(value),
+        ]
+        body.append("<tr>" + "".join(f'<td align="right">{cell}</td>' for cell in cells) + "</tr>")
+    return ('<html><body><table width="100%" cellpadding="0" cellspacing="0" border="0" class="tinytable">'
+            '<thead><tr>' + "".join(f"<th>{name}</th>" for name in FIELD_NAMES) + '</tr></thead>'
+            '<tbody>' + "".join(body) + '</tbody></table></body></html>')
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write a synthetic transactions_bronze table")
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--db", default="bench.db")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    print(f"Wrote {write_bronze(args.db, args.rows, args.seed)} rows to {args.db}")
@@ -8,51 +8,61 @@
 # replace trade type with boolean
 # add columns to relate insiders and companies
 
+import argparse
+import json
+import logging
 import sqlite3
-from datetime import datetime
+import yaml
+from database_handler import connect
+from roles import ROLE_BITS, role_lookup, roles_version
 
 # We will now have tables
 # - transactions_gold
 # - insiders_gold done
 # - companies_gold done
 
+# The gold tables only ever grow from bronze rows above the high-water mark stored in gold_state.
+# Every populate_* function takes that mark, a full rebuild simply starts from 0.
+
+logger = logging.getLogger('openinsider')
+
+GOLD_TABLES = ["company_window_stats", "transactions_titles_gold", "transactions_gold", "insiders_gold", "companies_gold", "roles_gold"]
+
 def create_companies_table(cur: sqlite3.Cursor, conn: sqlite3.Connection):
-    cur.execute(""" CREATE TABLE "companies_gold" (
+    cur.execute(""" CREATE TABLE IF NOT EXISTS "companies_gold" (
                         "id"	    INTEGER NOT NULL UNIQUE,
                         "ticker"	TEXT,
                         "name"	    TEXT,
                         PRIMARY KEY("id" AUTOINCREMENT)
                     )""")
-    
-    # populate companies table
-    cur.execute("SELECT DISTINCT ticker FROM transactions_bronze")
-    tickers = cur.fetchall()
-    
-    for ticker in tickers:
-        ticker_symbol = ticker[0]
-        cur.execute("SELECT company_name FROM transactions_bronze WHERE ticker=?", (ticker_symbol,))
-        company_name = cur.fetchone()[0]
-        cur.execute("INSERT INTO companies_gold (ticker, name) VALUES (?, ?)", (ticker_symbol, company_name,))
-    conn.commit()
+    cur.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_companies_gold_ticker ON companies_gold(ticker);")
+
+def populate_companies_table(cur: sqlite3.Cursor, since_id: int):
+    # new tickers get the first company name seen for them, known tickers are left alone
+    cur.execute(""" INSERT OR IGNORE INTO companies_gold (ticker, name)
+                    SELECT ticker, company_name FROM transactions_bronze
+                    WHERE id IN (SELECT MIN(id) FROM transactions_bronze WHERE id > ? GROUP BY ticker)
+                    ORDER BY id""", (since_id,))
 
 def create_insiders_table(cur: sqlite3.Cursor, conn: sqlite3.Connection):
-    cur.execute(""" CREATE TABLE "insiders_gold" (
+    cur.execute(""" CREATE TABLE IF NOT EXISTS "insiders_gold" (
                         "id"	INTEGER NOT NULL UNIQUE,
                         "name"	TEXT,
                         PRIMARY KEY("id" AUTOINCREMENT)
                     )""")
-    # populate insider table
-    cur.execute("SELECT DISTINCT insider_name FROM transactions_bronze")
-    insiders = cur.fetchall()
-    
-    for insider in insiders:
-        name = insider[0]
-        cur.execute("INSERT INTO insiders_gold (name) VALUES (?)", (name,))
-    conn.commit()
-    
+    cur.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_insiders_gold_name ON insiders_gold(name);")
+
+def populate_insiders_table(cur: sqlite3.Cursor, since_id: int):
+    cur.execute(""" INSERT OR IGNORE INTO insiders_gold (name)
+                    SELECT insider_name FROM transactions_bronze
+                    WHERE id > ?
+                    GROUP BY insider_name
+                    ORDER BY MIN(id)""", (since_id,))
+
 def create_gold_transactions_table(cur: sqlite3.Cursor, conn: sqlite3.Connection):
-    cur.execute(""" CREATE TABLE "transactions_gold" (
+    cur.execute(""" CREATE TABLE IF NOT EXISTS "transactions_gold" (
                         "id"	        INTEGER NOT NULL UNIQUE,
+                        "bronze_id"	    INTEGER,
                         "trade_date"	INTEGER,
                         "company_id"	INTEGER,
                         "insider_id"	INTEGER,
@@ -60,42 +70,64 @@ def create_gold_transactions_table(cur: sqlite3.Cursor, conn: sqlite3.Connection
                         "unit_price"	REAL,
                         "unit_quantity"	REAL,
                         "value"	        REAL,
+                        "roles_mask"	INTEGER NOT NULL DEFAULT 0,
                         PRIMARY KEY("id" AUTOINCREMENT),
                         FOREIGN KEY (company_id) REFERENCES companies_gold(id),
                         FOREIGN KEY (insider_id) REFERENCES insiders_gold(id)
                     )""")
-    
-    # populate transactions table
-    cur.execute("SELECT trade_date, ticker, insider_name, trade_type, price, quantity, value, title FROM transactions_bronze;")
-    transactions = cur.fetchall()
-    
-    for transaction in transactions:
-        _dt = datetime.strptime(transaction[0], "%Y-%m-%d")
-        trade_date = int(_dt.timestamp())
-        cur.execute("SELECT id FROM companies_gold WHERE ticker=?", (transaction[1],))
-        company_id = cur.fetchone()[0]
-        cur.execute("SELECT id FROM insiders_gold WHERE name=?", (transaction[2],))
-        insider_id = cur.fetchone()[0]
-        is_purchase = transaction[3].lower()[0] == "p"
-        unit_price = transaction[4]
-        unit_quantity = transaction[5]
-        value = transaction[6]
-        
-        params = (trade_date, company_id, insider_id, is_purchase, unit_price, unit_quantity, value)
-        
-        SQL = """INSERT INTO transactions_gold (trade_date, company_id, insider_id, is_purchase, unit_price, unit_quantity, value) VALUES (?, ?, ?, ?, ?, ?, ?)"""
-        cur.execute(SQL, params)
-        
-        cur.execute("SELECT last_insert_rowid()")
-        transaction_id = cur.fetchone()[0]
-        
-        _titles = [title.strip() for title in transaction[7].split(",")]
-        for _title in _titles:
-            cur.execute("INSERT INTO transactions_titles_gold (transaction_id, title, insider_id) VALUES(?, ? , ?)", (transaction_id, _title, insider_id,))
-    conn.commit()
-   
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_transactions_gold_company_id ON transactions_gold(company_id);")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_transactions_gold_insider_id ON transactions_gold(insider_id);")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_transactions_gold_bronze_id ON transactions_gold(bronze_id);")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_transactions_gold_company_date ON transactions_gold(company_id, trade_date);")
+
+def add_roles_mask_column(cur: sqlite3.Cursor) -> bool:
+    """Add roles_mask to a transactions_gold table built before it existed. Returns True if it was added."""
+    cur.execute("SELECT name FROM pragma_table_info('transactions_gold') WHERE name='roles_mask'")
+    if cur.fetchone() is not None:
+        return False
+    cur.execute("ALTER TABLE transactions_gold ADD COLUMN roles_mask INTEGER NOT NULL DEFAULT 0")
+    return True
+
+def populate_gold_transactions_table(cur: sqlite3.Cursor, since_id: int) -> int:
+    # populate transactions table in one statement, trade dates become local midnight epoch seconds
+    cur.execute(""" INSERT INTO transactions_gold (bronze_id, trade_date, company_id, insider_id, is_purchase, unit_price, unit_quantity, value)
+                    SELECT b.id,
+                           CAST(strftime('%s', b.trade_date, 'utc') AS INTEGER),
+                           c.id,
+                           i.id,
+                           lower(substr(b.trade_type, 1, 1)) = 'p',
+                           b.price,
+                           b.quantity,
+                           b.value
+                    FROM transactions_bronze b
+                    JOIN companies_gold c ON c.ticker = b.ticker
+                    JOIN insiders_gold i ON i.name = b.insider_name
+                    WHERE b.id > ?
+                    ORDER BY b.id""", (since_id,))
+    inserted = cur.rowcount
+
+    # split the comma separated titles of every new transaction into one row per title
+    cur.execute(""" WITH RECURSIVE split(transaction_id, insider_id, position, title, rest) AS (
+                        SELECT t.id, t.insider_id, 0, NULL, b.title || ','
+                        FROM transactions_gold t
+                        JOIN transactions_bronze b ON b.id = t.bronze_id
+                        WHERE t.bronze_id > ?
+                        UNION ALL
+                        SELECT transaction_id, insider_id, position + 1,
+                               substr(rest, 1, instr(rest, ',') - 1),
+                               substr(rest, instr(rest, ',') + 1)
+                        FROM split
+                        WHERE rest <> ''
+                    )
+                    INSERT INTO transactions_titles_gold (transaction_id, title, insider_id)
+                    SELECT transaction_id, trim(title, ' ' || char(9, 10, 13)), insider_id
+                    FROM split
+                    WHERE position > 0
+                    ORDER BY transaction_id, position""", (since_id,))
+    return inserted
+
 def create_transactions_titles_table(cur: sqlite3.Cursor, conn: sqlite3.Connection):
-    cur.execute(""" CREATE TABLE "transactions_titles_gold" (
+    cur.execute(""" CREATE TABLE IF NOT EXISTS "transactions_titles_gold" (
                         "id"	            INTEGER NOT NULL UNIQUE,
                         "transaction_id"	INTEGER,
                         "title"	            TEXT,
@@ -104,33 +136,176 @@ def create_transactions_titles_table(cur: sqlite3.Cursor, conn: sqlite3.Connecti
                         FOREIGN KEY (transaction_id) REFERENCES transactions_gold(id),
                         FOREIGN KEY (insider_id) REFERENCES insiders_gold(id)
                     )""")
-    conn.commit()
-    
-def main():
-    conn = sqlite3.connect("insider_trades.db")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_transactions_titles_gold_id ON transactions_titles_gold(id);")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_transactions_titles_gold_transaction_id ON transactions_titles_gold(transaction_id);")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_transactions_titles_gold_insider_id ON transactions_titles_gold(insider_id);")
+
+def create_roles_table(cur: sqlite3.Cursor, conn: sqlite3.Connection):
+    cur.execute(""" CREATE TABLE IF NOT EXISTS "roles_gold" (
+                        "title"	TEXT NOT NULL UNIQUE,
+                        "role"	TEXT,
+                        "bit"	INTEGER,
+                        PRIMARY KEY("title")
+                    )""")
+
+def populate_roles_table(cur: sqlite3.Cursor):
+    # lower-cased title -> canonical role and its bit, from the dictionary in roles.py
+    cur.execute("DELETE FROM roles_gold")
+    cur.executemany("INSERT INTO roles_gold (title, role, bit) VALUES (?, ?, ?)",
+                    [(title, role, ROLE_BITS[role]) for title, role in role_lookup().items()])
+
+def update_roles_masks(cur: sqlite3.Cursor, since_id: int):
+    # the bits are distinct powers of two, so summing the distinct bits of a transaction's titles ORs them
+    cur.execute(""" UPDATE transactions_gold
+                    SET roles_mask = (
+                        SELECT COALESCE(SUM(DISTINCT r.bit), 0)
+                        FROM transactions_titles_gold tt
+                        JOIN roles_gold r ON r.title = lower(tt.title)
+                        WHERE tt.transaction_id = transactions_gold.id
+                    )
+                    WHERE bronze_id > ?""", (since_id,))
+
+def create_window_stats_table(cur: sqlite3.Cursor, conn: sqlite3.Connection):
+    # one row per company, purchase date and window: what the signal queries used to recompute every time
+    cur.execute(""" CREATE TABLE IF NOT EXISTS "company_window_stats" (
+                        "company_id"	    INTEGER NOT NULL,
+                        "trade_date"	    INTEGER NOT NULL,
+                        "window_days"	    REAL NOT NULL,
+                        "distinct_insiders"	INTEGER,
+                        "roles_mask"	    INTEGER,
+                        "max_value"	        REAL,
+                        FOREIGN KEY (company_id) REFERENCES companies_gold(id)
+                    )""")
+    cur.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_company_window_stats_company_date ON company_window_stats(company_id, trade_date, window_days);")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_company_window_stats_window_date ON company_window_stats(window_days, trade_date);")
+
+def populate_window_stats(cur: sqlite3.Cursor, window_days: list, since_id: int):
+    # companies with new purchases get all their rows recomputed, the windows of older dates may reach the new ones
+    cur.execute("DROP TABLE IF EXISTS temp.window_stats_companies")
+    cur.execute(""" CREATE TEMP TABLE window_stats_companies AS
+                    SELECT DISTINCT company_id FROM transactions_gold WHERE bronze_id > ? AND is_purchase = 1""", (since_id,))
+    cur.execute("DELETE FROM company_window_stats WHERE company_id IN (SELECT company_id FROM temp.window_stats_companies)")
+
+    # every MAX(roles_mask & bit) is either 0 or bit, ORing them gives the roles of the whole window
+    roles = " | ".join(f"MAX(w.roles_mask & {bit})" for bit in ROLE_BITS.values())
+    for days in window_days:
+        cur.execute(f""" INSERT INTO company_window_stats (company_id, trade_date, window_days, distinct_insiders, roles_mask, max_value)
+                        SELECT d.company_id, d.trade_date, ?, COUNT(DISTINCT w.insider_id), {roles}, MAX(w.value)
+                        FROM (
+                            SELECT DISTINCT company_id, trade_date FROM transactions_gold
+                            WHERE is_purchase = 1 AND trade_date IS NOT NULL
+                            AND company_id IN (SELECT company_id FROM temp.window_stats_companies)
+                        ) d
+                        JOIN transactions_gold w
+                            ON w.company_id = d.company_id
+                            AND w.trade_date BETWEEN d.trade_date - ? AND d.trade_date + ?
+                            AND w.is_purchase = 1
+                        GROUP BY d.company_id, d.trade_date""", (days, days*24*60*60, days*24*60*60))
+    cur.execute("DROP TABLE temp.window_stats_companies")
+
+def create_gold_state_table(cur: sqlite3.Cursor, conn: sqlite3.Connection):
+    cur.execute(""" CREATE TABLE IF NOT EXISTS "gold_state" (
+                        "key"	TEXT NOT NULL UNIQUE,
+                        "value"	TEXT,
+                        PRIMARY KEY("key")
+                    )""")
+
+def get_gold_state(cur: sqlite3.Cursor, key: str) -> str | None:
+    cur.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='gold_state'")
+    if cur.fetchone() is None:
+        return None
+    cur.execute("SELECT value FROM gold_state WHERE key=?", (key,))
+    row = cur.fetchone()
+    return row[0] if row else None
+
+def set_gold_state(cur: sqlite3.Cursor, key: str, value: object):
+    cur.execute("INSERT INTO gold_state (key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value=excluded.value", (key, value))
+
+def _bronze_row_key(cur: sqlite3.Cursor, bronze_id: int) -> str | None:
+    cur.execute("SELECT filing_date || '|' || ticker || '|' || insider_name FROM transactions_bronze WHERE id=?", (bronze_id,))
+    row = cur.fetchone()
+    return row[0] if row else None
+
+def needs_full_rebuild(cur: sqlite3.Cursor) -> bool:
+    """Gold can only be extended if it was built by this module from the bronze table that is there now."""
+    high_water_mark = get_gold_state(cur, "bronze_high_water_mark")
+    if high_water_mark is None:
+        return True
+    cur.execute("SELECT name FROM pragma_table_info('transactions_gold') WHERE name='bronze_id'")
+    if cur.fetchone() is None:
+        return True
+    # A recreated bronze table starts its ids from 1 again, the row at the mark then no longer matches
+    high_water_mark = int(high_water_mark)
+    return high_water_mark > 0 and _bronze_row_key(cur, high_water_mark) != get_gold_state(cur, "bronze_high_water_key")
+
+def update_gold(conn: sqlite3.Connection, full_rebuild: bool = False, window_days: list = [30]) -> int:
+    """
+    Bring the gold tables up to date with transactions_bronze and return the number of new transactions.
+    Everything happens in one transaction, so other connections keep reading the previous gold tables
+    until the commit, even during a full rebuild. A transaction the caller already opened is joined.
+    """
     cur = conn.cursor()
-    
-    
-    cur.execute("DROP TABLE IF EXISTS transactions_titles_gold;")
-    cur.execute("DROP TABLE IF EXISTS transactions_gold;")
-    cur.execute("DROP TABLE IF EXISTS insiders_gold;")
-    cur.execute("DROP TABLE IF EXISTS companies_gold;")
-    
-    create_transactions_titles_table(cur, conn)
-    create_companies_table(cur, conn)
-    create_insiders_table(cur, conn)
-    create_gold_transactions_table(cur, conn)
-    
-    cur.execute("CREATE INDEX idx_transactions_titles_gold_id ON transactions_titles_gold(id);")
-    
-    cur.execute("CREATE INDEX idx_transactions_gold_company_id ON transactions_gold(company_id);")
-    cur.execute("CREATE INDEX idx_transactions_gold_insider_id ON transactions_gold(insider_id);")
-    
-    cur.execute("CREATE INDEX idx_transactions_titles_gold_transaction_id ON transactions_titles_gold(transaction_id);")
-    cur.execute("CREATE INDEX idx_transactions_titles_gold_insider_id ON transactions_titles_gold(insider_id);")
-    conn.commit()
+    # DDL doesn't open a transaction implicitly, so one is started unless the caller's is still open
+    if not conn.in_transaction:
+        cur.execute("BEGIN")
+    try:
+        full_rebuild = full_rebuild or needs_full_rebuild(cur)
+        if full_rebuild:
+            for table in GOLD_TABLES:
+                cur.execute(f"DROP TABLE IF EXISTS {table};")
+
+        create_transactions_titles_table(cur, conn)
+        create_companies_table(cur, conn)
+        create_insiders_table(cur, conn)
+        create_gold_transactions_table(cur, conn)
+        create_roles_table(cur, conn)
+        create_window_stats_table(cur, conn)
+        create_gold_state_table(cur, conn)
+
+        # Masks of existing transactions only need recomputing when the role dictionary changed
+        roles_changed = add_roles_mask_column(cur) or get_gold_state(cur, "roles_version") != roles_version()
+        if full_rebuild or roles_changed:
+            populate_roles_table(cur)
+
+        since_id = 0 if full_rebuild else int(get_gold_state(cur, "bronze_high_water_mark"))
+        cur.execute("SELECT COALESCE(MAX(id), 0) FROM transactions_bronze")
+        high_water_mark = cur.fetchone()[0]
+
+        populate_companies_table(cur, since_id)
+        populate_insiders_table(cur, since_id)
+        inserted = populate_gold_transactions_table(cur, since_id)
+        update_roles_masks(cur, 0 if roles_changed else since_id)
+        # New windows or new role masks invalidate the stats of every company
+        windows_changed = get_gold_state(cur, "window_days") != json.dumps(window_days)
+        populate_window_stats(cur, window_days, 0 if roles_changed or windows_changed else since_id)
+
+        set_gold_state(cur, "bronze_high_water_mark", high_water_mark)
+        set_gold_state(cur, "bronze_high_water_key", _bronze_row_key(cur, high_water_mark))
+        set_gold_state(cur, "roles_version", roles_version())
+        set_gold_state(cur, "window_days", json.dumps(window_days))
+        if full_rebuild or roles_changed or windows_changed or inserted > 0:
+            generation = int(get_gold_state(cur, "generation") or 0) + 1
+            set_gold_state(cur, "generation", generation)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return inserted
+
+def main(full_rebuild: bool = False, config_path: str = "config.yaml"):
+    with open(config_path, 'r') as f:
+        config = yaml.safe_load(f)
+    conn = connect(config['database']['file'])
+
+    inserted = update_gold(conn, full_rebuild, config['signals']['window_days'])
+    logger.info(f"Added {inserted} transactions to gold.")
 
     conn.close()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Build the gold tables from transactions_bronze")
+    parser.add_argument("--full-rebuild", action="store_true", help="Drop and rebuild all gold tables instead of appending new bronze rows")
+    parser.add_argument("--config", default="config.yaml")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    main(args.full_rebuild, args.config)
@@ -1,16 +1,36 @@
 import sqlite3
+from itertools import islice
+from typing import Iterable
+
+# Columns that identify a bronze row independently of its autoincrement id. Re-scraping a month
+# upserts against this key instead of recreating the table.
+BRONZE_NATURAL_KEY = ["filing_date", "trade_date", "ticker", "insider_name", "trade_type", "price", "quantity", "owned"]
+
+# Seconds a connection waits for another connection's write to finish before "database is locked" is raised
+BUSY_TIMEOUT = 30
+
+def connect(db_file: str) -> sqlite3.Connection:
+    """
+    Connection to the project database. The pipeline runs stages on the same file at the same time: in WAL
+    mode readers don't block the writer, and writers queue for up to BUSY_TIMEOUT seconds instead of failing.
+    """
+    conn = sqlite3.connect(db_file, timeout=BUSY_TIMEOUT)
+    conn.execute("PRAGMA journal_mode=WAL")
+    return conn
 
 class insider_trading_db_handler:
-    def __init__(self, table_name: str, db_location: str):
+    def __init__(self, table_name: str, db_location: str, recreate: bool = False, max_backlog_size: int = 100):
         self.db_location = db_location
-        self.connection = sqlite3.connect(db_location)
+        self.connection = connect(db_location)
         self.cursor = self.connection.cursor()
         self.uncommitted_backlog = 0
-        self.max_backlog_size = 100
+        self.max_backlog_size = max_backlog_size
         self.table_name = table_name
-        self.cursor.execute(f"DROP TABLE IF EXISTS {table_name};")
+        self._insert_statements = {}
+        if recreate:
+            self.cursor.execute(f"DROP TABLE IF EXISTS {table_name};")
         self.cursor.execute(f"""
-                            CREATE TABLE "{table_name}" (
+                            CREATE TABLE IF NOT EXISTS "{table_name}" (
                             "id"	INTEGER NOT NULL UNIQUE,
                             "filing_date"	TEXT,
                             "trade_date"	TEXT,
@@ -28,22 +48,98 @@ class insider_trading_db_handler:
                             PRIMARY KEY("id" AUTOINCREMENT)
                         );
                         """)
+        self._create_natural_key_index()
+        self.cursor.execute("""
+                            CREATE TABLE IF NOT EXISTS "scrape_watermarks" (
+                            "year"	INTEGER NOT NULL,
+                            "month"	INTEGER NOT NULL,
+                            "row_count"	INTEGER,
+                            "fetched_at"	TEXT,
+                            "is_final"	INTEGER NOT NULL DEFAULT 0,
+                            "filters_fingerprint"	TEXT,
+                            PRIMARY KEY("year", "month")
+                        );
+                        """)
+        columns = [row[1] for row in self.cursor.execute("PRAGMA table_info(scrape_watermarks)")]
+        if "filters_fingerprint" not in columns:
+            # Watermarks written before the filters were recorded don't match any filters, their months are fetched once more
+            self.cursor.execute('ALTER TABLE scrape_watermarks ADD COLUMN "filters_fingerprint" TEXT')
         self.commit()
 
+    def _create_natural_key_index(self):
+        sql_statement = f'CREATE UNIQUE INDEX IF NOT EXISTS "idx_{self.table_name}_natural_key" ON "{self.table_name}" ({",".join(BRONZE_NATURAL_KEY)})'
+        try:
+            self.cursor.execute(sql_statement)
+        except sqlite3.IntegrityError:
+            # Tables written before the natural key existed may hold duplicates; keep the oldest copy.
+            self.cursor.execute(f"""
+                                DELETE FROM {self.table_name} WHERE id NOT IN (
+                                    SELECT MIN(id) FROM {self.table_name} GROUP BY {",".join(BRONZE_NATURAL_KEY)}
+                                )""")
+            self.cursor.execute(sql_statement)
+
     def close(self):
         self.commit()
         self.cursor.close()
         self.connection.close()
 
+    def _insert_statement(self, column_names: list[str], upsert: bool = False) -> str:
+        # Built once per column layout so every row reuses the same prepared statement
+        key = (tuple(column_names), upsert)
+        if key not in self._insert_statements:
+            sql_statement = f"INSERT INTO {self.table_name} ({','.join(column_names)}) VALUES ({', '.join(['?' for _ in range(len(column_names))])})"
+            updated = [column for column in column_names if column not in BRONZE_NATURAL_KEY]
+            if upsert and updated:
+                # Rows that are already there take the new values of the other columns, unchanged rows are left alone
+                sql_statement += (f" ON CONFLICT({','.join(BRONZE_NATURAL_KEY)}) DO UPDATE SET {', '.join(f'{column}=excluded.{column}' for column in updated)}"
+                                  f" WHERE ({','.join(updated)}) IS NOT ({','.join(f'excluded.{column}' for column in updated)})")
+            else:
+                sql_statement += " ON CONFLICT DO NOTHING"
+            self._insert_statements[key] = sql_statement
+        return self._insert_statements[key]
+
     def write_to_db(self, column_names: list[str], data: tuple[object]):
         assert len(column_names) == len(data)
-        sql_statement = f"INSERT INTO {self.table_name} ({','.join(column_names)}) VALUES ({', '.join(['?' for _ in range(len(column_names))])})"
+        sql_statement = self._insert_statement(column_names)
         # print(sql_statement)
         self.cursor.execute(sql_statement, tuple(data))
         self.uncommitted_backlog += 1
-        if self.uncommitted_backlog == self.max_backlog_size:
+        if self.uncommitted_backlog >= self.max_backlog_size:
             self.commit()
 
+    def write_many(self, column_names: list[str], rows: Iterable[tuple], upsert: bool = False) -> int:
+        """
+        Bulk insert rows with executemany, committing every max_backlog_size rows. Returns the number of rows
+        passed in. Rows whose natural key is already stored are skipped, or updated with upsert.
+        """
+        sql_statement = self._insert_statement(column_names, upsert)
+        rows = iter(rows)
+        written = 0
+        while True:
+            batch = list(islice(rows, self.max_backlog_size - self.uncommitted_backlog))
+            if not batch:
+                break
+            self.cursor.executemany(sql_statement, batch)
+            written += len(batch)
+            self.uncommitted_backlog += len(batch)
+            if self.uncommitted_backlog >= self.max_backlog_size:
+                self.commit()
+        return written
+
+    def get_final_months(self, filters_fingerprint: str) -> set[tuple[int, int]]:
+        """Months stored after they closed with the same filters, a month scraped with other filters holds other rows."""
+        self.cursor.execute("SELECT year, month FROM scrape_watermarks WHERE is_final = 1 AND filters_fingerprint = ?",
+                            (filters_fingerprint,))
+        return set(self.cursor.fetchall())
+
+    def mark_month(self, year: int, month: int, row_count: int, fetched_at: str, is_final: bool, filters_fingerprint: str):
+        self.cursor.execute("""
+                            INSERT INTO scrape_watermarks (year, month, row_count, fetched_at, is_final, filters_fingerprint) VALUES (?, ?, ?, ?, ?, ?)
+                            ON CONFLICT(year, month) DO UPDATE SET
+                                row_count=excluded.row_count, fetched_at=excluded.fetched_at, is_final=excluded.is_final,
+                                filters_fingerprint=excluded.filters_fingerprint
+                            """, (year, month, row_count, fetched_at, int(is_final), filters_fingerprint))
+
     def commit(self):
         self.connection.commit()
         # print(f"Commited {self.uncommitted_backlog} uncommited backlog items to DB.")
@@ -60,4 +156,4 @@ def main():
     pass
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
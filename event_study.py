@@ -0,0 +1,188 @@
+from datetime import date, timedelta
+from typing import Dict, Iterable, Optional, Tuple
+import numpy as np
+import pandas as pd
+import yaml
+from database_handler import connect
+from price_store import PriceStore, default_price_store
+from signal_engine import SECONDS_PER_DAY, load_purchases, signal_events
+
+# Holding periods in calendar days, 12m matches backtest_one
+HORIZONS = {"1m": 30, "3m": 91, "6m": 182, "12m": 365}
+# backtest_one looks for prices from a week before entry until a week after exit
+WINDOW_PAD_DAYS = 7
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+def price_matrix(store: PriceStore, tickers: Iterable[str], start: date, end: date, fetch: bool = True) -> pd.DataFrame:
+    """Adjusted closes of the trading days in [start, end) with one column per ticker, NaN where a ticker has no price."""
+    columns = {}
+    for ticker in dict.fromkeys(tickers):
+        dates, closes = store.prices(ticker, start, end, fetch)
+        columns[ticker] = pd.Series(np.asarray(closes), index=pd.Index(np.asarray(dates), name='date'))
+    matrix = pd.DataFrame(columns).sort_index()
+    matrix.index = [date.fromordinal(int(ordinal)) for ordinal in matrix.index]
+    return matrix
+
+def _entry_ordinals(entry_dates: pd.Series) -> np.ndarray:
+    """Date ordinals of 'YYYY-MM-DD' strings, dates or epoch seconds (UTC day, like backtest_one)."""
+    entry_dates = pd.Series(entry_dates)
+    if pd.api.types.is_numeric_dtype(entry_dates):
+        days = np.floor_divide(entry_dates.to_numpy(dtype=np.float64), SECONDS_PER_DAY).astype(np.int64)
+        return days + EPOCH_ORDINAL
+    days = pd.to_datetime(entry_dates).to_numpy(dtype='datetime64[D]').astype(np.int64)
+    return days + EPOCH_ORDINAL
+
+def _dates(ordinals: np.ndarray, valid: np.ndarray) -> np.ndarray:
+    days = (ordinals - EPOCH_ORDINAL).astype('datetime64[D]')
+    days[~valid] = np.datetime64('NaT')
+    return days
+
+class _StackedPrices:
+    """
+    The non-missing prices of a price matrix as one array sorted by (ticker, date). Every ticker owns its own
+    range of a composite key, so one searchsorted finds the first price on or after a date for all events.
+    """
+    def __init__(self, prices: pd.DataFrame):
+        self.columns = {ticker: rank for rank, ticker in enumerate(prices.columns)}
+        ordinals = np.array([day.toordinal() for day in prices.index], dtype=np.int64)
+        values = prices.to_numpy(dtype=np.float64)
+        rank, row = np.nonzero(~np.isnan(values.T))
+        self.rank = rank
+        self.ordinal = ordinals[row]
+        self.close = values[row, rank]
+        self.first = int(ordinals.min()) if len(ordinals) else 0
+        self.span = int(ordinals.max()) - self.first if len(ordinals) else 0
+        self.stride = self.span + 2
+        self.key = self.rank * self.stride + (self.ordinal - self.first)
+        # a sentinel after the last ticker keeps every lookup index valid, even without any prices
+        self.rank = np.r_[self.rank, len(self.columns)]
+        self.ordinal = np.r_[self.ordinal, 0]
+        self.close = np.r_[self.close, np.nan]
+        self.key = np.r_[self.key, len(self.columns) * self.stride]
+        order = np.argsort(self.key, kind='stable')
+        self.rank, self.ordinal, self.close, self.key = self.rank[order], self.ordinal[order], self.close[order], self.key[order]
+
+    def _key(self, rank: np.ndarray, ordinal: np.ndarray) -> np.ndarray:
+        # dates outside the matrix are clamped to just before / just after the ticker's own range
+        return rank * self.stride + np.clip(ordinal - self.first, 0, self.span + 1)
+
+    def _search(self, rank: np.ndarray, ordinal: np.ndarray) -> np.ndarray:
+        # sorted needles walk the keys in order, which is much kinder to the cache than random lookups
+        needles = self._key(rank, ordinal)
+        order = np.argsort(needles, kind='stable')
+        index = np.empty(len(needles), dtype=np.int64)
+        index[order] = np.searchsorted(self.key, needles[order], side='left')
+        return index
+
+    def on_or_after(self, rank: np.ndarray, ordinal: np.ndarray, before: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Index of the first price of each ticker on or after ordinal and before `before`, and whether there is one."""
+        index = self._search(rank, ordinal)
+        safe = np.minimum(index, len(self.key) - 1)
+        found = (self.rank[safe] == rank) & (self.ordinal[safe] >= ordinal) & (self.ordinal[safe] < before)
+        return safe, found
+
+    def last_before(self, rank: np.ndarray, ordinal: np.ndarray, since: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Index of the last price of each ticker before ordinal and on or after since, and whether there is one."""
+        index = self._search(rank, ordinal) - 1
+        safe = np.maximum(index, 0)
+        found = (index >= 0) & (self.rank[safe] == rank) & (self.ordinal[safe] < ordinal) & (self.ordinal[safe] >= since)
+        return safe, found
+
+def _returns(stacked: _StackedPrices, rank: np.ndarray, entry: np.ndarray, days: int) -> Dict[str, np.ndarray]:
+    """backtest_one's rules for one horizon, for all events at once."""
+    target = entry + days
+    window_start, window_end = entry - WINDOW_PAD_DAYS, target + WINDOW_PAD_DAYS
+    entry_index, has_entry = stacked.on_or_after(rank, entry, window_end)
+    exit_index, matured = stacked.on_or_after(rank, target, window_end)
+    # an exit date that isn't reached yet falls back to the last price of the window
+    last_index, has_last = stacked.last_before(rank, window_end, window_start)
+    exit_index = np.where(matured, exit_index, last_index)
+    valid = has_entry & (matured | has_last)
+    entry_price, exit_price = stacked.close[entry_index], stacked.close[exit_index]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        returns = np.where(valid, (exit_price - entry_price) / entry_price * 100.0, np.nan)
+    return {"exit_index": exit_index, "valid": valid, "matured": matured & valid, "return": returns}
+
+def event_study(events: pd.DataFrame, prices: pd.DataFrame, horizons: Dict[str, int] = HORIZONS,
+                benchmark: Optional[str] = None) -> pd.DataFrame:
+    """
+    Returns of every (ticker, entry_date) event over every horizon in one vectorized pass over a price matrix
+    (trading days x tickers, as built by price_matrix). For each horizon the result has return_<h> in percent,
+    matured_<h> and exit_trade_date_<h>; with a benchmark column in prices also benchmark_<h> and excess_<h>.
+    Events without a usable price get NaN returns, like backtest_one's errors.
+    """
+    stacked = _StackedPrices(prices)
+    tickers = events['ticker'].tolist()
+    rank = np.array([stacked.columns.get(ticker, -1) for ticker in tickers], dtype=np.int64)
+    entry = _entry_ordinals(events['entry_date'])
+
+    result = pd.DataFrame({'ticker': tickers, 'entry_date': _dates(entry, np.ones(len(entry), dtype=bool))}, index=events.index)
+    # the entry of the longest horizon, shorter ones can lack a price in their narrower window
+    entry_index, has_entry = stacked.on_or_after(rank, entry, entry + max(horizons.values(), default=0) + WINDOW_PAD_DAYS)
+    result['entry_trade_date_used'] = _dates(stacked.ordinal[entry_index], has_entry)
+    result['entry_price_used'] = np.where(has_entry, stacked.close[entry_index], np.nan)
+    for name, days in horizons.items():
+        horizon = _returns(stacked, rank, entry, days)
+        result[f'return_{name}'] = horizon["return"]
+        result[f'matured_{name}'] = horizon["matured"]
+        result[f'exit_trade_date_{name}'] = _dates(stacked.ordinal[horizon["exit_index"]], horizon["valid"])
+
+        if benchmark is not None and benchmark in stacked.columns:
+            benchmark_returns = _returns(stacked, np.full(len(rank), stacked.columns[benchmark]), entry, days)["return"]
+            result[f'benchmark_{name}'] = benchmark_returns
+            result[f'excess_{name}'] = horizon["return"] - benchmark_returns
+    return result
+
+def summarize(results: pd.DataFrame, horizons: Dict[str, int] = HORIZONS, matured_only: bool = True) -> pd.DataFrame:
+    """Per horizon: number of events, mean/median return, share of positive returns and mean excess return."""
+    rows = []
+    for name in horizons:
+        returns = results[f'return_{name}']
+        mask = returns.notna()
+        if matured_only:
+            mask &= results[f'matured_{name}']
+        selected = returns[mask]
+        row = {
+            'horizon': name,
+            'events': int(mask.sum()),
+            'mean_return': selected.mean(),
+            'median_return': selected.median(),
+            'hit_rate': (selected > 0).mean() if len(selected) else np.nan,
+        }
+        if f'excess_{name}' in results:
+            excess = results.loc[mask, f'excess_{name}']
+            row['mean_excess'] = excess.mean()
+            row['excess_hit_rate'] = (excess > 0).mean() if len(excess) else np.nan
+        rows.append(row)
+    return pd.DataFrame(rows).set_index('horizon')
+
+def study_signals(store: PriceStore, events: pd.DataFrame, horizons: Dict[str, int] = HORIZONS,
+                  benchmark: Optional[str] = None) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Load the prices all events need from the price store and run the event study, returns (results, summary)."""
+    entry = _entry_ordinals(events['entry_date'])
+    if len(entry) == 0:
+        empty = event_study(events, pd.DataFrame(), horizons, benchmark)
+        return empty, summarize(empty, horizons)
+    start = date.fromordinal(int(entry.min())) - timedelta(days=WINDOW_PAD_DAYS)
+    end = date.fromordinal(int(entry.max())) + timedelta(days=max(horizons.values()) + WINDOW_PAD_DAYS)
+    tickers = list(events['ticker']) + ([benchmark] if benchmark else [])
+    store.load_many({ticker: (start, end) for ticker in dict.fromkeys(tickers)})
+    results = event_study(events, price_matrix(store, tickers, start, end, fetch=False), horizons, benchmark)
+    return results, summarize(results, horizons)
+
+def main(config_path: str = "config.yaml"):
+    with open(config_path, 'r') as f:
+        config = yaml.safe_load(f)
+    conn = connect(config['database']['file'])
+    events = signal_events(load_purchases(conn))
+    horizons = config['backtest']['horizons']
+    results, summary = study_signals(default_price_store(config_path), events, horizons, config['backtest']['benchmark'])
+
+    # the results replace the previous run, entry_date stays in epoch seconds like the signals
+    results['entry_date'] = events['entry_date']
+    results.to_sql("event_study_gold", conn, if_exists='replace', index=False)
+    conn.close()
+    print(summary.to_string())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+import io
+import json
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from datetime import date, datetime
+from pathlib import Path
+from typing import Dict, Optional, Union
+import pandas as pd
+import yaml
+from rate_limit import TokenBucket
+
+try:
+    import yfinance as yf
+except ImportError:  # only needed by YFinanceProvider, the fixture provider works without it
+    yf = None
+
+# Datasets of a ticker the scorers use: info is a dict, the statements are DataFrames with one column per period
+DATASETS = ["info", "financials", "balance_sheet", "cashflow"]
+
+Dataset = Union[dict, pd.DataFrame]
+
+class FundamentalsProvider(ABC):
+    """Source of fundamentals data, fetch returns one dataset of one ticker."""
+    @abstractmethod
+    def fetch(self, ticker: str, dataset: str) -> Dataset:
+        ...
+
+class YFinanceProvider(FundamentalsProvider):
+    def fetch(self, ticker: str, dataset: str) -> Dataset:
+        if yf is None:
+            raise ImportError("yfinance is required for the yfinance fundamentals provider")
+        return getattr(yf.Ticker(ticker), dataset)
+
+class FixtureProvider(FundamentalsProvider):
+    """
+    Fundamentals from local JSON files, <directory>/<TICKER>.json with one key per dataset. info is stored as
+    an object, statements in pandas' 'split' orientation (DataFrame.to_json(orient='split')).
+    """
+    def __init__(self, directory: str):
+        self.directory = Path(directory)
+        self.fetch_count = 0
+
+    def fetch(self, ticker: str, dataset: str) -> Dataset:
+        self.fetch_count += 1
+        path = self.directory / f"{ticker}.json"
+        if not path.exists():
+            raise KeyError(f"No fixture for {ticker}")
+        with open(path, 'r') as f:
+            data = json.load(f).get(dataset)
+        if dataset == "info":
+            return data or {}
+        return _statement_from_json(json.dumps(data)) if data else pd.DataFrame()
+
+def _statement_to_json(statement: pd.DataFrame) -> str:
+    return statement.to_json(orient='split', date_format='iso')
+
+def _statement_from_json(payload: str) -> pd.DataFrame:
+    statement = pd.read_json(io.StringIO(payload), orient='split')
+    # statement periods are dates, keep them as Timestamps like yfinance does
+    if len(statement.columns):
+        try:
+            statement.columns = pd.to_datetime(statement.columns)
+        except (ValueError, TypeError):
+            pass
+    return statement
+
+class FundamentalsStore:
+    """
+    Read-through cache in front of a provider. Every fetch is kept in SQLite keyed by (ticker, dataset, as_of),
+    as_of being the day it was fetched, and is served again until it is older than the TTL of its dataset.
+    """
+    def __init__(self, provider: FundamentalsProvider, cache_file: str, ttl_hours: Dict[str, float],
+                 rate_limiter: Optional[TokenBucket] = None):
+        self.provider = provider
+        self.ttl_hours = ttl_hours
+        # Only fetches from the provider count against the rate limit, cache hits are free
+        self.rate_limiter = rate_limiter
+        Path(cache_file).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(cache_file, check_same_thread=False)
+        self.conn.execute(""" CREATE TABLE IF NOT EXISTS "fundamentals_cache" (
+                                "ticker"	    TEXT NOT NULL,
+                                "dataset"	    TEXT NOT NULL,
+                                "as_of"	        TEXT NOT NULL,
+                                "fetched_at"	REAL NOT NULL,
+                                "payload"	    TEXT,
+                                PRIMARY KEY("ticker", "dataset", "as_of")
+                            )""")
+        self.conn.commit()
+
+    def _cached(self, ticker: str, dataset: str) -> Optional[str]:
+        max_age = self.ttl_hours.get(dataset, 24) * 60 * 60
+        with self._lock:
+            row = self.conn.execute(""" SELECT payload, fetched_at FROM fundamentals_cache
+                                        WHERE ticker = ? AND dataset = ?
+                                        ORDER BY as_of DESC LIMIT 1""", (ticker, dataset)).fetchone()
+        if row is None or datetime.now().timestamp() - row[1] >= max_age:
+            return None
+        return row[0]
+
+    def get(self, ticker: str, dataset: str) -> Dataset:
+        if dataset not in DATASETS:
+            raise ValueError(f"Unknown dataset '{dataset}', expected one of {', '.join(DATASETS)}")
+        payload = self._cached(ticker, dataset)
+        if payload is None:
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+            data = self.provider.fetch(ticker, dataset)
+            payload = json.dumps(data, default=str) if dataset == "info" else _statement_to_json(data)
+            with self._lock:
+                self.conn.execute(""" INSERT INTO fundamentals_cache (ticker, dataset, as_of, fetched_at, payload)
+                                      VALUES (?, ?, ?, ?, ?)
+                                      ON CONFLICT(ticker, dataset, as_of) DO UPDATE SET
+                                        fetched_at=excluded.fetched_at, payload=excluded.payload""",
+                                  (ticker, dataset, date.today().isoformat(), datetime.now().timestamp(), payload))
+                self.conn.commit()
+            if dataset == "info":
+                return data
+        return json.loads(payload) if dataset == "info" else _statement_from_json(payload)
+
+    def ticker(self, ticker: str) -> "TickerFundamentals":
+        return TickerFundamentals(self, ticker)
+
+    def close(self):
+        self.conn.close()
+
+class TickerFundamentals:
+    """Stand-in for yf.Ticker: each dataset is only fetched (or read from the cache) when a scorer accesses it."""
+    def __init__(self, store: FundamentalsStore, ticker: str):
+        self.store = store
+        self.ticker = ticker
+        self._loaded: Dict[str, Dataset] = {}
+
+    def _get(self, dataset: str) -> Dataset:
+        if dataset not in self._loaded:
+            self._loaded[dataset] = self.store.get(self.ticker, dataset)
+        return self._loaded[dataset]
+
+    @property
+    def info(self) -> dict:
+        return self._get("info")
+
+    @property
+    def financials(self) -> pd.DataFrame:
+        return self._get("financials")
+
+    @property
+    def balance_sheet(self) -> pd.DataFrame:
+        return self._get("balance_sheet")
+
+    @property
+    def cashflow(self) -> pd.DataFrame:
+        return self._get("cashflow")
+
+PROVIDERS = {
+    "yfinance": lambda config: YFinanceProvider(),
+    "fixture": lambda config: FixtureProvider(config['fundamentals']['fixture_directory']),
+}
+
+_default_stores: Dict[str, FundamentalsStore] = {}
+_default_store_lock = threading.Lock()
+
+def load_store(config_path: str = 'config.yaml') -> FundamentalsStore:
+    with open(config_path, 'r') as f:
+        config = yaml.safe_load(f)
+    provider = PROVIDERS[config['fundamentals']['provider']](config)
+    return FundamentalsStore(provider, config['fundamentals']['cache_file'], config['fundamentals']['ttl_hours'],
+                             TokenBucket(config['fundamentals']['requests_per_second']))
+
+def default_store(config_path: str = 'config.yaml') -> FundamentalsStore:
+    """Store configured by config_path, shared by all scorers of the process that use that config."""
+    key = str(Path(config_path).resolve())
+    with _default_store_lock:
+        if key not in _default_stores:
+            _default_stores[key] = load_store(config_path)
+        return _default_stores[key]
@@ -1,11 +1,16 @@
-import yfinance as yf
+import pandas as pd
+import yaml
+from batch_scoring import score_batch
+from fundamentals import FundamentalsStore, default_store
+from scoring_engine import model, score_metrics
 
-def score_stocks(tickers: list[str]) -> dict:
+def score_stocks(tickers: list[str], store: FundamentalsStore | None = None, config_path: str = 'config.yaml') -> dict:
     results = {}
+    store = store or default_store(config_path)
     
     for ticker in tickers:
         try:
-            stock = yf.Ticker(ticker)
+            stock = store.ticker(ticker)
 
             # Financial data
             fin = stock.financials
@@ -45,30 +50,11 @@ def score_stocks(tickers: list[str]) -> dict:
                 metrics["pe_ratio"] = None
 
             # ---- Scoring ----
-            score = 0
-
-            # Profitability
-            if metrics["profit_margin"] is not None:
-                if metrics["profit_margin"] > 0.1: score += 20
-                elif metrics["profit_margin"] > 0: score += 10
-
-            # Growth
-            if metrics["revenue_growth"] is not None:
-                if metrics["revenue_growth"] > 0.1: score += 25
-                elif metrics["revenue_growth"] > 0.05: score += 15
-
-            # Debt ratio
-            if metrics["de_ratio"] is not None:
-                if metrics["de_ratio"] < 1: score += 20
-                elif metrics["de_ratio"] < 2: score += 10
-
-            # Valuation (P/E)
-            if metrics["pe_ratio"] is not None:
-                if 5 <= metrics["pe_ratio"] <= 25: score += 20
-                elif 0 < metrics["pe_ratio"] <= 40: score += 10
+            # Tiers are the "multi" model of scoring_rules.yaml
+            score = int(score_metrics(pd.DataFrame([metrics]), model("multi", config_path))["score"].iloc[0])
 
             results[ticker] = {
-                "score": min(score, 100),
+                "score": score,
                 "metrics": metrics
             }
 
@@ -81,9 +67,15 @@ def score_stocks(tickers: list[str]) -> dict:
     
     return results
 
-def main():
+def main(config_path: str = "config.yaml"):
     tickers = ["NVDA", "MSFT", "AAPL", "AMZN", "META", "AVGO", "GOOGL", "GOOG", "TSLA", "NFLX", "COST", "PLTR", "ASML", "TMUS", "CSCO", "AMD", "AZN", "LIN", "PEP", "SHOP", "INTU", "BKNG", "PDD", "QCOM", "TXN", "APP", "ISRG", "AMGN", "ADBE", "ARM", "MU", "GILD", "HON", "PANW", "LRCX", "AMAT", "CMCSA", "MELI", "ADP", "ADI", "KLAC", "SNPS", "INTC", "DASH", "CRWD", "VRTX", "SBUX", "CEG", "CDNS", "MSTR", "ORLY", "CTAS", "TRI", "MDLZ", "ABNB", "MAR", "ADSK", "PYPL", "MNST", "WDAY", "CSX", "REGN", "FTNT", "AEP", "AXON", "NXPI", "ROP", "FAST", "MRVL", "PCAR", "IDXX", "ROST", "PAYX", "CPRT", "DDOG", "BKR", "TTWO", "TEAM", "EXC", "XEL", "EA", "ZS", "FANG", "KDP", "CCEP", "CSGP", "VRSK", "CHTR", "MCHP", "CTSH", "GEHC", "KHC", "DXCM", "ODFL", "WBD", "TTD", "CDW", "BIIB", "LULU", "ON", "GFS"]
-    scores = score_stocks(tickers)
+    with open(config_path, 'r') as f:
+        config = yaml.safe_load(f)
+
+    # one ticker per task, so the tickers are scored concurrently and a failing one only affects itself
+    scores = {}
+    for result in score_batch(tickers, lambda ticker: score_stocks([ticker], config_path=config_path)[ticker], config['scoring']['max_workers'], config['scoring']['timeout']):
+        scores[result.ticker] = result.result if result.result else {"score": None, "metrics": {}, "error": result.error}
     print(scores)
 
 if __name__ == "__main__":
@@ -1,19 +1,29 @@
+import argparse
+import asyncio
+import hashlib
 import requests
-from bs4 import BeautifulSoup
-import pandas as pd
 import yaml
 import logging
 import os
 from datetime import datetime, timedelta
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED
 from tqdm import tqdm
 from retry import retry
 from pathlib import Path
 import json
-from typing import Dict, List, Set, Union, Optional
-from dataclasses import dataclass
+from typing import Dict, Iterator, List, Mapping, Set, Union, Optional
+from dataclasses import dataclass, replace
 from logging.handlers import RotatingFileHandler
 from database_handler import insider_trading_db_handler
+from parse_worker import PageFilters, parse_page, parse_workers
+from screener_query import ScreenerFilter, build_screener_url, ticker_queries
+from range_planner import RangePlanner, RangeRequest, SCREENER_PAGE_SIZE
+from session_pool import SessionPool
+from rate_limit import TokenBucket
+from async_fetcher import AsyncFetcher
+from raw_cache import RawResponseCache
+from output_writer import RowsWriter, open_rows_writer
 
 @dataclass
 class ScraperConfig:
@@ -30,6 +40,7 @@ class ScraperConfig:
     exclude_companies: List[str]
     include_companies: List[str]
     min_shares_traded: int
+    max_ticker_queries: int
     log_level: str
     log_file: str
     rotate_logs: bool
@@ -37,6 +48,17 @@ class ScraperConfig:
     cache_enabled: bool
     cache_dir: str
     cache_max_age: int
+    raw_cache_enabled: bool
+    raw_cache_max_size: float
+    incremental: bool
+    closed_month_grace_days: int
+    db_file: str
+    db_batch_size: int
+    parser: str
+    engine: str
+    requests_per_second: float
+    max_in_flight_months: int
+    parse_workers: int
 
 class OpenInsiderScraper:
     def __init__(self, config_path: str = 'config.yaml'):
@@ -47,6 +69,12 @@ class OpenInsiderScraper:
         self.field_names = [
                     "X", "filing_date", "trade_date", "ticker", "company_name", "insider_name", "title", "trade_type", "price", "quantity", "owned", "dOwnedPc", "value"
                 ]
+        self.session_pool = SessionPool(self.config.max_workers)
+        self.rate_limiter = TokenBucket(self.config.requests_per_second)
+        self.raw_cache = (
+            RawResponseCache(str(Path(self.config.cache_dir) / "raw"), self.config.raw_cache_max_size)
+            if self.config.raw_cache_enabled else None
+        )
         
     def _load_config(self, config_path: str) -> ScraperConfig:
         with open(config_path, 'r') as f:
@@ -60,18 +88,30 @@ class OpenInsiderScraper:
             max_workers=config['scraping']['max_workers'],
             retry_attempts=config['scraping']['retry_attempts'],
             timeout=config['scraping']['timeout'],
+            incremental=config['scraping']['incremental'],
+            closed_month_grace_days=config['scraping']['closed_month_grace_days'],
+            parser=config['scraping']['parser'],
+            engine=config['scraping']['engine'],
+            requests_per_second=config['scraping']['requests_per_second'],
+            max_in_flight_months=config['scraping']['max_in_flight_months'],
+            parse_workers=config['scraping']['parse_workers'],
             min_transaction_value=config['filters']['min_transaction_value'],
             transaction_types=config['filters']['transaction_types'],
             exclude_companies=config['filters']['exclude_companies'],
             include_companies=config['filters']['include_companies'],
             min_shares_traded=config['filters']['min_shares_traded'],
+            max_ticker_queries=config['filters']['max_ticker_queries'],
             log_level=config['logging']['level'],
             log_file=config['logging']['file'],
             rotate_logs=config['logging']['rotate_logs'],
             max_log_size=config['logging']['max_log_size'],
             cache_enabled=config['cache']['enabled'],
             cache_dir=config['cache']['directory'],
-            cache_max_age=config['cache']['max_age']
+            cache_max_age=config['cache']['max_age'],
+            raw_cache_enabled=config['cache']['raw_enabled'],
+            raw_cache_max_size=config['cache']['raw_max_size'],
+            db_file=config['database']['file'],
+            db_batch_size=config['database']['batch_size']
         )
     
     def _setup_logging(self) -> None:
@@ -90,11 +130,18 @@ class OpenInsiderScraper:
         
         logger = logging.getLogger('openinsider')
         logger.setLevel(log_level)
+        # The logger is shared by every scraper of the process, handlers of an earlier one are replaced, not
+        # added to, or every line would be logged once per scraper
+        for previous in [h for h in logger.handlers if getattr(h, 'scraper_handler', False)]:
+            logger.removeHandler(previous)
+            previous.close()
+        handler.scraper_handler = True
         logger.addHandler(handler)
-        
+
         # Add console output
         console_handler = logging.StreamHandler()
         console_handler.setFormatter(formatter)
+        console_handler.scraper_handler = True
         logger.addHandler(console_handler)
     
     def _setup_directories(self) -> None:
@@ -103,160 +150,426 @@ class OpenInsiderScraper:
             Path(self.config.cache_dir).mkdir(parents=True, exist_ok=True)
     
     @retry(tries=3, delay=2, backoff=2)
-    def _fetch_data(self, url: str) -> requests.Response:
-        return requests.get(url, timeout=self.config.timeout)
+    def _fetch_data(self, url: str, headers: Optional[Dict[str, str]] = None) -> requests.Response:
+        # Every attempt takes a token, so retries are rate limited like first attempts
+        self.rate_limiter.acquire()
+        with self.session_pool.session() as session:
+            return session.get(url, timeout=self.config.timeout, headers=headers)
     
     def _get_cache_path(self, year: int, month: int) -> Path:
-        return Path(self.config.cache_dir) / f"data_{year}_{month}.json"
+        # The filtered rows depend on the filter settings, so each filter combination gets its own file
+        return Path(self.config.cache_dir) / f"data_{year}_{month}_{self._filters_fingerprint()}.json"
+    
+    def _filters_fingerprint(self) -> str:
+        filters = [
+            self.config.min_transaction_value, self.config.transaction_types, self.config.exclude_companies,
+            self.config.include_companies, self.config.min_shares_traded
+        ]
+        return hashlib.sha1(json.dumps(filters).encode('utf-8')).hexdigest()[:10]
+    
+    def _get_month_range(self, year: int, month: int) -> tuple[datetime, datetime]:
+        start_date = datetime(year, month, 1)
+        end_date = (start_date + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+        return start_date, end_date
     
-    def _is_cache_valid(self, cache_path: Path) -> bool:
+    def _month_closed_at(self, year: int, month: int) -> datetime:
+        """A month is closed once its last filing day plus the grace period has passed."""
+        _, end_date = self._get_month_range(year, month)
+        return end_date + timedelta(days=1 + self.config.closed_month_grace_days)
+    
+    def _is_month_closed(self, year: int, month: int) -> bool:
+        return datetime.now() >= self._month_closed_at(year, month)
+    
+    def _is_cache_valid(self, cache_path: Path, closed_at: Optional[datetime] = None) -> bool:
         if not cache_path.exists():
             return False
-        cache_age = datetime.now().timestamp() - cache_path.stat().st_mtime
+        written_at = cache_path.stat().st_mtime
+        if closed_at is not None:
+            # Only a cache written after the month closed is final, an earlier one may miss late filings
+            return written_at >= closed_at.timestamp()
+        cache_age = datetime.now().timestamp() - written_at
         return cache_age < self.config.cache_max_age * 3600
     
-    def _get_data_for_month(self, year: int, month: int) -> Set[tuple]:
+    def _load_month_cache(self, year: int, month: int) -> Optional[Set[tuple]]:
         cache_path = self._get_cache_path(year, month)
+        closed_at = self._month_closed_at(year, month) if self._is_month_closed(year, month) else None
+        if not (self.config.cache_enabled and self._is_cache_valid(cache_path, closed_at)):
+            return None
+        with open(cache_path, 'r') as f:
+            return set(tuple(x) for x in json.load(f))
+    
+    def _save_month_cache(self, year: int, month: int, data: Set[tuple]) -> None:
+        if self.config.cache_enabled and (year, month) not in self._failed_months:
+            with open(self._get_cache_path(year, month), 'w') as f:
+                json.dump([list(x) for x in data], f)
+    
+    def _build_url(self, request: RangeRequest) -> str:
+        screener_filter = request.screener_filter or ScreenerFilter.from_config(self.config, request.ticker)
+        return build_screener_url(request.start_date, request.end_date, request.page, SCREENER_PAGE_SIZE, screener_filter)
+    
+    @staticmethod
+    def _cache_group(request: RangeRequest) -> str:
+        # Pages of one range and page number under any server-side filter
+        return f"{request.start_date}|{request.end_date}|{request.page}|{SCREENER_PAGE_SIZE}"
+    
+    @staticmethod
+    def _cached_filter(entry: dict) -> ScreenerFilter:
+        # Entries cached before the filter was recorded still have it in their URL
+        meta = entry.get('meta') or {}
+        if 'screener_filter' in meta:
+            return ScreenerFilter.from_dict(meta['screener_filter'])
+        return ScreenerFilter.from_url(entry['url'])
+    
+    def _cache_max_age(self, request: RangeRequest) -> float:
+        closed_at = self._month_closed_at(request.year, request.month)
+        now = datetime.now()
+        if now >= closed_at:
+            # A page fetched before the month closed may miss late filings, it has to be fetched once more
+            return (now - closed_at).total_seconds()
+        return self.config.cache_max_age * 3600
+    
+    def _with_screener_filter(self, request: RangeRequest) -> RangeRequest:
+        """
+        Pick the server-side filter of a request. A fresh cached page fetched with a wider filter than the
+        config's is reused, the client-side filters drop the extra rows, so narrowing the filters needs no
+        downloads. Follow-up pages of a single day keep the filter of their first page.
+        """
+        if request.screener_filter is not None:
+            return request
+        wanted = ScreenerFilter.from_config(self.config, request.ticker)
+        if self.raw_cache is not None:
+            now = datetime.now().timestamp()
+            max_age = self._cache_max_age(request)
+            fresh = [self._cached_filter(entry) for entry in self.raw_cache.group_entries(self._cache_group(request))
+                     if now - entry['fetched_at'] < max_age]
+            if wanted not in fresh:
+                wanted = next((cached for cached in fresh if cached.covers(wanted)), wanted)
+        return replace(request, screener_filter=wanted)
+    
+    def _get_cached_page(self, request: RangeRequest, url: str) -> Optional[str]:
+        """Raw page from the response cache if it is still fresh, pages fetched after their month closed never expire."""
+        if self.raw_cache is None:
+            return None
+        return self.raw_cache.get(url, self._cache_max_age(request))
+    
+    def _conditional_headers(self, url: str) -> Dict[str, str]:
+        headers = {}
+        entry = self.raw_cache.entry(url) if self.raw_cache is not None else None
+        if entry:
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+    
+    def _store_response(self, request: RangeRequest, url: str, status_code: int, headers: Mapping[str, str], text: str) -> Optional[str]:
+        """
+        Keep a fetched page in the response cache and return the page to parse, None for a 304 whose cached
+        copy is gone in the meantime.
+        """
+        if self.raw_cache is None:
+            return text
+        if status_code == 304:
+            # Nothing changed since the cached copy, so it is parsed again instead of downloaded
+            cached = self.raw_cache.get(url)
+            if cached is not None:
+                self.raw_cache.touch(url)
+                return cached
+            return None
+        if status_code == 200:
+            # The server-side filter is recorded, so a reparse can tell whether the page holds every row the config wants
+            screener_filter = request.screener_filter or ScreenerFilter.from_config(self.config, request.ticker)
+            self.raw_cache.put(url, text, headers.get('ETag'), headers.get('Last-Modified'),
+                               self._cache_group(request), {'screener_filter': screener_filter.to_dict()})
+        return text
+    
+    def _fetch_page(self, request: RangeRequest) -> bytes:
+        """Fetch one screener page (I/O only, it is parsed in the parse pool)."""
+        url = self._build_url(request)
+        page = self._get_cached_page(request, url)
+        if page is None:
+            response = self._fetch_data(url, self._conditional_headers(url))
+            page = self._store_response(request, url, response.status_code, response.headers, response.text)
+        if page is None:
+            # The cached copy the 304 refers to was evicted, download the whole page
+            response = self._fetch_data(url)
+            page = self._store_response(request, url, response.status_code, response.headers, response.text) or response.text
+        return page.encode('utf-8')
+    
+    async def _fetch_page_async(self, fetcher: AsyncFetcher, request: RangeRequest) -> bytes:
+        url = self._build_url(request)
+        # Reading and writing the response cache (gzip, manifest) blocks, it runs in a thread so the event
+        # loop keeps the other requests going
+        page = await asyncio.to_thread(self._get_cached_page, request, url)
+        if page is None:
+            result = await fetcher.get(url, self._conditional_headers(url))
+            page = await asyncio.to_thread(self._store_response, request, url, result.status_code, result.headers, result.text)
+        if page is None:
+            result = await fetcher.get(url)
+            page = await asyncio.to_thread(self._store_response, request, url, result.status_code, result.headers, result.text) or result.text
+        return page.encode('utf-8')
+    
+    def _submit_parse(self, parse_pool: ProcessPoolExecutor, page: bytes) -> Future:
+        return parse_pool.submit(parse_page, page, tuple(self.field_names), self.config.parser, PageFilters.from_config(self.config))
+    
+    def _parsed(self, request: Optional[RangeRequest], result: tuple[int, Optional[List[tuple]]]) -> tuple[int, Set[tuple]]:
+        """Number of rows on the page before filtering and the filtered rows of a parse_page result."""
+        row_count, rows = result
+        if rows is None:
+            if request is not None:
+                self.logger.error(f"No table found for {request.start_date} - {request.end_date} (page {request.page})")
+                self._failed_months.add((request.year, request.month))
+            return 0, set()
+        return row_count, set(rows)
+    
+    def _parse_pool(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(max_workers=parse_workers(self.config.parse_workers))
+    
+    def _start_run(self) -> List[tuple[int, int]]:
+        """Open the bronze table and return the months that have to be scraped."""
+        current_year = datetime.now().year
+        current_month = datetime.now().month
         
-        if self.config.cache_enabled and self._is_cache_valid(cache_path):
-            with open(cache_path, 'r') as f:
-                return set(tuple(x) for x in json.load(f))
-        
-        start_date = datetime(year, month, 1).strftime('%m/%d/%Y')
-        end_date = (datetime(year, month, 1) + timedelta(days=32)).replace(day=1) - timedelta(days=1)
-        end_date = end_date.strftime('%m/%d/%Y')
-        
-        url = f'http://openinsider.com/screener?s=&o=&pl=&ph=&ll=&lh=&fd=-1&fdr={start_date}+-+{end_date}&td=0&tdr=&fdlyl=&fdlyh=&daysago=&xp=1&xs=1&vl=&vh=&ocl=&och=&sic1=-1&sicl=100&sich=9999&grp=0&nfl=&nfh=&nil=&nih=&nol=&noh=&v2l=&v2h=&oc2l=&oc2h=&sortcol=0&cnt=5000&page=1'
+        # Without incremental mode the bronze table is rebuilt from scratch like before
+        self.db_handler = insider_trading_db_handler(
+            "transactions_bronze", self.config.db_file,
+            recreate=not self.config.incremental, max_backlog_size=self.config.db_batch_size
+        )
+        final_months = self.db_handler.get_final_months(self._filters_fingerprint()) if self.config.incremental else set()
+        self._failed_months = set()
+        self._rows_found = 0
+        skipped_months = 0
+        months = []
         
-        response = self._fetch_data(url)
-        soup = BeautifulSoup(response.text, 'html.parser')
-        table = soup.find('table', {'class': 'tinytable'})
-        if not table:
-            self.logger.error(f"No table found for {month}-{year}")
-            return set()
+        for year in range(self.config.start_year, current_year + 1):
+            start_month = 1 if year != self.config.start_year else self.config.start_month
+            end_month = current_month if year == current_year else 12
             
-        rows = table.find('tbody').findAll('tr')
-        data = set()
+            for month in range(start_month, end_month + 1):
+                # Closed months already stored with the current filters are immutable, never fetch them again
+                if (year, month) in final_months:
+                    skipped_months += 1
+                    continue
+                months.append((year, month))
         
-        for row in rows:
-            cols = row.findAll('td')
-            if not cols:
+        self.logger.info(f"Skipping {skipped_months} closed months, fetching {len(months)} months.")
+        return months
+    
+    def _open_output(self) -> RowsWriter:
+        return open_rows_writer(Path(self.config.output_dir) / self.config.output_file, self.config.output_format, self.field_names)
+    
+    def _export_output(self) -> RowsWriter:
+        """
+        Write the output file from transactions_bronze in batches. An incremental run only fetches the months
+        that aren't final yet, the output still holds every stored month.
+        """
+        columns = ', '.join(f'"{field}"' for field in self.field_names)
+        cursor = self.db_handler.connection.execute(f"SELECT {columns} FROM transactions_bronze ORDER BY id")
+        with self._open_output() as writer:
+            while True:
+                rows = cursor.fetchmany(self.config.db_batch_size)
+                if not rows:
+                    break
+                writer.write(rows)
+        return writer
+    
+    def _store_month(self, year: int, month: int, data: Set[tuple], pbar: tqdm) -> None:
+        # The month goes to the database, then it is dropped from memory
+        self._write_month(year, month, data)
+        self._rows_found += len(data)
+        pbar.update(1)
+    
+    def _start_months(self, months: Iterator[tuple[int, int]], planner: RangePlanner, tickers: List[str], pbar: tqdm) -> List[RangeRequest]:
+        """
+        Open months until max_in_flight_months are being fetched and return their initial requests. This
+        bounds the rows held in memory no matter how many months the run covers. Cached months are stored right away.
+        """
+        requests = []
+        while planner.open_months < self.config.max_in_flight_months:
+            next_month = next(months, None)
+            if next_month is None:
+                break
+            year, month = next_month
+            data = self._load_month_cache(year, month)
+            if data is not None:
+                self._store_month(year, month, data, pbar)
                 continue
-                
-            insider_data = {
-                key: (cols[index].find('a').text.strip() if cols[index].find('a') 
-                    else cols[index].get_text(strip=True))
-                
-                    for index, key in enumerate(self.field_names)
-            }
-            
-            # Apply filters
-            if self._apply_filters(insider_data):
-                data.add(tuple(insider_data.values()))
+            start_date, end_date = self._get_month_range(year, month)
+            requests.extend(planner.start_month(year, month, start_date.date(), end_date.date(), tickers))
+        return requests
+    
+    def _complete_range(self, planner: RangePlanner, request: RangeRequest, row_count: int, rows: Set[tuple], pbar: tqdm) -> List[RangeRequest]:
+        """Register a finished request, store its month if it was the last one and return the requests to schedule next."""
+        # Full pages were truncated by the screener and get split into smaller ranges
+        follow_ups, data = planner.complete(request, row_count, rows)
+        if follow_ups:
+            self.logger.debug(f"Page for {request.start_date} - {request.end_date} is full, splitting into {len(follow_ups)} requests")
+        if data is not None:
+            # Each month goes into the database as soon as all of its ranges are done
+            self._save_month_cache(request.year, request.month, data)
+            self._store_month(request.year, request.month, data, pbar)
+        return follow_ups
+    
+    def scrape(self) -> None:
+        self.logger.info("Starting scraping process...")
         
-        # Save cache
-        if self.config.cache_enabled:
-            with open(cache_path, 'w') as f:
-                json.dump([list(x) for x in data], f)
+        months = self._start_run()
+        planner = RangePlanner()
+        tickers = ticker_queries(self.config)
         
-        return data
-    
-    def _clean_numeric(self, value: str) -> float:
-        """Clean numeric values from strings, handling currency, percentages, and text."""
-        if not value or value.lower() in ['n/a', 'new']:
-            return 0.0
-        # Remove currency symbols and commas
-        clean = value.replace('$', '').replace(',', '')
-        # Handle percentages by removing % and converting to decimal
-        if '%' in clean:
-            clean = clean.replace('+', '').replace('%', '')
-            return 0.0  # We don't need the actual percentage value
-        try:
-            return float(clean)
-        except ValueError:
-            return 0.0  # Return 0 for any non-numeric values
-
-    def _apply_filters(self, data: Dict[str, str]) -> bool:
-        # Check transaction type filter
-        if self.config.transaction_types and data['transaction_type'] not in self.config.transaction_types:
-            return False
+        # Threads only fetch, parsing runs in the process pool so it isn't serialized by the GIL
+        with ThreadPoolExecutor(max_workers=self.config.max_workers) as executor, self._parse_pool() as parse_pool:
+            fetches = {}
+            parses = {}
             
-        # Check excluded companies
-        if data['ticker'] in self.config.exclude_companies:
-            return False
-
-        # Check included companies
-        if self.config.include_companies and data['ticker'] not in self.config.include_companies:
-            return False
-
-        # Convert and check value
-        data['owned'] = self._clean_numeric(data['owned'])
-        data['price'] = self._clean_numeric(data['price'])
-        data['dOwnedPc'] = self._clean_numeric(data['dOwnedPc'])
-        
-        data['value'] = self._clean_numeric(data['value'])
-        if data['value'] < self.config.min_transaction_value:
-            return False
+            def submit(requests: List[RangeRequest]) -> None:
+                for request in map(self._with_screener_filter, requests):
+                    fetches[executor.submit(self._fetch_page, request)] = request
             
-        # Convert and check quantity
-        data['quantity'] = self._clean_numeric(data['quantity'])
-        if data['quantity'] < self.config.min_shares_traded:
-            return False
+            with tqdm(total=len(months), desc="Processing months") as pbar:
+                pending_months = iter(months)
+                submit(self._start_months(pending_months, planner, tickers, pbar))
+                
+                while fetches or parses:
+                    done, _ = wait([*fetches, *parses], return_when=FIRST_COMPLETED)
+                    for future in done:
+                        if future in fetches:
+                            request = fetches.pop(future)
+                            parses[self._submit_parse(parse_pool, future.result())] = request
+                            continue
+                        request = parses.pop(future)
+                        row_count, rows = self._parsed(request, future.result())
+                        submit(self._complete_range(planner, request, row_count, rows, pbar))
+                    # Completed months make room for the next ones
+                    submit(self._start_months(pending_months, planner, tickers, pbar))
         
-        return True
+        self._finish_run()
     
-    def scrape(self) -> None:
-        self.logger.info("Starting scraping process...")
+    def scrape_async(self) -> None:
+        asyncio.run(self._scrape_async())
+    
+    async def _scrape_async(self) -> None:
+        self.logger.info("Starting async scraping process...")
         
-        all_data = []
-        current_year = datetime.now().year
-        current_month = datetime.now().month
+        months = self._start_run()
+        planner = RangePlanner()
+        tickers = ticker_queries(self.config)
         
-        with ThreadPoolExecutor(max_workers=self.config.max_workers) as executor:
-            futures = []
-            total_months = sum(
-                12 if year != current_year else current_month
-                for year in range(self.config.start_year, current_year + 1)
-            )
-            
-            for year in range(self.config.start_year, current_year + 1):
-                start_month = 1 if year != self.config.start_year else self.config.start_month
-                end_month = current_month if year == current_year else 12
+        with self._parse_pool() as parse_pool:
+            async with AsyncFetcher(
+                concurrency=self.config.max_workers, rate_limiter=self.rate_limiter,
+                timeout=self.config.timeout, retries=self.config.retry_attempts
+            ) as fetcher:
+                tasks = {}
                 
-                for month in range(start_month, end_month + 1):
-                    futures.append(executor.submit(self._get_data_for_month, year, month))
-            
-            with tqdm(total=len(futures), desc="Processing months") as pbar:
-                for future in as_completed(futures):
-                    data = future.result()
-                    all_data.extend(data)
-                    pbar.update(1)
+                async def fetch_and_parse(request: RangeRequest) -> tuple[int, Set[tuple]]:
+                    page = await self._fetch_page_async(fetcher, request)
+                    # Parsing is CPU bound and would otherwise stall every other request on the event loop
+                    return self._parsed(request, await asyncio.wrap_future(self._submit_parse(parse_pool, page)))
+                
+                def submit(requests: List[RangeRequest]) -> None:
+                    for request in map(self._with_screener_filter, requests):
+                        tasks[asyncio.create_task(fetch_and_parse(request))] = request
+                
+                with tqdm(total=len(months), desc="Processing months") as pbar:
+                    pending_months = iter(months)
+                    submit(self._start_months(pending_months, planner, tickers, pbar))
+                    
+                    while tasks:
+                        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                        for task in done:
+                            request = tasks.pop(task)
+                            row_count, rows = task.result()
+                            submit(self._complete_range(planner, request, row_count, rows, pbar))
+                        submit(self._start_months(pending_months, planner, tickers, pbar))
         
-        self.logger.info(f"Scraping completed. Found {len(all_data)} transactions.")
-        self._save_data(all_data)
+        self._finish_run()
     
-    def _save_data(self, data: List[tuple]) -> None:
-        df = pd.DataFrame(data, columns=self.field_names)
-        output_path = Path(self.config.output_dir) / self.config.output_file
+    def reparse_from_cache(self) -> None:
+        """
+        Parse the raw response cache again with the current parser and filters, without network access, and
+        upsert the rows into transactions_bronze. The cache evicts pages, so rows it no longer holds are kept
+        as they are, and so are the watermarks. Pages fetched with a narrower server-side filter than the
+        config's are parsed as well, but they lack rows the config wants, so they are counted and warned about.
+        """
+        if self.raw_cache is None:
+            raise ValueError("The raw response cache is disabled, nothing to reparse")
+        self.logger.info("Reparsing the raw response cache into bronze...")
         
-        self.db_handler = insider_trading_db_handler("transactions_bronze", "insider_trades.db")
-        for row in data:
-            self.db_handler.write_to_db(self.field_names, tuple(row))
+        self._failed_months = set()
+        self._rows_found = 0
+        self.db_handler = insider_trading_db_handler(
+            "transactions_bronze", self.config.db_file, max_backlog_size=self.config.db_batch_size
+        )
+        changes_before = self.db_handler.connection.total_changes
         
+        entries = sorted(self.raw_cache.entries(), key=lambda entry: entry['fetched_at'])
+        tickers = ticker_queries(self.config)
+        narrower_pages = 0
+        with self._parse_pool() as parse_pool:
+            # A bounded window of pages is parsed ahead, results are written in cache order
+            parses = deque()
+            
+            def store_oldest() -> None:
+                _, data = self._parsed(None, parses.popleft().result())
+                # Truncated pages overlap with their sub-ranges, the natural key merges the duplicates
+                self._rows_found += self.db_handler.write_many(self.field_names, data, upsert=True)
+            
+            for entry in tqdm(entries, desc="Reparsing pages"):
+                page = self.raw_cache.get(entry['url'])
+                if page is None:
+                    continue
+                cached_filter = self._cached_filter(entry)
+                wanted = ScreenerFilter.from_config(self.config, cached_filter.ticker if cached_filter.ticker in tickers else "")
+                if not cached_filter.covers(wanted):
+                    narrower_pages += 1
+                parses.append(self._submit_parse(parse_pool, page.encode('utf-8')))
+                if len(parses) >= 2 * parse_workers(self.config.parse_workers):
+                    store_oldest()
+            while parses:
+                store_oldest()
+        
+        self.db_handler.commit()
+        if narrower_pages:
+            self.logger.warning(
+                f"{narrower_pages} cached pages were fetched with narrower server-side filters (trade types, minimum value "
+                f"or ticker) than the config, their rows outside those filters are missing. Scrape again to fetch them."
+            )
+        changed = self.db_handler.connection.total_changes - changes_before
+        if changed:
+            self.logger.info(f"Reparsing added or updated {changed} bronze rows, updated rows reach gold with cleaner.py --full-rebuild.")
+        self._finish_run()
+    
+    def _finish_run(self) -> None:
         self.db_handler.commit()
+        writer = self._export_output()
         self.db_handler.close()
-        
-        if self.config.output_format.lower() == 'csv':
-            df.to_csv(output_path, index=False)
-        elif self.config.output_format.lower() == 'parquet':
-            df.to_parquet(output_path, index=False)
-        
-        self.logger.info(f"Data saved to {output_path}")
-
+        self.session_pool.close()
+        if self.raw_cache is not None:
+            self.raw_cache.save()
+        self.logger.info(f"Scraping completed. Found {self._rows_found} transactions.")
+        self.logger.info(f"Data saved to {writer.path} ({writer.rows_written} transactions)")
+    
+    def _write_month(self, year: int, month: int, data: Set[tuple]) -> None:
+        self.db_handler.write_many(self.field_names, data)
+        # The watermark is committed in the same transaction as the last batch of its month
+        is_final = self._is_month_closed(year, month) and (year, month) not in self._failed_months
+        self.db_handler.mark_month(year, month, len(data), datetime.now().isoformat(), is_final, self._filters_fingerprint())
+        self.db_handler.commit()
+    
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Scrape insider trades from openinsider.com into transactions_bronze")
+    parser.add_argument('--config', default='config.yaml')
+    parser.add_argument('--reparse-cache', action='store_true', help="Rebuild bronze from the raw response cache without network access")
+    args = parser.parse_args()
     try:
-        scraper = OpenInsiderScraper()
-        scraper.scrape()
+        scraper = OpenInsiderScraper(args.config)
+        if args.reparse_cache:
+            scraper.reparse_from_cache()
+        elif scraper.config.engine == 'async':
+            scraper.scrape_async()
+        else:
+            scraper.scrape()
     except Exception as e:
         logging.error(f"Kritischer Fehler: {str(e)}")
         raise
@@ -0,0 +1,95 @@
+import csv
+import os
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Iterable, List
+from screener_transform import NUMERIC_FIELDS
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # only needed for parquet output
+    pa = None
+    pq = None
+
+class RowsWriter(ABC):
+    """
+    Appends batches of rows to the output file as they arrive, so the scraped history never has to be held
+    in memory. Rows go to a temporary file that only replaces the previous output once the run completed,
+    an aborted run leaves the last complete file in place.
+    """
+    def __init__(self, path: str, field_names: List[str]):
+        self.path = Path(path)
+        self.tmp_path = self.path.with_name(f".{self.path.name}.tmp")
+        self.field_names = field_names
+        self.rows_written = 0
+
+    @abstractmethod
+    def write(self, rows: Iterable[tuple]) -> None:
+        ...
+
+    @abstractmethod
+    def _close_file(self) -> None:
+        ...
+
+    def close(self) -> None:
+        self._close_file()
+        os.replace(self.tmp_path, self.path)
+
+    def abort(self) -> None:
+        self._close_file()
+        self.tmp_path.unlink(missing_ok=True)
+
+    def __enter__(self) -> "RowsWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+class CsvRowsWriter(RowsWriter):
+    def __init__(self, path: str, field_names: List[str]):
+        super().__init__(path, field_names)
+        self._file = open(self.tmp_path, 'w', newline='', encoding='utf-8')
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(field_names)
+
+    def write(self, rows: Iterable[tuple]) -> None:
+        rows = list(rows)
+        self._writer.writerows(rows)
+        self.rows_written += len(rows)
+
+    def _close_file(self) -> None:
+        self._file.close()
+
+class ParquetRowsWriter(RowsWriter):
+    """Every batch becomes one row group, numeric screener columns are doubles and everything else is text."""
+    def __init__(self, path: str, field_names: List[str]):
+        if pa is None:
+            raise ImportError("pyarrow is required for parquet output")
+        super().__init__(path, field_names)
+        self.schema = pa.schema([(field, pa.float64() if field in NUMERIC_FIELDS else pa.string()) for field in field_names])
+        self._writer = pq.ParquetWriter(self.tmp_path, self.schema)
+
+    def write(self, rows: Iterable[tuple]) -> None:
+        rows = list(rows)
+        if not rows:
+            return
+        columns = [list(column) for column in zip(*rows)]
+        self._writer.write_table(pa.Table.from_arrays(columns, schema=self.schema))
+        self.rows_written += len(rows)
+
+    def _close_file(self) -> None:
+        self._writer.close()
+
+WRITERS = {
+    "csv": CsvRowsWriter,
+    "parquet": ParquetRowsWriter,
+}
+
+def open_rows_writer(path: str, output_format: str, field_names: List[str]) -> RowsWriter:
+    if output_format.lower() not in WRITERS:
+        raise ValueError(f"Unknown output format '{output_format}', expected one of {', '.join(WRITERS)}")
+    return WRITERS[output_format.lower()](path, field_names)
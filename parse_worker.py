@@ -0,0 +1,38 @@
+import os
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+from screener_parser import parse_rows
+from screener_transform import filtered_rows
+
+# Parsing and filtering a page is CPU bound, so it runs in worker processes while threads (or the event
+# loop) keep fetching. Everything here is top level and picklable: raw page bytes go in, filtered row
+# tuples come out, nothing else crosses the process boundary.
+
+@dataclass(frozen=True)
+class PageFilters:
+    """The filter settings of a ScraperConfig that screener_transform.filter_mask reads."""
+    min_transaction_value: float
+    transaction_types: Tuple[str, ...]
+    exclude_companies: Tuple[str, ...]
+    include_companies: Tuple[str, ...]
+    min_shares_traded: float
+
+    @classmethod
+    def from_config(cls, config) -> "PageFilters":
+        return cls(config.min_transaction_value, tuple(config.transaction_types), tuple(config.exclude_companies),
+                   tuple(config.include_companies), config.min_shares_traded)
+
+def parse_page(page: bytes, field_names: Tuple[str, ...], parser: str, filters: PageFilters) -> Tuple[int, Optional[List[tuple]]]:
+    """
+    Number of rows on the page before filtering and the filtered rows, (0, None) if the page holds no
+    screener table.
+    """
+    rows = parse_rows(page.decode('utf-8'), len(field_names), parser)
+    if rows is None:
+        return 0, None
+    # The whole page is cleaned and filtered as one batch
+    return len(rows), list(filtered_rows(rows, list(field_names), filters))
+
+def parse_workers(configured: int) -> int:
+    """Size of the parse pool, 0 means one process per core."""
+    return configured if configured > 0 else (os.cpu_count() or 1)
@@ -0,0 +1,175 @@
+import argparse
+import hashlib
+import json
+import sqlite3
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+import yaml
+from roles import roles_version
+from database_handler import connect
+
+@dataclass
+class Stage:
+    """
+    One step of the pipeline. fingerprint returns everything the stage's output depends on, the stage is
+    skipped while that is the same as on its last successful run. It is only computed once every stage
+    in depends_on has finished, so it sees their output.
+    """
+    name: str
+    run: Callable[[str], None]
+    fingerprint: Callable[[sqlite3.Connection, dict], dict]
+    depends_on: List[str]
+
+def _table_exists(conn: sqlite3.Connection, table: str) -> bool:
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (table,)).fetchone() is not None
+
+def _refresh_window(config: dict, stage: str) -> Optional[int]:
+    # Stages that depend on the outside world (new filings, stale scores) are rerun once per refresh interval
+    hours = config['pipeline']['refresh_hours'].get(stage)
+    return int(time.time() // (hours * 60 * 60)) if hours else None
+
+def bronze_fingerprint(conn: sqlite3.Connection) -> dict:
+    if not _table_exists(conn, "transactions_bronze"):
+        return {}
+    high_water_mark, row_count = conn.execute("SELECT COALESCE(MAX(id), 0), COUNT(*) FROM transactions_bronze").fetchone()
+    # The last row tells a recreated table with the same row count apart
+    last_row = conn.execute("SELECT * FROM transactions_bronze WHERE id = ?", (high_water_mark,)).fetchone()
+    return {'high_water_mark': high_water_mark, 'row_count': row_count,
+            'last_row': hashlib.sha256(repr(last_row).encode()).hexdigest()}
+
+def gold_generation(conn: sqlite3.Connection) -> Optional[str]:
+    if not _table_exists(conn, "gold_state"):
+        return None
+    row = conn.execute("SELECT value FROM gold_state WHERE key='generation'").fetchone()
+    return row[0] if row else None
+
+def run_scrape(config_path: str):
+    from openinsider_scraper import OpenInsiderScraper
+    scraper = OpenInsiderScraper(config_path)
+    if scraper.config.engine == 'async':
+        scraper.scrape_async()
+    else:
+        scraper.scrape()
+
+def run_gold(config_path: str):
+    import cleaner
+    cleaner.main(config_path=config_path)
+
+def run_watchlist(config_path: str):
+    import scorer
+    scorer.main(config_path)
+
+def run_event_study(config_path: str):
+    import event_study
+    event_study.main(config_path)
+
+STAGES = [
+    Stage("scrape", run_scrape,
+          lambda conn, config: {'config': [config['scraping'], config['filters'], config['output']],
+                                'window': _refresh_window(config, "scrape")},
+          []),
+    Stage("gold", run_gold,
+          lambda conn, config: {'bronze': bronze_fingerprint(conn), 'window_days': config['signals']['window_days'],
+                                'roles_version': roles_version()},
+          ["scrape"]),
+    Stage("watchlist", run_watchlist,
+          lambda conn, config: {'gold': gold_generation(conn), 'config': [config['watchlist'], config['scoring'], config['fundamentals']],
+                                'window': _refresh_window(config, "watchlist")},
+          ["gold"]),
+    Stage("event_study", run_event_study,
+          lambda conn, config: {'gold': gold_generation(conn), 'config': [config['backtest'], config['prices']]},
+          ["gold"]),
+]
+
+def create_pipeline_runs_table(conn: sqlite3.Connection):
+    conn.execute(""" CREATE TABLE IF NOT EXISTS "pipeline_runs" (
+                        "id"	        INTEGER NOT NULL UNIQUE,
+                        "run_id"	    TEXT NOT NULL,
+                        "stage"	        TEXT NOT NULL,
+                        "fingerprint"	TEXT,
+                        "status"	    TEXT NOT NULL,
+                        "started_at"	REAL NOT NULL,
+                        "seconds"	    REAL NOT NULL,
+                        "error"	        TEXT,
+                        PRIMARY KEY("id" AUTOINCREMENT)
+                    )""")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_pipeline_runs_stage ON pipeline_runs(stage, status)")
+    conn.commit()
+
+def _last_fingerprint(conn: sqlite3.Connection, stage: str) -> Optional[str]:
+    row = conn.execute(""" SELECT fingerprint FROM pipeline_runs WHERE stage = ? AND status = 'ok'
+                           ORDER BY id DESC LIMIT 1""", (stage,)).fetchone()
+    return row[0] if row else None
+
+def _fingerprint(stage: Stage, conn: sqlite3.Connection, config: dict) -> str:
+    return hashlib.sha256(json.dumps(stage.fingerprint(conn, config), sort_keys=True, default=str).encode()).hexdigest()
+
+def run_pipeline(config_path: str = "config.yaml", stages: List[Stage] = STAGES, force: List[str] = [],
+                 only: Optional[List[str]] = None) -> Dict[str, str]:
+    """
+    Run the stages as a DAG: a stage starts as soon as everything it depends on is done, stages that don't
+    depend on each other run at the same time. Returns {stage: 'ok' | 'skipped' | 'failed' | 'blocked'}.
+    Every stage is recorded in pipeline_runs with its fingerprint, status and duration.
+    """
+    with open(config_path, 'r') as f:
+        config = yaml.safe_load(f)
+    # one connection for the bookkeeping, the stages open their own
+    conn = connect(config['database']['file'])
+    create_pipeline_runs_table(conn)
+    run_id = time.strftime("%Y%m%dT%H%M%S")
+
+    stages = [stage for stage in stages if only is None or stage.name in only]
+    names = {stage.name for stage in stages}
+    pending = {stage.name: stage for stage in stages}
+    status: Dict[str, str] = {}
+    running = {}
+
+    def record(stage: Stage, fingerprint: Optional[str], result: str, started_at: float, error: Optional[str] = None):
+        status[stage.name] = result
+        conn.execute(""" INSERT INTO pipeline_runs (run_id, stage, fingerprint, status, started_at, seconds, error)
+                         VALUES (?, ?, ?, ?, ?, ?, ?)""",
+                     (run_id, stage.name, fingerprint, result, started_at, time.time() - started_at, error))
+        conn.commit()
+        print(f"{stage.name}: {result} ({time.time() - started_at:.2f}s)")
+
+    with ThreadPoolExecutor(max_workers=max(len(stages), 1)) as executor:
+        while pending or running:
+            for name, stage in list(pending.items()):
+                # dependencies outside of this run count as done
+                upstream = [dependency for dependency in stage.depends_on if dependency in names]
+                if any(dependency not in status for dependency in upstream):
+                    continue
+                del pending[name]
+                started_at = time.time()
+                if any(status[dependency] in ("failed", "blocked") for dependency in upstream):
+                    record(stage, None, "blocked", started_at)
+                    continue
+                fingerprint = _fingerprint(stage, conn, config)
+                if name not in force and fingerprint == _last_fingerprint(conn, name):
+                    record(stage, fingerprint, "skipped", started_at)
+                    continue
+                running[executor.submit(stage.run, config_path)] = (stage, fingerprint, started_at)
+
+            if not running:
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage, fingerprint, started_at = running.pop(future)
+                if future.exception() is not None:
+                    error = "".join(traceback.format_exception(future.exception()))
+                    record(stage, fingerprint, "failed", started_at, error)
+                else:
+                    record(stage, fingerprint, "ok", started_at)
+    conn.close()
+    return status
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run scrape -> gold -> watchlist / event study, skipping stages whose inputs are unchanged")
+    parser.add_argument("--config", default="config.yaml")
+    parser.add_argument("--force", nargs="*", default=[], choices=[stage.name for stage in STAGES], help="Run these stages even if their inputs are unchanged")
+    parser.add_argument("--only", nargs="*", choices=[stage.name for stage in STAGES], help="Run only these stages")
+    args = parser.parse_args()
+    run_pipeline(args.config, force=args.force, only=args.only)
@@ -0,0 +1,243 @@
+import csv
+import json
+import os
+import threading
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+import yaml
+from rate_limit import TokenBucket
+
+try:
+    import yfinance as yf
+except ImportError:  # only needed by YFinancePriceSource
+    yf = None
+
+# One record per trading day: proleptic Gregorian ordinal of the date and the adjusted close
+PRICE_DTYPE = np.dtype([('date', '<i8'), ('close', '<f8')])
+# Longest run of calendar days without a trading day, a weekend next to a holiday. A fetch whose closes reach
+# this close to an end of the requested range covers the range up to that end.
+MARKET_CLOSED_DAYS = 4
+# Relative difference of a refetched close from the stored one that means its adjustment changed
+BASIS_TOLERANCE = 1e-6
+
+class PriceSource(ABC):
+    """
+    Source of daily adjusted closes, fetch returns the records of the days in [start, end). Closes are adjusted
+    for the splits and dividends up to the time of the fetch.
+    """
+    @abstractmethod
+    def fetch(self, ticker: str, start: date, end: date) -> np.ndarray:
+        ...
+
+def _records(dates: Iterable[date], closes: Iterable[float]) -> np.ndarray:
+    records = np.array(list(zip((d.toordinal() for d in dates), closes)), dtype=PRICE_DTYPE)
+    return records[~np.isnan(records['close'])]
+
+class YFinancePriceSource(PriceSource):
+    def fetch(self, ticker: str, start: date, end: date) -> np.ndarray:
+        if yf is None:
+            raise ImportError("yfinance is required for the yfinance price source")
+        hist = yf.Ticker(ticker).history(start=start, end=end, interval="1d", auto_adjust=True, actions=False)
+        if hist.empty or "Close" not in hist.columns:
+            return np.empty(0, dtype=PRICE_DTYPE)
+        return _records((timestamp.date() for timestamp in hist.index), hist["Close"].to_numpy(dtype=np.float64))
+
+class FixturePriceSource(PriceSource):
+    """Daily closes from local CSV files, <directory>/<TICKER>.csv with date (YYYY-MM-DD) and close columns."""
+    def __init__(self, directory: str):
+        self.directory = Path(directory)
+        self.fetch_count = 0
+
+    def fetch(self, ticker: str, start: date, end: date) -> np.ndarray:
+        self.fetch_count += 1
+        path = self.directory / f"{ticker}.csv"
+        if not path.exists():
+            return np.empty(0, dtype=PRICE_DTYPE)
+        with open(path, 'r', newline='') as f:
+            rows = [(date.fromisoformat(row['date']), float(row['close'])) for row in csv.DictReader(f)]
+        rows = [(day, close) for day, close in rows if start <= day < end]
+        return _records((day for day, _ in rows), (close for _, close in rows))
+
+class PriceStore:
+    """
+    Local daily price history, one <TICKER>.npy file of PRICE_DTYPE records per ticker that is read as a
+    read-only memory map. manifest.json records the date range the stored closes of each ticker cover, so
+    only the missing days before and after it are ever requested from the source.
+    """
+    def __init__(self, directory: str, source: PriceSource, rate_limiter: Optional[TokenBucket] = None):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.source = source
+        self.rate_limiter = rate_limiter
+        self.manifest_path = self.directory / "manifest.json"
+        self._lock = threading.Lock()
+        self._ticker_locks: Dict[str, threading.Lock] = {}
+        self._maps: Dict[str, np.ndarray] = {}
+        self._manifest: Dict[str, dict] = {}
+        if self.manifest_path.exists():
+            with open(self.manifest_path, 'r') as f:
+                self._manifest = json.load(f)
+
+    def _path(self, ticker: str) -> Path:
+        return self.directory / f"{ticker}.npy"
+
+    def _ticker_lock(self, ticker: str) -> threading.Lock:
+        with self._lock:
+            return self._ticker_locks.setdefault(ticker, threading.Lock())
+
+    def _fetch(self, ticker: str, start: date, end: date) -> np.ndarray:
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire()
+        return self.source.fetch(ticker, start, end)
+
+    def ensure(self, ticker: str, start: date, end: date) -> None:
+        """
+        Make sure the days in [start, end) are stored, fetching only the ranges not covered yet. Coverage only
+        grows to the days the source returned closes for.
+        """
+        # Today's close isn't final yet, it is only ever covered from tomorrow on
+        end = min(end, date.today())
+        if start >= end:
+            return
+        lo, hi = start.toordinal(), end.toordinal()
+        with self._ticker_lock(ticker):
+            with self._lock:
+                covered = self._manifest.get(ticker)
+            if covered is None:
+                ranges, missing = [], [(lo, hi)]
+                stored = np.empty(0, dtype=PRICE_DTYPE)
+            else:
+                ranges = [(covered['start'], covered['end'])]
+                # coverage stays one contiguous range, a request past either end also fills the gap up to it
+                missing = [(a, b) for a, b in [(lo, covered['start']), (covered['end'], hi)] if a < b]
+                stored = self._load(ticker)
+            if not missing:
+                return
+
+            parts = [stored]
+            for a, b in missing:
+                if len(stored):
+                    # overlap the stored closes by one day, it shows whether a split or dividend changed their adjustment
+                    a, b = (a, int(stored['date'][0]) + 1) if a < ranges[0][0] else (int(stored['date'][-1]), b)
+                fetched = self._fetch(ticker, date.fromordinal(a), date.fromordinal(b))
+                rebased = not _same_basis(stored, fetched)
+                if rebased:
+                    # the stored closes are adjusted to an older basis, all of them are fetched again in one go
+                    a, b = min(lo, ranges[0][0]), max(hi, ranges[0][1])
+                    fetched = self._fetch(ticker, date.fromordinal(a), date.fromordinal(b))
+                    parts, ranges = [], []
+                if len(fetched):
+                    parts.append(fetched)
+                    ranges.append(_covered(a, b, fetched))
+                if rebased:
+                    break
+            if not parts or parts[-1] is stored:
+                # nothing was returned, the stored closes and their coverage stay as they are
+                return
+
+            records = np.concatenate(parts)
+            # keep one record per day, sorted by date
+            _, first = np.unique(records['date'], return_index=True)
+            records = records[first]
+
+            tmp_path = self._path(ticker).with_suffix(f".tmp{threading.get_ident()}.npy")
+            np.save(tmp_path, records)
+            os.replace(tmp_path, self._path(ticker))
+
+            with self._lock:
+                self._maps.pop(ticker, None)
+                self._manifest[ticker] = {'start': min(a for a, _ in ranges), 'end': max(b for _, b in ranges)}
+                self._save_manifest()
+
+    def _load(self, ticker: str) -> np.ndarray:
+        with self._lock:
+            records = self._maps.get(ticker)
+        if records is not None:
+            return records
+        path = self._path(ticker)
+        records = np.load(path, mmap_mode='r') if path.exists() else np.empty(0, dtype=PRICE_DTYPE)
+        with self._lock:
+            self._maps[ticker] = records
+        return records
+
+    def prices(self, ticker: str, start: date, end: date, fetch: bool = True) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Date ordinals and adjusted closes of the trading days in [start, end), as views of the memory map.
+        With fetch=False nothing is requested from the source, only what is stored is returned.
+        """
+        if fetch:
+            self.ensure(ticker, start, end)
+        records = self._load(ticker)
+        dates = records['date']
+        lo, hi = np.searchsorted(dates, [start.toordinal(), end.toordinal()])
+        return dates[lo:hi], records['close'][lo:hi]
+
+    def load_many(self, requests: Dict[str, Tuple[date, date]], max_workers: int = 8) -> List[str]:
+        """Ensure the ranges of many tickers concurrently, returns the tickers whose fetch failed."""
+        def ensure(item):
+            ticker, (start, end) = item
+            try:
+                self.ensure(ticker, start, end)
+                return None
+            except Exception:
+                return ticker
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return [ticker for ticker in executor.map(ensure, requests.items()) if ticker is not None]
+
+    def _save_manifest(self) -> None:
+        tmp_path = self.manifest_path.with_suffix(f".tmp{threading.get_ident()}")
+        with open(tmp_path, 'w') as f:
+            json.dump(self._manifest, f)
+        os.replace(tmp_path, self.manifest_path)
+
+def _same_basis(stored: np.ndarray, fetched: np.ndarray) -> bool:
+    """Whether the fetched closes of the days already stored equal the stored closes."""
+    if not len(stored) or not len(fetched):
+        return True
+    _, stored_at, fetched_at = np.intersect1d(stored['date'], fetched['date'], return_indices=True)
+    # a fetch that doesn't reach the stored days can't be compared, it is treated like a changed one
+    if not len(stored_at):
+        return False
+    return bool(np.allclose(fetched['close'][fetched_at], stored['close'][stored_at], rtol=BASIS_TOLERANCE, atol=0))
+
+def _covered(start: int, end: int, records: np.ndarray) -> Tuple[int, int]:
+    """
+    Ordinal range a fetch of [start, end) covers: its first to its last close, extended to an end of the
+    request when no more than a market closure lies in between.
+    """
+    first, last = int(records['date'].min()), int(records['date'].max()) + 1
+    return (start if first - start <= MARKET_CLOSED_DAYS else first,
+            end if end - last <= MARKET_CLOSED_DAYS else last)
+
+def on_or_after(dates: np.ndarray, closes: np.ndarray, day: date) -> Optional[Tuple[float, date]]:
+    """Close and date of the first trading day on or after day, None if there is none."""
+    position = int(np.searchsorted(dates, day.toordinal()))
+    if position >= len(dates):
+        return None
+    return float(closes[position]), date.fromordinal(int(dates[position]))
+
+SOURCES = {
+    "yfinance": lambda config: YFinancePriceSource(),
+    "fixture": lambda config: FixturePriceSource(config['prices']['fixture_directory']),
+}
+
+_default_stores: Dict[str, PriceStore] = {}
+_default_store_lock = threading.Lock()
+
+def load_price_store(config_path: str = 'config.yaml') -> PriceStore:
+    with open(config_path, 'r') as f:
+        config = yaml.safe_load(f)
+    return PriceStore(config['prices']['directory'], SOURCES[config['prices']['source']](config),
+                      TokenBucket(config['prices']['requests_per_second']))
+
+def default_price_store(config_path: str = 'config.yaml') -> PriceStore:
+    """Price store configured by config_path, shared by the whole process."""
+    key = str(Path(config_path).resolve())
+    with _default_store_lock:
+        if key not in _default_stores:
+            _default_stores[key] = load_price_store(config_path)
+        return _default_stores[key]
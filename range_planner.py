@@ -0,0 +1,79 @@
+from dataclasses import dataclass, replace
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Set, Tuple
+from screener_query import ScreenerFilter
+
+# Maximum number of rows the screener returns for one request (cnt=5000)
+SCREENER_PAGE_SIZE = 5000
+
+@dataclass(frozen=True)
+class RangeRequest:
+    year: int
+    month: int
+    start_date: date
+    end_date: date
+    page: int = 1
+    ticker: str = ""
+    # Server-side filter the request is fetched with, None until the scraper picks one
+    screener_filter: Optional[ScreenerFilter] = None
+
+    @property
+    def days(self) -> int:
+        return (self.end_date - self.start_date).days + 1
+
+def split_request(request: RangeRequest) -> List[RangeRequest]:
+    """
+    Bisect the filing date range (month -> half-months -> weeks -> days). A single day is paged instead, the
+    next page keeps the server-side filter so the pages line up.
+    """
+    if request.days == 1:
+        return [replace(request, page=request.page + 1)]
+    middle = request.start_date + timedelta(days=(request.days - 1) // 2)
+    return [
+        RangeRequest(request.year, request.month, request.start_date, middle, ticker=request.ticker),
+        RangeRequest(request.year, request.month, middle + timedelta(days=1), request.end_date, ticker=request.ticker),
+    ]
+
+class RangePlanner:
+    """
+    Keeps track of the outstanding screener requests of every month. A request whose page came back full
+    was truncated by the screener, so it is replaced by smaller sub-ranges that can run in parallel. Once
+    all requests of a month are done the merged, de-duplicated rows of the month are handed back.
+    """
+    def __init__(self, page_size: int = SCREENER_PAGE_SIZE):
+        self.page_size = page_size
+        self._outstanding: Dict[Tuple[int, int], int] = {}
+        self._rows: Dict[Tuple[int, int], Set[tuple]] = {}
+
+    @property
+    def open_months(self) -> int:
+        """Months with requests still outstanding."""
+        return len(self._outstanding)
+
+    def start_month(self, year: int, month: int, start_date: date, end_date: date, tickers: Optional[List[str]] = None) -> List[RangeRequest]:
+        """Initial requests of a month, one per ticker query ("" requests all tickers)."""
+        tickers = tickers or [""]
+        self._outstanding[(year, month)] = len(tickers)
+        self._rows[(year, month)] = set()
+        return [RangeRequest(year, month, start_date, end_date, ticker=ticker) for ticker in tickers]
+
+    def complete(self, request: RangeRequest, row_count: int, rows: Set[tuple]) -> Tuple[List[RangeRequest], Optional[Set[tuple]]]:
+        """
+        Register the result of a request. row_count is the number of rows on the page before any filtering.
+        Returns the follow-up requests to schedule and, if this was the last request of its month, the month's rows.
+        """
+        key = (request.year, request.month)
+        follow_ups = []
+        if row_count >= self.page_size:
+            follow_ups = split_request(request)
+            # Sub-ranges cover the whole range again, only the rows of a paged single day are kept
+            if request.days == 1:
+                self._rows[key] |= rows
+        else:
+            self._rows[key] |= rows
+
+        self._outstanding[key] += len(follow_ups) - 1
+        if self._outstanding[key] > 0:
+            return follow_ups, None
+        del self._outstanding[key]
+        return follow_ups, self._rows.pop(key)
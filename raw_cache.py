@@ -0,0 +1,168 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+
+# put() writes the manifest once per this many pages, save() writes whatever is left
+MANIFEST_SAVE_INTERVAL = 100
+
+class RawResponseCache:
+    """
+    Compressed raw screener pages. Pages are stored once per content hash (blobs/<hash>.html.gz) and
+    looked up by the hash of their request URL through manifest.json, which also records size, fetch
+    time, last access and the HTTP validators of each URL, plus a group and metadata the caller passes in
+    (entries of one group are found with group_entries). When the blobs exceed max_size_mb the least
+    recently used URLs are evicted. Changes to the manifest are saved in batches, blobs that a manifest
+    saved before a crash doesn't know about are deleted when the cache is opened again.
+    """
+    def __init__(self, directory: str, max_size_mb: float):
+        self.directory = Path(directory)
+        self.blob_dir = self.directory / "blobs"
+        self.blob_dir.mkdir(parents=True, exist_ok=True)
+        self.manifest_path = self.directory / "manifest.json"
+        self.max_size = max_size_mb * 1024 * 1024
+        self._lock = threading.Lock()
+        self._manifest: Dict[str, dict] = {}
+        self._unsaved = 0
+        if self.manifest_path.exists():
+            with open(self.manifest_path, 'r') as f:
+                self._manifest = json.load(f)
+        self._groups: Dict[str, Set[str]] = {}
+        for key, entry in self._manifest.items():
+            if entry.get('group') is not None:
+                self._groups.setdefault(entry['group'], set()).add(key)
+        self._remove_unknown_blobs()
+
+    @staticmethod
+    def url_key(url: str) -> str:
+        return hashlib.sha256(url.encode('utf-8')).hexdigest()
+
+    def _blob_path(self, content_hash: str) -> Path:
+        return self.blob_dir / f"{content_hash}.html.gz"
+
+    def entry(self, url: str) -> Optional[dict]:
+        with self._lock:
+            entry = self._manifest.get(self.url_key(url))
+            return dict(entry) if entry else None
+
+    def entries(self) -> List[dict]:
+        with self._lock:
+            return [dict(entry) for entry in self._manifest.values()]
+
+    def group_entries(self, group: str) -> List[dict]:
+        with self._lock:
+            return [dict(self._manifest[key]) for key in self._groups.get(group, ())]
+
+    def get(self, url: str, max_age: Optional[float] = None) -> Optional[str]:
+        """Cached page of url, or None if it is missing or older than max_age seconds."""
+        key = self.url_key(url)
+        with self._lock:
+            entry = self._manifest.get(key)
+            if entry is None:
+                return None
+            if max_age is not None and datetime.now().timestamp() - entry['fetched_at'] >= max_age:
+                return None
+            entry['last_access'] = datetime.now().timestamp()
+            blob_path = self._blob_path(entry['content_hash'])
+        try:
+            with gzip.open(blob_path, 'rt', encoding='utf-8') as f:
+                return f.read()
+        except FileNotFoundError:
+            with self._lock:
+                if key in self._manifest:
+                    self._remove(key)
+            return None
+
+    def put(self, url: str, text: str, etag: Optional[str] = None, last_modified: Optional[str] = None,
+            group: Optional[str] = None, meta: Optional[dict] = None) -> None:
+        body = text.encode('utf-8')
+        content_hash = hashlib.sha256(body).hexdigest()
+        blob_path = self._blob_path(content_hash)
+        if not blob_path.exists():
+            tmp_path = blob_path.with_suffix(f".tmp{threading.get_ident()}")
+            with open(tmp_path, 'wb') as f:
+                f.write(gzip.compress(body))
+            os.replace(tmp_path, blob_path)
+
+        now = datetime.now().timestamp()
+        key = self.url_key(url)
+        with self._lock:
+            if key in self._manifest:
+                self._remove(key)
+            self._manifest[key] = {
+                'url': url,
+                'content_hash': content_hash,
+                'size': blob_path.stat().st_size,
+                'raw_size': len(body),
+                'fetched_at': now,
+                'last_access': now,
+                'etag': etag,
+                'last_modified': last_modified,
+                'group': group,
+                'meta': meta,
+            }
+            if group is not None:
+                self._groups.setdefault(group, set()).add(key)
+            self._evict()
+            self._unsaved += 1
+            if self._unsaved >= MANIFEST_SAVE_INTERVAL:
+                self._save_manifest()
+
+    def touch(self, url: str) -> None:
+        """Mark a cached page as fresh again, e.g. after a 304 response."""
+        with self._lock:
+            entry = self._manifest.get(self.url_key(url))
+            if entry is not None:
+                entry['fetched_at'] = entry['last_access'] = datetime.now().timestamp()
+                self._unsaved += 1
+
+    def total_size(self) -> int:
+        with self._lock:
+            return self._total_size()
+
+    def _total_size(self) -> int:
+        # Identical pages share one blob and only count once
+        return sum({entry['content_hash']: entry['size'] for entry in self._manifest.values()}.values())
+
+    def _evict(self) -> None:
+        total_size = self._total_size()
+        if total_size <= self.max_size:
+            return
+        for key, entry in sorted(self._manifest.items(), key=lambda item: item[1]['last_access']):
+            if total_size <= self.max_size:
+                break
+            self._remove(key)
+            if not any(other['content_hash'] == entry['content_hash'] for other in self._manifest.values()):
+                self._blob_path(entry['content_hash']).unlink(missing_ok=True)
+                total_size -= entry['size']
+
+    def _remove(self, key: str) -> None:
+        # Only takes the entry out of the manifest, its blob may be shared with other URLs
+        group = self._manifest.pop(key).get('group')
+        if group is not None:
+            self._groups[group].discard(key)
+            if not self._groups[group]:
+                del self._groups[group]
+
+    def _remove_unknown_blobs(self) -> None:
+        # Left behind by a run that stopped before its manifest was saved
+        known = {self._blob_path(entry['content_hash']).name for entry in self._manifest.values()}
+        for path in self.blob_dir.iterdir():
+            if path.name not in known:
+                path.unlink(missing_ok=True)
+
+    def _save_manifest(self) -> None:
+        tmp_path = self.manifest_path.with_suffix(f".tmp{threading.get_ident()}")
+        with open(tmp_path, 'w') as f:
+            json.dump(self._manifest, f)
+        os.replace(tmp_path, self.manifest_path)
+        self._unsaved = 0
+
+    def save(self) -> None:
+        """Persist the pages put since the last save and the last access times, which get() only keeps in memory."""
+        with self._lock:
+            self._save_manifest()
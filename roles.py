@@ -0,0 +1,80 @@
+import hashlib
+from typing import Dict, List, Optional
+
+# Canonical insider roles as openinsider abbreviates them, each with its own bit in transactions_gold.roles_mask
+ROLE_BITS: Dict[str, int] = {
+    "CEO":   1 << 0,
+    "CFO":   1 << 1,
+    "COO":   1 << 2,
+    "Pres":  1 << 3,
+    "COB":   1 << 4,
+    "Dir":   1 << 5,
+    "10%":   1 << 6,
+    "VP":    1 << 7,
+    "GC":    1 << 8,
+    "CTO":   1 << 9,
+    "CAO":   1 << 10,
+    "Sec":   1 << 11,
+    "Treas": 1 << 12,
+}
+
+# Other spellings of the canonical roles, matched case-insensitively
+ROLE_SYNONYMS: Dict[str, str] = {
+    "chief executive officer": "CEO",
+    "chief financial officer": "CFO",
+    "chief operating officer": "COO",
+    "president": "Pres",
+    "chairman": "COB",
+    "chairman of the board": "COB",
+    "chairman of board": "COB",
+    "director": "Dir",
+    "10% owner": "10%",
+    "10 percent owner": "10%",
+    "vice president": "VP",
+    "evp": "VP",
+    "svp": "VP",
+    "general counsel": "GC",
+    "chief technology officer": "CTO",
+    "chief accounting officer": "CAO",
+    "secretary": "Sec",
+    "treasurer": "Treas",
+}
+
+def role_lookup() -> Dict[str, str]:
+    """Lower-cased title -> canonical role, covering the canonical names themselves and all synonyms."""
+    lookup = {role.lower(): role for role in ROLE_BITS}
+    lookup.update(ROLE_SYNONYMS)
+    return lookup
+
+def roles_version() -> str:
+    """Fingerprint of the role dictionary, stored with the gold tables so masks are recomputed when it changes."""
+    items = sorted((title, ROLE_BITS[role]) for title, role in role_lookup().items())
+    return hashlib.sha1(repr(items).encode('utf-8')).hexdigest()[:10]
+
+def normalize_role(title: str) -> Optional[str]:
+    """Canonical role of a single title, or None if it is not in the dictionary."""
+    return role_lookup().get(title.strip().lower())
+
+def role_mask(titles: str) -> int:
+    """Bitmask of a comma separated openinsider title such as 'CEO, Pres, 10%'. Unknown titles are ignored."""
+    lookup = role_lookup()
+    mask = 0
+    for title in titles.split(','):
+        role = lookup.get(title.strip().lower())
+        if role is not None:
+            mask |= ROLE_BITS[role]
+    return mask
+
+def roles_to_mask(roles: List[str]) -> int:
+    """Bitmask of a list of required roles, raising a ValueError for roles that can never match."""
+    mask = 0
+    for title in roles:
+        role = normalize_role(title)
+        if role is None:
+            raise ValueError(f"Unknown role '{title}', expected one of {', '.join(ROLE_BITS)}")
+        mask |= ROLE_BITS[role]
+    return mask
+
+def role_bits(mask: int) -> List[int]:
+    """The single-role bits set in mask."""
+    return [bit for bit in ROLE_BITS.values() if mask & bit]
@@ -1,13 +1,20 @@
 
-import yfinance as yf
-import pandas as pd
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
+from functools import partial
+import json
 import sqlite3
 import time
+import yaml
 from scorer2 import score_stock
+from batch_scoring import score_batch
+from database_handler import connect
+from price_store import PriceStore, default_price_store, on_or_after
+from fundamentals import FundamentalsStore, default_store
+from roles import role_bits, roles_to_mask
+from signal_engine import cluster_buy_signals, load_purchases
 
-def get_growth_and_de(ticker_symbol: str):
-    ticker = yf.Ticker(ticker_symbol)
+def get_growth_and_de(ticker_symbol: str, store: FundamentalsStore | None = None):
+    ticker = (store or default_store()).ticker(ticker_symbol)
 
     # ---- Revenue Growth (YoY) ----
     financials = ticker.financials
@@ -44,29 +51,29 @@ def get_growth_and_de(ticker_symbol: str):
     return (revenue_growth, de_ratio)
  
 def create_sql_query(requiredRoles:list[str]=["CEO", "CFO"], minimumInsiders:int=2, minimumInvestmentValue:float|int=50_000, slidingWindowDays:float|int=30) -> str:
-    query = f"""
-        SELECT DISTINCT c.ticker, MAX(t.trade_date)
-        FROM transactions_gold t
-        JOIN insiders_gold i 
-            ON i.id = t.insider_id
-        JOIN companies_gold c 
-            ON c.id = t.company_id
-        JOIN transactions_titles_gold tt 
-            ON tt.transaction_id = t.id AND tt.insider_id = i.id
-        WHERE t.is_purchase = 1
+    # Every required role has to show up in the roles_mask of some purchase in the window
+    requiredMask = roles_to_mask(requiredRoles)
+    rolesCheck = ""
+    if requiredMask:
+        rolesCheck = f"""
             AND EXISTS (
-                    -- Check that both CEO and CFO invested in same company within 30 days
+                    -- Check that all required roles invested in same company within the window
                     SELECT 1
                     FROM transactions_gold t2
-                    JOIN transactions_titles_gold tt2 
-                        ON tt2.transaction_id = t2.id AND tt2.insider_id = t2.insider_id
                     WHERE t2.company_id = t.company_id
                     AND t2.is_purchase = 1
-                    AND ABS(t2.trade_date - t.trade_date) <= {slidingWindowDays}*24*60*60 
-                    {f"AND tt2.title IN ({", ".join([f"'{title}'" for title in requiredRoles])})" if len(requiredRoles) > 0 else ""}
+                    AND ABS(t2.trade_date - t.trade_date) <= {slidingWindowDays}*24*60*60
+                    AND t2.roles_mask & {requiredMask} != 0
                     GROUP BY t2.company_id
-                    HAVING COUNT(DISTINCT tt2.title) >= {len(requiredRoles)}
-            )
+                    HAVING {" AND ".join(f"MAX(t2.roles_mask & {bit}) > 0" for bit in role_bits(requiredMask))}
+            )"""
+
+    query = f"""
+        SELECT DISTINCT c.ticker, MAX(t.trade_date)
+        FROM transactions_gold t
+        JOIN companies_gold c 
+            ON c.id = t.company_id
+        WHERE t.is_purchase = 1{rolesCheck}
             AND EXISTS (
                     -- Ensure more than 1 insider bought within 30 days
                     SELECT 1
@@ -90,6 +97,42 @@ def create_sql_query(requiredRoles:list[str]=["CEO", "CFO"], minimumInsiders:int
     """
     return query
 
+def create_stats_query(requiredRoles:list[str]=["CEO", "CFO"], minimumInsiders:int=2, minimumInvestmentValue:float|int=50_000, slidingWindowDays:float|int=30, since:int|None=None) -> str:
+    # Same signal as create_sql_query, read from the windows cleaner.py materialized in company_window_stats
+    requiredMask = roles_to_mask(requiredRoles)
+    query = f"""
+        SELECT c.ticker, MAX(s.trade_date)
+        FROM company_window_stats s
+        JOIN companies_gold c 
+            ON c.id = s.company_id
+        WHERE s.window_days = {slidingWindowDays}
+            {f"AND s.trade_date >= {since}" if since is not None else ""}
+            AND s.distinct_insiders >= {minimumInsiders}
+            AND s.max_value > {minimumInvestmentValue}
+            AND s.roles_mask & {requiredMask} = {requiredMask}
+            GROUP BY c.ticker;
+    """
+    return query
+
+def get_signals(conn: sqlite3.Connection, requiredRoles:list[str]=["CEO", "CFO"], minimumInsiders:int=2, minimumInvestmentValue:float|int=50_000, slidingWindowDays:float|int=30, since:int|None=None) -> list[tuple]:
+    """
+    (ticker, latest signal date) rows, from company_window_stats when the window is materialized there and
+    evaluated in memory otherwise. With since only signals on or after that epoch time are returned.
+    """
+    cur = conn.cursor()
+    materialized = []
+    cur.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='gold_state'")
+    if cur.fetchone() is not None:
+        cur.execute("SELECT value FROM gold_state WHERE key='window_days'")
+        row = cur.fetchone()
+        materialized = json.loads(row[0]) if row and row[0] else []
+
+    if slidingWindowDays in materialized:
+        cur.execute(create_stats_query(requiredRoles, minimumInsiders, minimumInvestmentValue, slidingWindowDays, since))
+        return cur.fetchall()
+    signals = cluster_buy_signals(load_purchases(conn), requiredRoles, minimumInsiders, minimumInvestmentValue, slidingWindowDays)
+    return [(ticker, date) for ticker, date in signals if since is None or date >= since]
+
 def score(ticker_symbol: str):
     revenue_growth, de_ratio = get_growth_and_de(ticker_symbol)
     
@@ -109,13 +152,9 @@ def score(ticker_symbol: str):
             
     return score
 
-import yfinance as yf
-import pandas as pd
-from datetime import datetime, timedelta
-
-def backtest_one(ticker: str, entry_date):
+def backtest_one(ticker: str, entry_date, store: PriceStore | None = None):
     """
-    12M total return using yfinance with adjusted prices via auto_adjust=True.
+    12M total return on adjusted closes from the local price store, which only downloads the days it doesn't have yet.
     entry_date can be 'YYYY-MM-DD' or epoch seconds.
     """
     # Parse entry date
@@ -126,42 +165,27 @@ def backtest_one(ticker: str, entry_date):
 
     exit_dt = entry_dt + timedelta(days=365)
 
-    # Pull adjusted data
-    hist = yf.Ticker(ticker).history(
-        start=entry_dt - timedelta(days=7),
-        end=exit_dt + timedelta(days=7),
-        interval="1d",
-        auto_adjust=True,
-        actions=False
+    # Same window as the yfinance history request this replaces: a week before entry up to a week after exit
+    dates, closes = (store or default_price_store()).prices(
+        ticker,
+        (entry_dt - timedelta(days=7)).date(),
+        (exit_dt + timedelta(days=7)).date()
     )
 
-    if hist.empty or "Close" not in hist.columns:
+    if len(dates) == 0:
         return {"ticker": ticker, "error": "No price data"}
 
-    # Ensure index is tz-naive
-    prices = hist["Close"].dropna().sort_index()
-    if prices.index.tz is not None:
-        prices.index = prices.index.tz_convert(None)
-
-    # Helper: next available trading day price on/after target
-    def on_or_after(ts):
-        ts = pd.Timestamp(ts).tz_localize(None)  # force tz-naive
-        pos = prices.index.searchsorted(ts)
-        if pos >= len(prices):
-            return None
-        return float(prices.iloc[pos]), prices.index[pos].date()
-
-    entry_result = on_or_after(entry_dt)
+    entry_result = on_or_after(dates, closes, entry_dt.date())
     if entry_result is None:
         return {"ticker": ticker, "error": "No price on/after entry date"}
     entry_price, entry_used = entry_result
 
-    exit_result = on_or_after(exit_dt)
+    exit_result = on_or_after(dates, closes, exit_dt.date())
     matured = True
     if exit_result is None:
         matured = False
-        exit_price = float(prices.iloc[-1])
-        exit_used = prices.index[-1].date()
+        exit_price = float(closes[-1])
+        exit_used = date.fromordinal(int(dates[-1]))
     else:
         exit_price, exit_used = exit_result
 
@@ -180,38 +204,80 @@ def backtest_one(ticker: str, entry_date):
     }
 
 
-def main():
-    conn = sqlite3.connect("insider_trades.db")
-    cur = conn.cursor()
-    
-    cur.execute("DROP TABLE IF EXISTS watchlist_companies_gold")
-    cur.execute(""" CREATE TABLE "watchlist_companies_gold" (
-                        "id"	    INTEGER NOT NULL UNIQUE,
-                        "ticker"	TEXT,
-                        "score"	    REAL,
-                        "timestamp"	TEXT,
+WATCHLIST_COLUMNS = {"signal_date": "INTEGER", "scored_at": "REAL"}
+
+def create_watchlist_table(cur: sqlite3.Cursor):
+    cur.execute(""" CREATE TABLE IF NOT EXISTS "watchlist_companies_gold" (
+                        "id"	        INTEGER NOT NULL UNIQUE,
+                        "ticker"	    TEXT,
+                        "score"	        REAL,
+                        "timestamp"	    TEXT,
+                        "signal_date"	INTEGER,
+                        "scored_at"	    REAL,
                         PRIMARY KEY("id" AUTOINCREMENT)
                     );""")
+    # Watchlists from before the incremental refresh lack the new columns
+    cur.execute("SELECT name FROM pragma_table_info('watchlist_companies_gold')")
+    existing = {row[0] for row in cur.fetchall()}
+    for column, column_type in WATCHLIST_COLUMNS.items():
+        if column not in existing:
+            cur.execute(f"ALTER TABLE watchlist_companies_gold ADD COLUMN {column} {column_type}")
+    cur.execute("""DELETE FROM watchlist_companies_gold WHERE id NOT IN (
+                        SELECT MAX(id) FROM watchlist_companies_gold GROUP BY ticker)""")
+    cur.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_watchlist_ticker ON watchlist_companies_gold(ticker)")
+
+def tickers_to_score(cur: sqlite3.Cursor, signals: list[tuple], score_ttl_hours: float, now: float) -> dict:
+    """The {ticker: signal_date} of the signals that are new, newer than the stored one or whose score is stale."""
+    cur.execute("SELECT ticker, signal_date, scored_at FROM watchlist_companies_gold")
+    stored = {ticker: (signal_date, scored_at) for ticker, signal_date, scored_at in cur.fetchall()}
+    due = {}
+    for ticker, signal_date in signals:
+        if ticker not in stored:
+            due[ticker] = signal_date
+            continue
+        stored_signal, scored_at = stored[ticker]
+        if stored_signal is None or signal_date > stored_signal or scored_at is None or now - scored_at >= score_ttl_hours * 60 * 60:
+            due[ticker] = signal_date
+    return due
+
+def expire_watchlist(cur: sqlite3.Cursor, cutoff: int) -> int:
+    """Remove the signals older than cutoff and the rows from before signal_date was stored, returns how many."""
+    cur.execute("DELETE FROM watchlist_companies_gold WHERE signal_date IS NULL OR signal_date < ?", (cutoff,))
+    return cur.rowcount
+
+def main(config_path: str = "config.yaml"):
+    with open(config_path, 'r') as f:
+        config = yaml.safe_load(f)
+    conn = connect(config['database']['file'])
+    cur = conn.cursor()
+    create_watchlist_table(cur)
+
+    # Signals older than the lookback leave the watchlist
+    now = time.time()
+    cutoff = int(now) - config['watchlist']['lookback_days']*24*60*60
+    expire_watchlist(cur, cutoff)
     conn.commit()
-    
-    cur.execute(create_sql_query())
-    goodTransactions = cur.fetchall()
-    returns: list[float] = []
-    
-    for i, importantTransaction in enumerate(goodTransactions):
-        print(i, len(goodTransactions))
-        ticker, timestamp = importantTransaction
-        timestamp = datetime.fromtimestamp(timestamp)
-        if time.time() - timestamp.timestamp() < 3*30*24*60*60:
-            s_score = score_stock(ticker)["score"]
-            date = timestamp.isoformat().split("T")[0]
-            cur.execute("INSERT INTO watchlist_companies_gold (ticker, score, timestamp) VALUES (?, ?, ?)", (ticker, s_score, timestamp,))
-    conn.commit()
-    conn.close()    
-        # try:
-        #     returns.append(backtest_one(ticker, timestamp.timestamp())["return_pct_12m"])
-        # except:
-        #     pass
-    print(returns)
-
-main()
+
+    # Same rows as cur.execute(create_sql_query()), only signals within the lookback count
+    goodTransactions = get_signals(conn, since=cutoff)
+    signalDates = tickers_to_score(cur, goodTransactions, config['watchlist']['score_ttl_hours'], now)
+    print(f"{len(signalDates)} of {len(goodTransactions)} watchlist tickers need a new score")
+
+    # Every score is written as soon as it arrives, a slow or failing ticker doesn't hold up the others
+    results = score_batch(signalDates, partial(score_stock, config_path=config_path), config['scoring']['max_workers'], config['scoring']['timeout'])
+    for i, result in enumerate(results):
+        print(i, len(signalDates), result.ticker, result.score if result.error is None else result.error)
+        if result.error is not None:
+            continue
+        signal_date = signalDates[result.ticker]
+        cur.execute(""" INSERT INTO watchlist_companies_gold (ticker, score, timestamp, signal_date, scored_at)
+                        VALUES (?, ?, ?, ?, ?)
+                        ON CONFLICT(ticker) DO UPDATE SET
+                            score=excluded.score, timestamp=excluded.timestamp,
+                            signal_date=excluded.signal_date, scored_at=excluded.scored_at""",
+                    (result.ticker, result.score, str(datetime.fromtimestamp(signal_date)), signal_date, time.time()))
+        conn.commit()
+    conn.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+from pathlib import Path
+from typing import Dict
+import numpy as np
+import pandas as pd
+import yaml
+
+RULE_TYPES = ["linear", "tiered"]
+
+_TIER_BOUNDS = {
+    "above": np.greater,
+    "at_least": np.greater_equal,
+    "below": np.less,
+    "at_most": np.less_equal,
+}
+
+def load_models(path: str = 'scoring_rules.yaml') -> Dict[str, dict]:
+    with open(path, 'r') as f:
+        return yaml.safe_load(f)
+
+def rules_file(config_path: str = 'config.yaml') -> Path:
+    """The scoring.rules_file of a config, relative paths are relative to the config file."""
+    with open(config_path, 'r') as f:
+        config = yaml.safe_load(f)
+    return Path(config_path).parent / config['scoring']['rules_file']
+
+def _metric(metrics: pd.DataFrame, name: str) -> np.ndarray:
+    # None, missing columns and anything non-numeric all count as missing
+    if name not in metrics:
+        return np.full(len(metrics), np.nan)
+    return pd.to_numeric(metrics[name], errors='coerce').to_numpy(dtype=np.float64)
+
+def _linear(values: np.ndarray, rule: dict) -> np.ndarray:
+    missing = np.isnan(values)
+    if rule.get('positive_only', False):
+        missing |= values <= 0
+    fraction = np.clip((values - rule['zero_at']) / (rule['full_at'] - rule['zero_at']), 0, 1)
+    return np.where(missing, rule.get('missing', 0), fraction) * rule['weight']
+
+def _tiered(values: np.ndarray, rule: dict) -> np.ndarray:
+    points = np.zeros(len(values))
+    unmatched = np.ones(len(values), dtype=bool)
+    # the first tier that matches wins, NaN fails every comparison and never matches
+    for tier in rule['tiers']:
+        matches = unmatched.copy()
+        for bound, compare in _TIER_BOUNDS.items():
+            if bound in tier:
+                with np.errstate(invalid='ignore'):
+                    matches &= compare(values, tier[bound])
+        points[matches] = tier['points']
+        unmatched &= ~matches
+    return points
+
+def score_metrics(metrics: pd.DataFrame, model: dict) -> pd.DataFrame:
+    """
+    Score every row of a metrics table (one row per ticker, one column per metric) with a model from
+    scoring_rules.yaml. Returns one column per rule plus the total in 'score', on the index of metrics.
+    """
+    components = {}
+    total = np.zeros(len(metrics))
+    for rule in model['rules']:
+        if rule['type'] not in RULE_TYPES:
+            raise ValueError(f"Unknown rule type '{rule['type']}' of rule '{rule['name']}', expected one of {', '.join(RULE_TYPES)}")
+        values = _metric(metrics, rule['metric'])
+        component = _linear(values, rule) if rule['type'] == "linear" else _tiered(values, rule)
+        components[rule['name']] = component
+        # summed rule by rule, in the order of the config
+        total = total + component
+
+    limits = model.get('total', {})
+    total = np.clip(total, limits.get('min', -np.inf), limits.get('max', np.inf))
+    if limits.get('round') is not None:
+        # np.round scales by 10**decimals and can end up one unit off, round() is exact
+        total = np.array([round(value, limits['round']) for value in total.tolist()])
+    result = pd.DataFrame(components, index=metrics.index)
+    result['score'] = total
+    return result
+
+_models: Dict[str, Dict[str, dict]] = {}
+
+def model(name: str, config_path: str = 'config.yaml') -> dict:
+    """A model of the rules file of config_path, loaded once per process."""
+    key = str(Path(config_path).resolve())
+    if key not in _models:
+        _models[key] = load_models(str(rules_file(config_path)))
+    return _models[key][name]
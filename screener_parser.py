@@ -0,0 +1,65 @@
+from typing import List, Optional
+from bs4 import BeautifulSoup
+
+try:
+    from lxml import html as lxml_html
+except ImportError:  # lxml is optional, BeautifulSoup is always available
+    lxml_html = None
+
+PARSER_BACKENDS = ["auto", "lxml", "bs4"]
+
+def parse_rows_bs4(page: str, n_fields: int) -> Optional[List[List[str]]]:
+    """Reference implementation, returns None if the page has no tinytable."""
+    soup = BeautifulSoup(page, 'html.parser')
+    table = soup.find('table', {'class': 'tinytable'})
+    if not table:
+        return None
+
+    rows = []
+    for row in table.find('tbody').findAll('tr'):
+        cols = row.findAll('td')
+        if not cols:
+            continue
+
+        values = []
+        for index in range(n_fields):
+            link = cols[index].find('a')
+            values.append(link.text.strip() if link else cols[index].get_text(strip=True))
+        rows.append(values)
+    return rows
+
+def parse_rows_lxml(page: str, n_fields: int) -> Optional[List[List[str]]]:
+    """Same output as parse_rows_bs4, using the lxml C parser and a single pass per cell."""
+    doc = lxml_html.fromstring(page)
+    tables = doc.xpath('//table[contains(concat(" ", normalize-space(@class), " "), " tinytable ")]')
+    if not tables:
+        return None
+
+    rows = []
+    for row in tables[0].find('tbody').iter('tr'):
+        cols = list(row.iter('td'))
+        if not cols:
+            continue
+
+        values = []
+        for index in range(n_fields):
+            col = cols[index]
+            link = col.find('.//a')
+            if link is not None:
+                # Matches BeautifulSoup's tag.text.strip()
+                values.append(''.join(link.itertext()).strip())
+            else:
+                # Matches BeautifulSoup's get_text(strip=True)
+                values.append(''.join(text.strip() for text in col.itertext()))
+        rows.append(values)
+    return rows
+
+def parse_rows(page: str, n_fields: int, backend: str = "auto") -> Optional[List[List[str]]]:
+    """Extract the first n_fields cell texts of every row of the screener table."""
+    if backend not in PARSER_BACKENDS:
+        raise ValueError(f"Unknown parser backend {backend}, expected one of {PARSER_BACKENDS}")
+    if backend == "bs4" or (backend == "auto" and lxml_html is None):
+        return parse_rows_bs4(page, n_fields)
+    if lxml_html is None:
+        raise ImportError("The lxml parser backend requires the lxml package")
+    return parse_rows_lxml(page, n_fields)
@@ -0,0 +1,94 @@
+import math
+from dataclasses import dataclass
+from datetime import date
+from typing import List, Optional, Tuple
+from urllib.parse import parse_qs, quote, urlsplit
+
+SCREENER_URL = 'http://openinsider.com/screener'
+# Checkbox of each trade type code on the screener form
+TRADE_TYPE_PARAMS = {
+    "P": "xp", "S": "xs", "A": "xa", "D": "xd", "G": "xg",
+    "F": "xf", "M": "xm", "X": "xx", "C": "xc", "W": "xw",
+}
+# Trade types requested when the config does not restrict them
+DEFAULT_TRADE_TYPES = ["P", "S"]
+
+def trade_type_codes(transaction_types: List[str]) -> List[str]:
+    """Screener codes of the configured trade types, accepting both 'P' and 'P - Purchase'."""
+    codes = []
+    for transaction_type in transaction_types:
+        code = transaction_type.split(' - ', 1)[0].strip().upper()
+        if code in TRADE_TYPE_PARAMS and code not in codes:
+            codes.append(code)
+    return codes
+
+def ticker_queries(config) -> List[str]:
+    """
+    One screener query per included ticker when the list is short enough, otherwise a single query
+    over all tickers ("") that is filtered on the client.
+    """
+    if config.include_companies and len(config.include_companies) <= config.max_ticker_queries:
+        return list(dict.fromkeys(config.include_companies))
+    return [""]
+
+@dataclass(frozen=True)
+class ScreenerFilter:
+    """
+    The filters a screener request applies on the server: trade type codes, the minimum value in $K and
+    the ticker ("" for all tickers).
+    """
+    trade_types: Tuple[str, ...] = tuple(DEFAULT_TRADE_TYPES)
+    value_min: Optional[int] = None
+    ticker: str = ""
+
+    @classmethod
+    def from_config(cls, config, ticker: str = "") -> 'ScreenerFilter':
+        """The config filters the screener supports, the client-side filters still run on every page as a safety net."""
+        codes = trade_type_codes(config.transaction_types) if config.transaction_types else []
+        # Unknown trade types can't be pushed down, the default request is kept and the client filters them
+        if not codes:
+            codes = DEFAULT_TRADE_TYPES
+        # The screener filters on the value in $K, rounding down keeps every row the client filter accepts
+        value_min = math.floor(config.min_transaction_value / 1000) if config.min_transaction_value >= 1000 else None
+        return cls(tuple(code for code in TRADE_TYPE_PARAMS if code in codes), value_min, ticker)
+
+    @classmethod
+    def from_url(cls, url: str) -> 'ScreenerFilter':
+        """The filters of a screener URL built by build_screener_url."""
+        query = parse_qs(urlsplit(url).query)
+        value_min = query.get('vl', [''])[0]
+        return cls(
+            tuple(code for code, param in TRADE_TYPE_PARAMS.items() if query.get(param) == ['1']),
+            int(value_min) if value_min else None, query.get('s', [''])[0]
+        )
+
+    @classmethod
+    def from_dict(cls, values: dict) -> 'ScreenerFilter':
+        return cls(tuple(values['trade_types']), values['value_min'], values['ticker'])
+
+    def to_dict(self) -> dict:
+        return {'trade_types': list(self.trade_types), 'value_min': self.value_min, 'ticker': self.ticker}
+
+    def covers(self, other: 'ScreenerFilter') -> bool:
+        """True if every row the screener returns under other is returned under this filter as well."""
+        return (
+            self.ticker in ("", other.ticker)
+            and set(other.trade_types) <= set(self.trade_types)
+            and (self.value_min is None or (other.value_min is not None and self.value_min <= other.value_min))
+        )
+
+def build_screener_url(start_date: date, end_date: date, page: int, page_size: int, screener_filter: ScreenerFilter) -> str:
+    """Screener URL for the filings between start_date and end_date with screener_filter applied on the server."""
+    params = [
+        ('s', quote(screener_filter.ticker)), ('o', ''), ('pl', ''), ('ph', ''), ('ll', ''), ('lh', ''), ('fd', '-1'),
+        ('fdr', f"{start_date.strftime('%m/%d/%Y')}+-+{end_date.strftime('%m/%d/%Y')}"),
+        ('td', '0'), ('tdr', ''), ('fdlyl', ''), ('fdlyh', ''), ('daysago', ''),
+    ]
+    params += [(TRADE_TYPE_PARAMS[code], '1') for code in TRADE_TYPE_PARAMS if code in screener_filter.trade_types]
+    value_min = screener_filter.value_min if screener_filter.value_min is not None else ''
+    params += [
+        ('vl', value_min), ('vh', ''), ('ocl', ''), ('och', ''), ('sic1', '-1'), ('sicl', '100'), ('sich', '9999'),
+        ('grp', '0'), ('nfl', ''), ('nfh', ''), ('nil', ''), ('nih', ''), ('nol', ''), ('noh', ''),
+        ('v2l', ''), ('v2h', ''), ('oc2l', ''), ('oc2h', ''), ('sortcol', '0'), ('cnt', page_size), ('page', page),
+    ]
+    return f"{SCREENER_URL}?" + '&'.join(f"{key}={value}" for key, value in params)
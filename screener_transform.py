@@ -0,0 +1,83 @@
+import csv
+import io
+from operator import itemgetter
+from typing import List, Optional
+import numpy as np
+import pandas as pd
+
+# Columns of the screener table that hold numbers formatted as text ($1,234.50, +1,000, -12%, >999%, New, n/a)
+NUMERIC_FIELDS = ["price", "quantity", "owned", "dOwnedPc", "value"]
+# Placeholders that mean "no number" and become 0.0
+MISSING_VALUES = ["New", "n/a"]
+
+_FORMATTING_CHARS = '$,%+<> '
+_STRIP_FORMATTING = str.maketrans('', '', _FORMATTING_CHARS)
+
+def clean_numeric(values: pd.Series) -> pd.Series:
+    """
+    Turn a column of screener strings into floats. Currency symbols, thousands separators, signs and
+    percent signs are stripped, percentages keep their value (+15% -> 15.0, >999% -> 999.0).
+    'New', 'n/a', empty and otherwise unparsable values become 0.0.
+    """
+    cleaned = values.astype(str).str.replace(r'[$,%+<>\s]', '', regex=True)
+    # to_numeric returns int64 for a column of whole numbers, the fast path always gives floats
+    return pd.to_numeric(cleaned, errors='coerce').fillna(0.0).astype(float)
+
+def _clean_numeric_block(rows: List[List[str]], indices: List[int]) -> Optional[np.ndarray]:
+    """
+    Convert all numeric cells of a page at once: the cells are joined into one tab separated block,
+    stripped with a single str.translate and parsed by pandas' C CSV reader. Returns None if the block
+    holds anything the fast path cannot parse, the caller then cleans column by column.
+    """
+    # itemgetter returns the bare cell instead of a tuple for a single index
+    pick = itemgetter(*indices) if len(indices) > 1 else (lambda row: (row[indices[0]],))
+    block = '\n'.join('\t'.join(pick(row)) for row in rows).translate(_STRIP_FORMATTING)
+    try:
+        parsed = pd.read_csv(
+            io.StringIO(block), sep='\t', header=None, names=indices, dtype=np.float64,
+            na_values=MISSING_VALUES, keep_default_na=False, skip_blank_lines=False, quoting=csv.QUOTE_NONE
+        )
+    except (ValueError, pd.errors.ParserError):
+        return None
+    if len(parsed) != len(rows):
+        return None
+    return np.nan_to_num(parsed.to_numpy(), nan=0.0)
+
+def clean_batch(rows: List[List[str]], field_names: List[str]) -> pd.DataFrame:
+    """Build a column-wise batch from the parsed rows of one page and convert its numeric columns."""
+    batch = pd.DataFrame(rows, columns=field_names, dtype=object)
+    numeric_fields = [field for field in NUMERIC_FIELDS if field in field_names]
+    if not rows or not numeric_fields:
+        return batch
+
+    values = _clean_numeric_block(rows, [field_names.index(field) for field in numeric_fields])
+    for position, field in enumerate(numeric_fields):
+        batch[field] = values[:, position] if values is not None else clean_numeric(batch[field]).to_numpy()
+    return batch
+
+def filter_mask(batch: pd.DataFrame, config) -> np.ndarray:
+    """Boolean mask of the rows of a cleaned batch that pass the filters of a ScraperConfig."""
+    mask = np.ones(len(batch), dtype=bool)
+    if len(batch) == 0:
+        return mask
+
+    # Trade types look like "P - Purchase" or "S - Sale+OE", the filter accepts the code or the full text
+    if config.transaction_types:
+        codes = batch['trade_type'].str.split(' - ', n=1).str[0].str.strip()
+        mask &= (codes.isin(config.transaction_types) | batch['trade_type'].isin(config.transaction_types)).to_numpy()
+
+    if config.exclude_companies:
+        mask &= ~batch['ticker'].isin(config.exclude_companies).to_numpy()
+
+    if config.include_companies:
+        mask &= batch['ticker'].isin(config.include_companies).to_numpy()
+
+    mask &= batch['value'].to_numpy() >= config.min_transaction_value
+    mask &= batch['quantity'].to_numpy() >= config.min_shares_traded
+    return mask
+
+def filtered_rows(rows: List[List[str]], field_names: List[str], config) -> set:
+    """Clean and filter one page, returning the remaining rows as tuples in field_names order."""
+    batch = clean_batch(rows, field_names)
+    selected = batch[filter_mask(batch, config)]
+    return set(zip(*(selected[field].tolist() for field in field_names)))
@@ -0,0 +1,34 @@
+import queue
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+import requests
+from requests.adapters import HTTPAdapter
+
+class SessionPool:
+    """Fixed set of keep-alive sessions, one per worker thread, so connections are reused between requests."""
+    def __init__(self, size: int, headers: Optional[Dict[str, str]] = None):
+        self._sessions: "queue.Queue[requests.Session]" = queue.Queue()
+        self._all = []
+        for _ in range(size):
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=1)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            session.headers.update({'Accept-Encoding': 'gzip, deflate'})
+            if headers:
+                session.headers.update(headers)
+            self._sessions.put(session)
+            self._all.append(session)
+
+    @contextmanager
+    def session(self) -> Iterator[requests.Session]:
+        # Blocks until a session is free, there are never more requests in flight than sessions
+        session = self._sessions.get()
+        try:
+            yield session
+        finally:
+            self._sessions.put(session)
+
+    def close(self) -> None:
+        for session in self._all:
+            session.close()
@@ -0,0 +1,281 @@
+import itertools
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, List, Tuple
+import numpy as np
+import pandas as pd
+from roles import role_bits, roles_to_mask
+
+SECONDS_PER_DAY = 24 * 60 * 60
+
+@dataclass
+class Purchases:
+    """
+    All purchases of transactions_gold as parallel arrays, sorted by (company, trade_date).
+    insider holds dense insider indices (0..n_insiders-1), key is a composite sort key that keeps every
+    company in its own disjoint range of values so one searchsorted serves all companies at once.
+    """
+    company_id: np.ndarray
+    trade_date: np.ndarray
+    insider: np.ndarray
+    roles_mask: np.ndarray
+    value: np.ndarray
+    key: np.ndarray
+    key_stride: int
+    n_insiders: int
+    tickers: Dict[int, str]
+
+    def __len__(self) -> int:
+        return len(self.trade_date)
+
+def load_purchases(conn: sqlite3.Connection) -> Purchases:
+    frame = pd.read_sql_query(""" SELECT t.company_id, t.trade_date, t.insider_id, t.roles_mask, t.value
+                                  FROM transactions_gold t
+                                  WHERE t.is_purchase = 1 AND t.trade_date IS NOT NULL""", conn)
+    tickers = dict(conn.execute("SELECT id, ticker FROM companies_gold").fetchall())
+    # Purchases of companies missing from companies_gold never show up in the SQL signal either
+    frame = frame[frame['company_id'].isin(list(tickers))]
+    return build_purchases(
+        frame['company_id'].to_numpy(np.int64), frame['trade_date'].to_numpy(np.int64), frame['insider_id'].to_numpy(np.int64),
+        frame['roles_mask'].fillna(0).to_numpy(np.int64), frame['value'].to_numpy(np.float64), tickers
+    )
+
+def build_purchases(company_id: np.ndarray, trade_date: np.ndarray, insider_id: np.ndarray, roles_mask: np.ndarray,
+                    value: np.ndarray, tickers: Dict[int, str]) -> Purchases:
+    order = np.lexsort((trade_date, company_id))
+    company_id, trade_date, insider_id = company_id[order], trade_date[order], insider_id[order]
+    _, insider = np.unique(insider_id, return_inverse=True)
+
+    # company rank * stride + seconds since the first trade. With windows capped at the span of the whole
+    # history a stride of twice the span keeps the windows of neighbouring companies apart
+    first_date = int(trade_date.min()) if len(trade_date) else 0
+    span = int(trade_date.max()) - first_date if len(trade_date) else 0
+    _, company_rank = np.unique(company_id, return_inverse=True)
+    key_stride = 2 * span + 1
+    key = company_rank.astype(np.int64) * key_stride + (trade_date - first_date)
+    return Purchases(company_id, trade_date, insider.astype(np.int64), roles_mask[order], value[order], key, key_stride, int(insider.max()) + 1 if len(insider) else 0, tickers)
+
+def window_bounds(purchases: Purchases, slidingWindowDays: float) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    [lo, hi) index range of the purchases of the same company within slidingWindowDays of every purchase,
+    matching ABS(t2.trade_date - t.trade_date) <= slidingWindowDays*24*60*60 in the SQL version.
+    """
+    window = int(np.floor(slidingWindowDays * SECONDS_PER_DAY))
+    # A window at least as long as the whole history already covers the full company
+    window = min(window, (purchases.key_stride - 1) // 2)
+    lo = np.searchsorted(purchases.key, purchases.key - window, side='left')
+    hi = np.searchsorted(purchases.key, purchases.key + window, side='right')
+    return lo, hi
+
+def prefix_counts(flags: np.ndarray) -> np.ndarray:
+    """Running count of the set flags, with a leading 0 so prefix[hi] - prefix[lo] counts [lo, hi)."""
+    return np.concatenate(([0], np.cumsum(flags, dtype=np.int64)))
+
+def window_counts(flags: np.ndarray, lo: np.ndarray, hi: np.ndarray) -> np.ndarray:
+    """Number of set flags in every [lo, hi) window, from one prefix sum."""
+    prefix = prefix_counts(flags)
+    return prefix[hi] - prefix[lo]
+
+def previous_purchases(purchases: Purchases) -> np.ndarray:
+    """Index of the previous purchase by the same insider, -1 for their first one."""
+    by_insider = np.argsort(purchases.insider, kind='stable')
+    previous = np.full(len(purchases), -1, dtype=np.int64)
+    same = purchases.insider[by_insider[1:]] == purchases.insider[by_insider[:-1]]
+    previous[by_insider[1:][same]] = by_insider[:-1][same]
+    return previous
+
+def distinct_insiders(purchases: Purchases, lo: np.ndarray, hi: np.ndarray, previous: np.ndarray | None = None) -> np.ndarray:
+    """
+    Distinct insiders in every [lo, hi) window. A purchase j counts towards window i if it is the first
+    purchase of its insider inside the window, i.e. lo[i] <= j < hi[i] and the insider's previous purchase
+    is before lo[i]. Both bounds only move forward, so the windows each purchase counts towards form one
+    contiguous range that a difference array and a prefix sum turn into the counts. previous doesn't
+    depend on the window and can be passed in from previous_purchases.
+    """
+    n = len(lo)
+    position = np.arange(n)
+    if previous is None:
+        previous = previous_purchases(purchases)
+
+    # lo and hi are sorted, so the number of bounds <= x is a lookup in the running count of their values
+    lo_at_most = np.cumsum(np.bincount(lo, minlength=n + 1))
+    hi_at_most = np.cumsum(np.bincount(hi, minlength=n + 1))
+    first = np.maximum(hi_at_most[position], np.where(previous >= 0, lo_at_most[previous], 0))
+    last = lo_at_most[position]
+    valid = first < last
+    delta = np.bincount(first[valid], minlength=n + 1) - np.bincount(last[valid], minlength=n + 1)
+    return np.cumsum(delta[:-1])
+
+def roles_present(purchases: Purchases, lo: np.ndarray, hi: np.ndarray, requiredMask: int) -> np.ndarray:
+    """True for the windows in which every role of requiredMask appears on at least one purchase."""
+    present = np.ones(len(lo), dtype=bool)
+    for bit in role_bits(requiredMask):
+        present &= window_counts((purchases.roles_mask & bit) != 0, lo, hi) > 0
+    return present
+
+def latest_signals(purchases: Purchases, qualifies: np.ndarray) -> List[Tuple[str, int]]:
+    """(ticker, latest qualifying trade_date) per company, ordered by ticker like the SQL GROUP BY."""
+    if not qualifies.any():
+        return []
+    company_id, trade_date = purchases.company_id[qualifies], purchases.trade_date[qualifies]
+    # purchases are sorted by date within a company, so the last qualifying one is the latest
+    last = np.r_[company_id[1:] != company_id[:-1], True]
+    return sorted((purchases.tickers[int(company)], int(date)) for company, date in zip(company_id[last], trade_date[last]))
+
+def cluster_buy_signals(purchases: Purchases, requiredRoles: list[str] = ["CEO", "CFO"], minimumInsiders: int = 2,
+                        minimumInvestmentValue: float | int = 50_000, slidingWindowDays: float | int = 30) -> List[Tuple[str, int]]:
+    """
+    In-memory equivalent of scorer.create_sql_query: the (ticker, max trade_date) rows of the companies with
+    a purchase whose window holds all required roles, at least minimumInsiders distinct insiders and one
+    purchase above minimumInvestmentValue.
+    """
+    if len(purchases) == 0:
+        return []
+    return latest_signals(purchases, qualifying_purchases(purchases, requiredRoles, minimumInsiders, minimumInvestmentValue, slidingWindowDays))
+
+def qualifying_purchases(purchases: Purchases, requiredRoles: list[str], minimumInsiders: int,
+                         minimumInvestmentValue: float | int, slidingWindowDays: float | int) -> np.ndarray:
+    """True for every purchase whose window meets the cluster buy conditions."""
+    lo, hi = window_bounds(purchases, slidingWindowDays)
+    qualifies = window_counts(purchases.value > minimumInvestmentValue, lo, hi) > 0
+    requiredMask = roles_to_mask(requiredRoles)
+    if requiredMask:
+        qualifies &= roles_present(purchases, lo, hi, requiredMask)
+    qualifies &= distinct_insiders(purchases, lo, hi) >= minimumInsiders
+    return qualifies
+
+def signal_events(purchases: Purchases, requiredRoles: list[str] = ["CEO", "CFO"], minimumInsiders: int = 2,
+                  minimumInvestmentValue: float | int = 50_000, slidingWindowDays: float | int = 30) -> pd.DataFrame:
+    """
+    Every historical signal instead of only the latest one per company: one (ticker, entry_date) row per
+    company and day with a qualifying purchase, entry_date in epoch seconds. Input of event_study.
+    """
+    if len(purchases) == 0:
+        return pd.DataFrame({'ticker': pd.Series(dtype=object), 'entry_date': pd.Series(dtype=np.int64)})
+    qualifies = qualifying_purchases(purchases, requiredRoles, minimumInsiders, minimumInvestmentValue, slidingWindowDays)
+    company_id, trade_date = purchases.company_id[qualifies], purchases.trade_date[qualifies]
+    day = trade_date // SECONDS_PER_DAY
+    # several qualifying purchases on one day are one event, at the first of them
+    first = np.r_[True, (company_id[1:] != company_id[:-1]) | (day[1:] != day[:-1])]
+    events = pd.DataFrame({
+        'ticker': [purchases.tickers[int(company)] for company in company_id[first]],
+        'entry_date': trade_date[first],
+    })
+    return events.sort_values(['ticker', 'entry_date'], kind='stable').reset_index(drop=True)
+
+def slice_purchases(purchases: Purchases, start: int, stop: int) -> Purchases:
+    """The purchases in [start, stop), which should start and end on company boundaries."""
+    return Purchases(
+        purchases.company_id[start:stop], purchases.trade_date[start:stop], purchases.insider[start:stop],
+        purchases.roles_mask[start:stop], purchases.value[start:stop], purchases.key[start:stop],
+        purchases.key_stride, purchases.n_insiders, purchases.tickers
+    )
+
+def _company_offsets(purchases: Purchases, distinct: np.ndarray) -> np.ndarray:
+    """
+    An offset per purchase that puts every company above all companies after it, so a running max of
+    offset + distinct taken from the end restarts at every company.
+    """
+    group = np.cumsum(np.r_[True, purchases.company_id[1:] != purchases.company_id[:-1]])
+    return (group[-1] - group) * (int(distinct.max()) + 2)
+
+def _latest_per_threshold(candidates: np.ndarray, keyed: np.ndarray, offset: np.ndarray, minimumInsiders: List[int]) -> List[np.ndarray]:
+    """
+    For every threshold of minimumInsiders, the candidates that are the last one of their company with at least
+    that many distinct insiders. keyed is offset + distinct of every purchase. A candidate is the last one for
+    the thresholds above the largest count after it in its company, up to its own count, so only these record
+    candidates are checked once per threshold.
+    """
+    candidate_keyed = keyed[candidates]
+    # largest keyed value after every candidate, from the same company if it has a later candidate at all
+    after = np.r_[np.maximum.accumulate(candidate_keyed[::-1])[::-1][1:], -1]
+    records = np.flatnonzero(candidate_keyed > after)
+    record_offset = offset[candidates[records]]
+    record_distinct, record_after = candidate_keyed[records] - record_offset, after[records] - record_offset
+    return [candidates[records[(record_distinct >= insiders) & (record_after < insiders)]] for insiders in minimumInsiders]
+
+SWEEP_COLUMNS = ['slidingWindowDays', 'minimumInsiders', 'minimumInvestmentValue', 'requiredRoles', 'ticker', 'signal_date']
+
+def _sweep_purchases(purchases: Purchases, slidingWindowDays: List[float], minimumInsiders: List[int],
+                     minimumInvestmentValues: List[float], requiredRoles: List[List[str]]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Evaluate every parameter combination over one set of purchases and return the combination number and
+    purchase index of every (combination, company) signal. The previous purchase of every insider and the
+    prefix sums of the value and role flags don't depend on the window and are computed once per sweep.
+    Window bounds and distinct insider counts are computed once per window length, the role checks once per
+    window and role set, so each combination only costs a boolean AND and a filter.
+    """
+    role_masks = [roles_to_mask(roles) for roles in requiredRoles]
+    previous = previous_purchases(purchases)
+    value_prefixes = [prefix_counts(purchases.value > value) for value in minimumInvestmentValues]
+    bit_prefixes = {bit: prefix_counts((purchases.roles_mask & bit) != 0) for mask in role_masks for bit in role_bits(mask)}
+    combos, indices = [], []
+    combo = 0
+    for window in slidingWindowDays:
+        lo, hi = window_bounds(purchases, window)
+        distinct = distinct_insiders(purchases, lo, hi, previous)
+        offset = _company_offsets(purchases, distinct)
+        keyed = offset + distinct
+        bit_present = {bit: prefix[hi] > prefix[lo] for bit, prefix in bit_prefixes.items()}
+        roles_ok = []
+        for mask in role_masks:
+            present = np.ones(len(purchases), dtype=bool)
+            for bit in role_bits(mask):
+                present &= bit_present[bit]
+            roles_ok.append(present)
+        for value_prefix in value_prefixes:
+            value_ok = value_prefix[hi] > value_prefix[lo]
+            for present in roles_ok:
+                candidates = np.flatnonzero(value_ok & present)
+                # the last qualifying purchase of a company is its latest
+                for latest in _latest_per_threshold(candidates, keyed, offset, minimumInsiders):
+                    combos.append(np.full(len(latest), combo))
+                    indices.append(latest)
+                    combo += 1
+    if not combos:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    return np.concatenate(combos), np.concatenate(indices)
+
+def sweep_signals(purchases: Purchases, slidingWindowDays: List[float], minimumInsiders: List[int],
+                  minimumInvestmentValues: List[float], requiredRoles: List[List[str]], processes: int = 1) -> pd.DataFrame:
+    """
+    cluster_buy_signals for every combination of the given parameter lists, as one tidy table with a row per
+    (parameters, ticker, signal_date). With processes > 1 the companies are split into chunks that are
+    swept in a process pool.
+    """
+    args = (slidingWindowDays, minimumInsiders, minimumInvestmentValues, requiredRoles)
+    # an empty parameter list leaves nothing to combine
+    if len(purchases) == 0 or not all(args):
+        return pd.DataFrame(columns=SWEEP_COLUMNS)
+    if processes <= 1:
+        combo, index = _sweep_purchases(purchases, *args)
+    else:
+        # chunk boundaries have to fall between companies, windows never cross them
+        starts = np.flatnonzero(np.r_[True, purchases.company_id[1:] != purchases.company_id[:-1]])
+        bounds = np.unique(np.r_[starts[np.linspace(0, len(starts), processes, endpoint=False).astype(int)], len(purchases)])
+        chunks = [slice_purchases(purchases, start, stop) for start, stop in zip(bounds[:-1], bounds[1:])]
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            results = list(executor.map(_sweep_purchases, chunks, *[[arg] * len(chunks) for arg in args]))
+        combo = np.concatenate([combo for combo, _ in results])
+        index = np.concatenate([index + start for (_, index), start in zip(results, bounds[:-1])])
+
+    # order by combination, then ticker
+    companies = np.array(sorted(purchases.tickers, key=purchases.tickers.get), dtype=np.int64)
+    ticker_rank = np.empty(companies.max() + 1 if len(companies) else 0, dtype=np.int64)
+    ticker_rank[companies] = np.arange(len(companies))
+    rank = ticker_rank[purchases.company_id[index]]
+    order = np.lexsort((rank, combo))
+    combo, rank, index = combo[order], rank[order], index[order]
+
+    # the text columns are taken from their few distinct values instead of built string by string
+    grid = list(itertools.product(slidingWindowDays, minimumInvestmentValues, range(len(requiredRoles)), minimumInsiders))
+    window, value, roles, insiders = (np.array(column)[combo] for column in zip(*grid))
+    return pd.DataFrame({
+        'slidingWindowDays': window,
+        'minimumInsiders': insiders,
+        'minimumInvestmentValue': value,
+        'requiredRoles': pd.Index([",".join(roles) for roles in requiredRoles]).take(roles),
+        'ticker': pd.Index([purchases.tickers[int(company)] for company in companies]).take(rank),
+        'signal_date': purchases.trade_date[index],
+    }, columns=SWEEP_COLUMNS)
@@ -0,0 +1,25 @@
+import sys
+from pathlib import Path
+import pytest
+import yaml
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+# The modules live at the top of the repository, not in a package
+sys.path.insert(0, str(REPO_DIR))
+
+@pytest.fixture
+def config_path(tmp_path) -> str:
+    """config.yaml with every file and directory moved into tmp_path."""
+    with open(REPO_DIR / "config.yaml", 'r') as f:
+        config = yaml.safe_load(f)
+    config['output']['directory'] = str(tmp_path / "data")
+    config['database']['file'] = str(tmp_path / "insider_trades.db")
+    config['logging']['file'] = str(tmp_path / "openinsider.log")
+    config['cache']['directory'] = str(tmp_path / "cache")
+    config['fundamentals']['cache_file'] = str(tmp_path / "cache" / "fundamentals.db")
+    config['prices']['directory'] = str(tmp_path / "cache" / "prices")
+    config['scoring']['rules_file'] = str(REPO_DIR / "scoring_rules.yaml")
+    path = tmp_path / "config.yaml"
+    with open(path, 'w') as f:
+        yaml.safe_dump(config, f)
+    return str(path)
@@ -0,0 +1,86 @@
+import threading
+import time
+import pytest
+from batch_scoring import score_batch
+
+TIMEOUT = 0.3
+
+class Scorer:
+    """Scores tickers by name: HANG blocks until released, FAIL raises, NONE reports no score, the rest score 1."""
+    def __init__(self):
+        self.release = threading.Event()
+        self.lock = threading.Lock()
+        self.running = 0
+        self.peak = 0
+        self.finished = []
+
+    def __call__(self, ticker: str) -> dict:
+        with self.lock:
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+        try:
+            if ticker.startswith("HANG"):
+                self.release.wait()
+            elif ticker.startswith("FAIL"):
+                raise ValueError(f"no data for {ticker}")
+            elif ticker.startswith("NONE"):
+                return {"score": None, "error": "no fundamentals"}
+            time.sleep(0.01)
+            return {"score": 1.0, "ticker": ticker}
+        finally:
+            with self.lock:
+                self.running -= 1
+                self.finished.append(ticker)
+
+@pytest.fixture
+def scorer():
+    scorer = Scorer()
+    yield scorer
+    scorer.release.set()
+
+def by_ticker(results) -> dict:
+    results = list(results)
+    assert len({result.ticker for result in results}) == len(results)
+    return {result.ticker: result for result in results}
+
+def test_hanging_ticker_times_out_and_frees_its_slot(scorer):
+    started = time.monotonic()
+    # one slot: the other tickers only run once the hanging one has been given up on
+    results = by_ticker(score_batch(["HANG", "AAA", "BBB"], scorer, max_workers=1, timeout=TIMEOUT))
+    assert time.monotonic() - started < TIMEOUT + 1
+    assert results["HANG"].score is None and results["HANG"].error == f"Timed out after {TIMEOUT}s"
+    assert results["HANG"].seconds >= TIMEOUT
+    assert (results["AAA"].score, results["BBB"].score) == (1.0, 1.0)
+    assert "HANG" not in scorer.finished
+
+def test_late_result_is_dropped(scorer):
+    results = score_batch(["HANG", "AAA"], scorer, max_workers=2, timeout=TIMEOUT)
+    first = next(results)
+    assert first.ticker == "AAA"
+    timed_out = next(results)
+    # the hanging scorer finishes after its timeout was reported, the batch is over by then
+    scorer.release.set()
+    assert timed_out.ticker == "HANG" and timed_out.error is not None
+    assert list(results) == []
+
+def test_errors_are_isolated(scorer):
+    results = by_ticker(score_batch(["AAA", "FAIL1", "BBB", "NONE", "FAIL2", "CCC"], scorer, max_workers=2, timeout=TIMEOUT))
+    assert results["FAIL1"].error == "ValueError: no data for FAIL1" and results["FAIL1"].score is None
+    assert results["FAIL2"].error == "ValueError: no data for FAIL2"
+    assert results["NONE"].error == "no fundamentals" and results["NONE"].result == {"score": None, "error": "no fundamentals"}
+    assert {ticker: result.score for ticker, result in results.items() if result.error is None} == {"AAA": 1.0, "BBB": 1.0, "CCC": 1.0}
+
+def test_hanging_and_raising_scorers_together(scorer):
+    tickers = ["HANG1", "FAIL1", "HANG2"] + [f"T{i:02d}" for i in range(10)] + ["FAIL2"]
+    results = by_ticker(score_batch(tickers, scorer, max_workers=3, timeout=TIMEOUT))
+    assert set(results) == set(tickers)
+    assert [ticker for ticker, result in results.items() if result.error and "Timed out" in result.error] == ["HANG1", "HANG2"]
+    assert sorted(ticker for ticker, result in results.items() if result.error and "ValueError" in result.error) == ["FAIL1", "FAIL2"]
+    assert all(results[f"T{i:02d}"].score == 1.0 for i in range(10))
+    # timed out threads no longer count against max_workers
+    assert scorer.peak <= 3 + 2
+
+def test_at_most_max_workers_run_at_once(scorer):
+    results = list(score_batch([f"T{i:02d}" for i in range(20)] + ["T00"], scorer, max_workers=4, timeout=None))
+    assert len(results) == 20
+    assert scorer.peak <= 4
@@ -0,0 +1,78 @@
+import sqlite3
+from datetime import date
+import pytest
+import cleaner
+from benchmarks.synthetic import FIELD_NAMES, generate_bronze_rows
+from database_handler import insider_trading_db_handler
+
+# Gold rows with the surrogate ids replaced by what they stand for, INSERT OR IGNORE may leave gaps in the ids
+GOLD_QUERIES = {
+    "companies_gold": "SELECT ticker, name FROM companies_gold ORDER BY ticker",
+    "insiders_gold": "SELECT name FROM insiders_gold ORDER BY name",
+    "transactions_gold": """
+        SELECT t.bronze_id, t.trade_date, c.ticker, i.name, t.is_purchase, t.unit_price, t.unit_quantity, t.value, t.roles_mask
+        FROM transactions_gold t
+        JOIN companies_gold c ON c.id = t.company_id
+        JOIN insiders_gold i ON i.id = t.insider_id
+        ORDER BY t.bronze_id""",
+    "transactions_titles_gold": """
+        SELECT t.bronze_id, tt.title, i.name
+        FROM transactions_titles_gold tt
+        JOIN transactions_gold t ON t.id = tt.transaction_id
+        JOIN insiders_gold i ON i.id = tt.insider_id
+        ORDER BY t.bronze_id, tt.id""",
+    "company_window_stats": """
+        SELECT c.ticker, s.trade_date, s.window_days, s.distinct_insiders, s.roles_mask, s.max_value
+        FROM company_window_stats s
+        JOIN companies_gold c ON c.id = s.company_id
+        ORDER BY c.ticker, s.trade_date, s.window_days""",
+}
+
+def bronze_rows(rows: int) -> list:
+    # three months, so the purchases of later updates fall into the windows of earlier ones
+    return next(generate_bronze_rows(rows, seed=5, start=date(2024, 1, 1), end=date(2024, 4, 1), chunk_size=rows))
+
+def append_bronze(db_file: str, rows: list) -> None:
+    handler = insider_trading_db_handler("transactions_bronze", db_file)
+    handler.write_many(FIELD_NAMES, rows)
+    handler.close()
+
+def gold(conn: sqlite3.Connection) -> dict:
+    return {table: conn.execute(query).fetchall() for table, query in GOLD_QUERIES.items()}
+
+@pytest.mark.parametrize("earlier_windows", [[7, 30], [30]])
+def test_incremental_update_matches_full_rebuild(tmp_path, earlier_windows):
+    windows = [7, 30]
+    rows = bronze_rows(3000)
+    # the last update is small, most companies get no new purchases from it
+    updates = [rows[:1500], rows[1500:2900], rows[2900:]]
+    incremental_db, rebuilt_db = str(tmp_path / "incremental.db"), str(tmp_path / "rebuilt.db")
+    with sqlite3.connect(incremental_db) as conn:
+        for number, update in enumerate(updates):
+            append_bronze(incremental_db, update)
+            last = number == len(updates) - 1
+            # a window list that changes on the last update recomputes the windows of every company
+            inserted = cleaner.update_gold(conn, number == 0, windows if last else earlier_windows)
+            assert inserted == len(update)
+        assert not cleaner.needs_full_rebuild(conn.cursor())
+        incremental = gold(conn)
+
+    append_bronze(rebuilt_db, rows)
+    with sqlite3.connect(rebuilt_db) as conn:
+        cleaner.update_gold(conn, True, windows)
+        rebuilt = gold(conn)
+
+    assert all(len(table_rows) > 0 for table_rows in rebuilt.values())
+    for table in GOLD_QUERIES:
+        assert incremental[table] == rebuilt[table], table
+
+def test_update_without_new_rows_changes_nothing(tmp_path):
+    db_file = str(tmp_path / "bronze.db")
+    append_bronze(db_file, bronze_rows(500))
+    with sqlite3.connect(db_file) as conn:
+        cleaner.update_gold(conn, True, [30])
+        before = gold(conn)
+        generation = cleaner.get_gold_state(conn.cursor(), "generation")
+        assert cleaner.update_gold(conn, False, [30]) == 0
+        assert gold(conn) == before
+        assert cleaner.get_gold_state(conn.cursor(), "generation") == generation
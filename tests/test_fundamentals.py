@@ -0,0 +1,91 @@
+import json
+import pandas as pd
+import pytest
+from fundamentals import FixtureProvider, FundamentalsStore, _statement_to_json
+
+HOUR = 60 * 60
+TTL_HOURS = {"info": 24, "financials": 168}
+
+def write_fixture(directory, ticker: str, revenue: float, margin: float) -> None:
+    financials = pd.DataFrame({pd.Timestamp("2024-12-31"): [revenue], pd.Timestamp("2023-12-31"): [revenue / 2]},
+                              index=["Total Revenue"])
+    with open(directory / f"{ticker}.json", 'w') as f:
+        json.dump({"info": {"grossMargins": margin}, "financials": json.loads(_statement_to_json(financials))}, f)
+
+@pytest.fixture
+def provider(tmp_path) -> FixtureProvider:
+    directory = tmp_path / "fundamentals"
+    directory.mkdir()
+    write_fixture(directory, "AAA", 100.0, 0.4)
+    return FixtureProvider(str(directory))
+
+@pytest.fixture
+def store(tmp_path, provider):
+    store = FundamentalsStore(provider, str(tmp_path / "cache" / "fundamentals.db"), TTL_HOURS)
+    yield store
+    store.close()
+
+def age(store: FundamentalsStore, dataset: str, hours: float) -> None:
+    store.conn.execute("UPDATE fundamentals_cache SET fetched_at = fetched_at - ? WHERE dataset = ?", (hours * HOUR, dataset))
+    store.conn.commit()
+
+def test_cached_datasets_are_not_fetched_again(store, provider):
+    ticker = store.ticker("AAA")
+    assert ticker.info == {"grossMargins": 0.4}
+    assert ticker.financials.loc["Total Revenue"].tolist() == [100.0, 50.0]
+    assert provider.fetch_count == 2
+
+    # a new TickerFundamentals reads the cache, statements come back with Timestamp periods like yfinance's
+    again = store.ticker("AAA")
+    assert again.info == {"grossMargins": 0.4}
+    assert list(again.financials.columns) == [pd.Timestamp("2024-12-31"), pd.Timestamp("2023-12-31")]
+    assert provider.fetch_count == 2
+
+def test_expired_dataset_is_refreshed(store, provider):
+    store.get("AAA", "info")
+    store.get("AAA", "financials")
+    write_fixture(provider.directory, "AAA", 300.0, 0.5)
+
+    # each dataset has its own TTL, a day old info expires while the statements are still served
+    age(store, "info", 24)
+    age(store, "financials", 24)
+    assert store.get("AAA", "info") == {"grossMargins": 0.5}
+    assert store.get("AAA", "financials").loc["Total Revenue"].tolist() == [100.0, 50.0]
+    assert provider.fetch_count == 3
+
+    age(store, "financials", 168)
+    assert store.get("AAA", "financials").loc["Total Revenue"].tolist() == [300.0, 150.0]
+    assert provider.fetch_count == 4
+    # the refresh is cached again
+    assert store.get("AAA", "info") == {"grossMargins": 0.5}
+    assert provider.fetch_count == 4
+
+def test_refresh_on_the_same_day_replaces_the_cached_row(store, provider):
+    store.get("AAA", "info")
+    age(store, "info", 25)
+    write_fixture(provider.directory, "AAA", 100.0, 0.6)
+    assert store.get("AAA", "info") == {"grossMargins": 0.6}
+    assert store.conn.execute("SELECT COUNT(*) FROM fundamentals_cache WHERE dataset = 'info'").fetchone()[0] == 1
+
+def test_latest_as_of_is_served(store, provider):
+    store.get("AAA", "info")
+    # an older fetch kept from another day
+    store.conn.execute("""INSERT INTO fundamentals_cache (ticker, dataset, as_of, fetched_at, payload)
+                          SELECT ticker, dataset, '2000-01-01', fetched_at, '{"grossMargins": 0.1}' FROM fundamentals_cache""")
+    assert store.get("AAA", "info") == {"grossMargins": 0.4}
+    assert provider.fetch_count == 1
+
+def test_zero_ttl_always_fetches(tmp_path, provider):
+    store = FundamentalsStore(provider, str(tmp_path / "fundamentals.db"), {"info": 0})
+    store.get("AAA", "info")
+    store.get("AAA", "info")
+    assert provider.fetch_count == 2
+    store.close()
+
+def test_missing_fixture_and_unknown_dataset(store):
+    with pytest.raises(KeyError):
+        store.get("ZZZ", "info")
+    with pytest.raises(ValueError):
+        store.get("AAA", "earnings")
+    # nothing is cached for a failed fetch
+    assert store.conn.execute("SELECT COUNT(*) FROM fundamentals_cache").fetchone()[0] == 0
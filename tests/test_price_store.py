@@ -0,0 +1,81 @@
+from datetime import date
+from typing import Dict
+import numpy as np
+import pandas as pd
+import pytest
+from price_store import PriceSource, PriceStore, _records, default_price_store
+
+TRADING_DAYS = [timestamp.date() for timestamp in pd.bdate_range("2020-01-01", "2020-12-31")]
+
+class SeriesSource(PriceSource):
+    """Adjusted closes of one ticker from a dict, recording every request."""
+    def __init__(self, closes: Dict[date, float]):
+        self.closes = closes
+        self.requests = []
+
+    def fetch(self, ticker: str, start: date, end: date) -> np.ndarray:
+        self.requests.append((start, end))
+        days = sorted(day for day in self.closes if start <= day < end)
+        return _records(days, [self.closes[day] for day in days])
+
+@pytest.fixture
+def source() -> SeriesSource:
+    return SeriesSource({day: 100.0 + i for i, day in enumerate(TRADING_DAYS)})
+
+def stored(store: PriceStore, start: date, end: date) -> Dict[date, float]:
+    dates, closes = store.prices("AAA", start, end, fetch=False)
+    return {date.fromordinal(int(ordinal)): float(close) for ordinal, close in zip(dates, closes)}
+
+def test_covered_range_is_not_fetched_again(tmp_path, source):
+    store = PriceStore(str(tmp_path), source)
+    # starts on a Saturday and ends on a Sunday, the weekends count as covered
+    store.ensure("AAA", date(2020, 2, 1), date(2020, 3, 1))
+    store.ensure("AAA", date(2020, 2, 1), date(2020, 3, 1))
+    store.ensure("AAA", date(2020, 2, 10), date(2020, 2, 20))
+    assert source.requests == [(date(2020, 2, 1), date(2020, 3, 1))]
+    assert stored(store, date(2020, 1, 1), date(2021, 1, 1)) == {day: close for day, close in source.closes.items()
+                                                                  if date(2020, 2, 1) <= day < date(2020, 3, 1)}
+
+def test_coverage_only_grows_to_returned_days(tmp_path, source):
+    store = PriceStore(str(tmp_path), source)
+    source.closes, later = {}, source.closes
+    store.ensure("AAA", date(2020, 3, 2), date(2020, 4, 1))
+    assert "AAA" not in store._manifest
+    # the ticker only has closes from mid-March on
+    source.closes = {day: close for day, close in later.items() if day >= date(2020, 3, 16)}
+    store.ensure("AAA", date(2020, 3, 2), date(2020, 4, 1))
+    assert store._manifest["AAA"] == {'start': date(2020, 3, 16).toordinal(), 'end': date(2020, 4, 1).toordinal()}
+    # the days before its first close are asked for again
+    store.ensure("AAA", date(2020, 3, 2), date(2020, 4, 1))
+    assert source.requests[-1] == (date(2020, 3, 2), date(2020, 3, 17))
+
+def test_extension_overlaps_one_stored_day(tmp_path, source):
+    store = PriceStore(str(tmp_path), source)
+    store.ensure("AAA", date(2020, 3, 2), date(2020, 4, 1))
+    store.ensure("AAA", date(2020, 2, 3), date(2020, 5, 1))
+    # the last stored close before 2020-04-01 is on Tuesday 2020-03-31
+    assert source.requests[1:] == [(date(2020, 2, 3), date(2020, 3, 3)), (date(2020, 3, 31), date(2020, 5, 1))]
+    assert stored(store, date(2020, 1, 1), date(2021, 1, 1)) == {day: close for day, close in source.closes.items()
+                                                                  if date(2020, 2, 3) <= day < date(2020, 5, 1)}
+
+def test_changed_adjustment_refetches_stored_closes(tmp_path, source):
+    store = PriceStore(str(tmp_path), source)
+    store.ensure("AAA", date(2020, 3, 2), date(2020, 4, 1))
+    # a 2:1 split on 2020-04-15 halves every adjusted close before it
+    split = date(2020, 4, 15)
+    source.closes = {day: close / 2 if day < split else close for day, close in source.closes.items()}
+    store.ensure("AAA", date(2020, 3, 2), date(2020, 5, 1))
+    assert source.requests[1:] == [(date(2020, 3, 31), date(2020, 5, 1)), (date(2020, 3, 2), date(2020, 5, 1))]
+    assert stored(store, date(2020, 1, 1), date(2021, 1, 1)) == {day: close for day, close in source.closes.items()
+                                                                  if date(2020, 3, 2) <= day < date(2020, 5, 1)}
+
+def test_source_must_implement_fetch():
+    class NoFetch(PriceSource):
+        pass
+    with pytest.raises(TypeError):
+        NoFetch()
+
+def test_default_store_per_config(config_path, tmp_path):
+    store = default_price_store(config_path)
+    assert store.directory == tmp_path / "cache" / "prices"
+    assert default_price_store(config_path) is store
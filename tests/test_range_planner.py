@@ -0,0 +1,100 @@
+import random
+from datetime import date, timedelta
+import pytest
+from range_planner import RangePlanner, RangeRequest, split_request
+from screener_query import ScreenerFilter
+
+PAGE_SIZE = 5
+
+def screener(rows: list, request: RangeRequest) -> list:
+    """The page the screener returns for a request: the rows filed in its range, PAGE_SIZE per page."""
+    selected = [row for row in rows if request.start_date <= row[0] <= request.end_date and request.ticker in ("", row[1])]
+    return selected[(request.page - 1) * PAGE_SIZE:request.page * PAGE_SIZE]
+
+def scrape_month(rows: list, tickers=None) -> tuple:
+    """Drive a planner through January 2024 and return the month's rows and every request made."""
+    planner = RangePlanner(PAGE_SIZE)
+    pending = planner.start_month(2024, 1, date(2024, 1, 1), date(2024, 1, 31), tickers)
+    made, data = [], None
+    while pending:
+        request = pending.pop(0)
+        made.append(request)
+        page = screener(rows, request)
+        follow_ups, done = planner.complete(request, len(page), set(page))
+        pending.extend(follow_ups)
+        if done is not None:
+            assert not pending and data is None
+            data = done
+    assert planner.open_months == 0
+    return data, made
+
+def test_page_below_the_limit_completes_the_month():
+    rows = [(date(2024, 1, day), "AAA", day) for day in (3, 9, 27)]
+    data, made = scrape_month(rows)
+    assert data == set(rows)
+    assert made == [RangeRequest(2024, 1, date(2024, 1, 1), date(2024, 1, 31))]
+
+def test_full_page_is_split_into_halves():
+    planner = RangePlanner(PAGE_SIZE)
+    [request] = planner.start_month(2024, 1, date(2024, 1, 1), date(2024, 1, 31))
+    truncated = {(date(2024, 1, day), "AAA", day) for day in range(1, 6)}
+    follow_ups, data = planner.complete(request, PAGE_SIZE, truncated)
+    assert follow_ups == [RangeRequest(2024, 1, date(2024, 1, 1), date(2024, 1, 16)),
+                          RangeRequest(2024, 1, date(2024, 1, 17), date(2024, 1, 31))]
+    assert data is None
+
+    # the rows of the truncated page are not kept, the halves return them again
+    first, second = follow_ups
+    assert planner.complete(first, 1, {(date(2024, 1, 2), "AAA", 2)}) == ([], None)
+    assert planner.complete(second, 0, set()) == ([], {(date(2024, 1, 2), "AAA", 2)})
+
+@pytest.mark.parametrize("days", range(2, 32))
+def test_halves_cover_the_range_exactly(days):
+    request = RangeRequest(2024, 1, date(2024, 1, 1), date(2024, 1, days), ticker="AAA")
+    first, second = split_request(request)
+    assert (first.start_date, second.end_date) == (request.start_date, request.end_date)
+    assert second.start_date == first.end_date + timedelta(days=1)
+    assert 0 <= first.days - second.days <= 1
+    assert (first.page, second.page, first.ticker, second.ticker) == (1, 1, "AAA", "AAA")
+
+def test_full_single_day_is_paged():
+    request = RangeRequest(2024, 1, date(2024, 1, 5), date(2024, 1, 5), page=2, ticker="AAA")
+    assert split_request(request) == [RangeRequest(2024, 1, date(2024, 1, 5), date(2024, 1, 5), page=3, ticker="AAA")]
+
+def test_pages_of_a_day_keep_the_server_side_filter():
+    screener_filter = ScreenerFilter(("P",), 10)
+    request = RangeRequest(2024, 1, date(2024, 1, 1), date(2024, 1, 5), screener_filter=screener_filter)
+    # halves pick their own filter, the next page of a day has to line up with the first one
+    assert [half.screener_filter for half in split_request(request)] == [None, None]
+    day = RangeRequest(2024, 1, date(2024, 1, 5), date(2024, 1, 5), screener_filter=screener_filter)
+    assert split_request(day)[0].screener_filter == screener_filter
+
+def test_busy_day_keeps_every_page():
+    busy = [(date(2024, 1, 10), "AAA", number) for number in range(2 * PAGE_SIZE + 2)]
+    data, made = scrape_month(busy)
+    assert data == set(busy)
+    assert [request.page for request in made if request.days == 1 and request.start_date.day == 10] == [1, 2, 3]
+
+def test_day_ending_on_a_full_page_is_closed_by_an_empty_one():
+    busy = [(date(2024, 1, 31), "AAA", number) for number in range(2 * PAGE_SIZE)]
+    data, made = scrape_month(busy)
+    assert data == set(busy)
+    # the last day of the range is reached by splitting, its third page comes back empty
+    assert [(request.start_date, request.page) for request in made if request.days == 1] == [
+        (date(2024, 1, 31), 1), (date(2024, 1, 31), 2), (date(2024, 1, 31), 3)]
+    assert made[-1].end_date == date(2024, 1, 31)
+
+def test_month_completes_after_every_ticker_query():
+    rows = [(date(2024, 1, day), ticker, day) for day in range(1, 29, 3) for ticker in ("AAA", "BBB")]
+    data, made = scrape_month(rows, ["AAA", "BBB"])
+    assert data == set(rows)
+    assert {request.ticker for request in made} == {"AAA", "BBB"}
+
+@pytest.mark.parametrize("seed", range(20))
+def test_random_months_are_scraped_completely(seed):
+    rng = random.Random(seed)
+    # a few quiet days and some busy ones, up to several pages on one day
+    weights = [rng.choice([0, 1, 1, 3, 20]) for _ in range(31)]
+    rows = [(date(2024, 1, rng.choices(range(1, 32), weights)[0]), "AAA", number) for number in range(rng.randint(0, 80))]
+    data, _ = scrape_month(rows)
+    assert data == set(rows)
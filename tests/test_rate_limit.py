@@ -0,0 +1,109 @@
+import asyncio
+import threading
+import time
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+import pytest
+import retry.api
+from async_fetcher import AsyncFetcher
+from openinsider_scraper import OpenInsiderScraper
+from range_planner import RangeRequest
+from rate_limit import TokenBucket
+
+RATE = 10
+# The server answers 429 to requests closer together than this, half of 1 / RATE to allow for scheduling jitter
+MIN_INTERVAL = 0.5 / RATE
+
+class ThrottlingServer(ThreadingHTTPServer):
+    """
+    Local stand-in for the screener that fails the first request of every path and throttles clients that go
+    too fast. A failure either drops the connection or answers 503.
+    """
+    def __init__(self, failure: str):
+        super().__init__(("127.0.0.1", 0), ThrottlingHandler)
+        self.failure = failure
+        self.lock = threading.Lock()
+        self.arrivals = []
+        self.seen = set()
+        self.throttled = 0
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+class ThrottlingHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            now = time.monotonic()
+            too_fast = bool(server.arrivals) and now - server.arrivals[-1] < MIN_INTERVAL
+            server.arrivals.append(now)
+            first_attempt = self.path not in server.seen
+            server.seen.add(self.path)
+            server.throttled += too_fast
+        if too_fast:
+            self.send_response(429)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+        elif first_attempt and self.server.failure == "drop":
+            self.close_connection = True
+        elif first_attempt:
+            self.send_response(503)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+        else:
+            body = f"<html>{self.path}</html>".encode()
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+@pytest.fixture
+def serve():
+    servers = []
+
+    def start(failure: str) -> ThrottlingServer:
+        server = ThrottlingServer(failure)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+def test_thread_engine_retries_take_tokens(serve, config_path, monkeypatch):
+    # requests raises on the dropped connection, which is what @retry retries
+    server = serve("drop")
+    # Without the backoff delay a retry follows its failed attempt immediately unless it waits for a token
+    monkeypatch.setattr(retry.api, "time", SimpleNamespace(sleep=lambda seconds: None))
+    scraper = OpenInsiderScraper(config_path)
+    scraper.raw_cache = None
+    scraper.rate_limiter = TokenBucket(RATE, capacity=1)
+    monkeypatch.setattr(scraper, "_build_url", lambda request: f"{server.url}/page{request.page}")
+
+    requests = [RangeRequest(2024, 1, date(2024, 1, 1), date(2024, 1, 31), page) for page in range(1, 6)]
+    pages = [scraper._fetch_page(request) for request in requests]
+    scraper.session_pool.close()
+
+    assert pages == [f"<html>/page{page}</html>".encode() for page in range(1, 6)]
+    assert len(server.arrivals) == 10
+    assert server.throttled == 0
+
+def test_async_engine_retries_take_tokens(serve):
+    # AsyncFetcher retries 503 answers itself
+    server = serve("503")
+
+    async def fetch_all():
+        async with AsyncFetcher(concurrency=4, rate_limiter=TokenBucket(RATE, capacity=1), timeout=5, retries=3, delay=0) as fetcher:
+            return await asyncio.gather(*(fetcher.get(f"{server.url}/page{page}") for page in range(1, 6)))
+
+    results = asyncio.run(fetch_all())
+    assert [result.status_code for result in results] == [200] * 5
+    assert len(server.arrivals) == 10
+    assert server.throttled == 0
@@ -0,0 +1,80 @@
+import json
+import random
+import raw_cache
+from raw_cache import RawResponseCache
+
+MB = 1024 * 1024
+
+def page(seed: int) -> str:
+    """A page that gzip can't shrink much, so every blob has about the same size."""
+    rng = random.Random(seed)
+    return "".join(rng.choice("0123456789abcdef") for _ in range(4000))
+
+def blob_size(tmp_path) -> int:
+    probe = RawResponseCache(str(tmp_path / "probe"), 1)
+    probe.put("probe", page(0))
+    return probe.total_size()
+
+def test_least_recently_used_urls_are_evicted(tmp_path):
+    # room for two pages, not three
+    cache = RawResponseCache(str(tmp_path / "raw"), blob_size(tmp_path) * 2.5 / MB)
+    cache.put("a", page(1))
+    cache.put("b", page(2))
+    assert cache.get("a") == page(1)
+    cache.put("c", page(3))
+    assert (cache.get("a"), cache.get("b"), cache.get("c")) == (page(1), None, page(3))
+    assert len(list(cache.blob_dir.iterdir())) == 2
+
+def test_shared_blob_is_kept_while_a_url_refers_to_it(tmp_path):
+    cache = RawResponseCache(str(tmp_path / "raw"), blob_size(tmp_path) * 2.5 / MB)
+    cache.put("a", page(1))
+    cache.put("b", page(1))
+    cache.put("c", page(2))
+    assert cache.total_size() <= cache.max_size
+    cache.get("a")
+    cache.put("d", page(3))
+    # evicting b doesn't delete the blob a still refers to
+    assert (cache.get("a"), cache.get("b"), cache.get("c"), cache.get("d")) == (page(1), None, None, page(3))
+
+def test_max_age(tmp_path):
+    cache = RawResponseCache(str(tmp_path / "raw"), 1)
+    cache.put("a", page(1))
+    assert cache.get("a", max_age=60) == page(1)
+    cache._manifest[cache.url_key("a")]['fetched_at'] -= 120
+    assert cache.get("a", max_age=60) is None
+    # an expired page is still there for conditional requests and reparsing
+    assert cache.get("a") == page(1)
+    cache.touch("a")
+    assert cache.get("a", max_age=60) == page(1)
+
+def test_missing_blob_drops_the_entry(tmp_path):
+    cache = RawResponseCache(str(tmp_path / "raw"), 1)
+    cache.put("a", page(1), etag='"v1"')
+    for path in cache.blob_dir.iterdir():
+        path.unlink()
+    assert cache.get("a") is None
+    assert cache.entry("a") is None
+
+def test_manifest_is_saved_in_batches(tmp_path, monkeypatch):
+    monkeypatch.setattr(raw_cache, "MANIFEST_SAVE_INTERVAL", 3)
+    cache = RawResponseCache(str(tmp_path / "raw"), 1)
+    cache.put("a", page(1))
+    cache.put("b", page(2))
+    assert not cache.manifest_path.exists()
+    cache.put("c", page(3))
+    with open(cache.manifest_path, 'r') as f:
+        assert len(json.load(f)) == 3
+    cache.put("d", page(4), etag='"v4"')
+    cache.save()
+    reopened = RawResponseCache(str(tmp_path / "raw"), 1)
+    assert reopened.get("d") == page(4) and reopened.entry("d")['etag'] == '"v4"'
+
+def test_blobs_of_an_unsaved_manifest_are_removed(tmp_path):
+    cache = RawResponseCache(str(tmp_path / "raw"), 1)
+    cache.put("a", page(1))
+    cache.save()
+    # stops before the next save
+    cache.put("b", page(2))
+    reopened = RawResponseCache(str(tmp_path / "raw"), 1)
+    assert reopened.entries()[0]['url'] == "a" and len(reopened.entries()) == 1
+    assert [path.name for path in reopened.blob_dir.iterdir()] == [f"{reopened.entries()[0]['content_hash']}.html.gz"]
@@ -0,0 +1,118 @@
+import json
+import sqlite3
+from datetime import date, timedelta
+from pathlib import Path
+import pytest
+import yaml
+import cleaner
+import scorer
+from benchmarks.synthetic import FIELD_NAMES
+from database_handler import insider_trading_db_handler
+from scorer import create_watchlist_table, expire_watchlist, tickers_to_score
+
+HOUR = 60 * 60
+NOW = 1_700_000_000.0
+TTL_HOURS = 24
+
+@pytest.fixture
+def cur():
+    conn = sqlite3.connect(":memory:")
+    yield conn.cursor()
+    conn.close()
+
+def watchlist(cur) -> list:
+    cur.execute("SELECT id, ticker, score, signal_date, scored_at FROM watchlist_companies_gold ORDER BY id")
+    return cur.fetchall()
+
+def add(cur, ticker: str, signal_date, scored_at) -> None:
+    cur.execute("INSERT INTO watchlist_companies_gold (ticker, score, signal_date, scored_at) VALUES (?, 1.0, ?, ?)",
+                (ticker, signal_date, scored_at))
+
+def test_migration_of_a_legacy_watchlist(cur):
+    # the watchlist before the incremental refresh: no signal_date or scored_at, a row per scoring run
+    cur.execute(""" CREATE TABLE "watchlist_companies_gold" (
+                        "id" INTEGER NOT NULL UNIQUE, "ticker" TEXT, "score" REAL, "timestamp" TEXT,
+                        PRIMARY KEY("id" AUTOINCREMENT))""")
+    cur.executemany("INSERT INTO watchlist_companies_gold (ticker, score, timestamp) VALUES (?, ?, ?)", [
+        ("AAA", 1.0, "2024-01-01"), ("BBB", 2.0, "2024-01-01"), ("AAA", 3.0, "2024-01-02"), ("AAA", 4.0, "2024-01-03"),
+    ])
+    create_watchlist_table(cur)
+    # the latest row of every ticker is kept
+    assert watchlist(cur) == [(2, "BBB", 2.0, None, None), (4, "AAA", 4.0, None, None)]
+    with pytest.raises(sqlite3.IntegrityError):
+        add(cur, "AAA", 0, 0)
+
+    # running it again changes nothing
+    create_watchlist_table(cur)
+    assert watchlist(cur) == [(2, "BBB", 2.0, None, None), (4, "AAA", 4.0, None, None)]
+
+def test_new_watchlist(cur):
+    create_watchlist_table(cur)
+    cur.execute("SELECT name FROM pragma_table_info('watchlist_companies_gold')")
+    assert [row[0] for row in cur.fetchall()] == ["id", "ticker", "score", "timestamp", "signal_date", "scored_at"]
+
+def test_due_tickers(cur):
+    create_watchlist_table(cur)
+    signal = int(NOW) - 10 * 24 * HOUR
+    add(cur, "FRESH", signal, NOW - HOUR)
+    add(cur, "NEWER", signal, NOW - HOUR)
+    add(cur, "STALE", signal, NOW - TTL_HOURS * HOUR)
+    add(cur, "LEGACY", None, None)
+    add(cur, "UNSCORED", signal, None)
+    add(cur, "OLDER", signal, NOW - HOUR)
+    signals = [("FRESH", signal), ("NEWER", signal + 1), ("STALE", signal), ("LEGACY", signal), ("UNSCORED", signal),
+               ("OLDER", signal - 1), ("NEW", signal)]
+    assert tickers_to_score(cur, signals, TTL_HOURS, NOW) == {
+        "NEWER": signal + 1, "STALE": signal, "LEGACY": signal, "UNSCORED": signal, "NEW": signal,
+    }
+    # a score just inside its TTL is still fresh
+    assert tickers_to_score(cur, [("STALE", signal)], TTL_HOURS + 0.01, NOW) == {}
+    # watchlist tickers without a current signal are not scored
+    assert tickers_to_score(cur, [], TTL_HOURS, NOW) == {}
+
+def test_lookback_expiry(cur):
+    create_watchlist_table(cur)
+    cutoff = int(NOW) - 90 * 24 * HOUR
+    add(cur, "OLD", cutoff - 1, NOW)
+    add(cur, "EDGE", cutoff, NOW)
+    add(cur, "RECENT", cutoff + 24 * HOUR, NOW)
+    add(cur, "LEGACY", None, NOW)
+    assert expire_watchlist(cur, cutoff) == 2
+    assert [row[1] for row in watchlist(cur)] == ["EDGE", "RECENT"]
+    # an expired ticker whose signal comes back is scored as new
+    assert tickers_to_score(cur, [("OLD", cutoff + 1)], TTL_HOURS, NOW) == {"OLD": cutoff + 1}
+
+def test_main_uses_the_stores_and_rules_of_its_config(config_path, tmp_path, monkeypatch):
+    # a config outside the working directory, with its own fundamentals fixtures and rules next to it
+    config_dir = Path(config_path).parent
+    fixtures = config_dir / "fundamentals"
+    fixtures.mkdir()
+    (fixtures / "AAA.json").write_text(json.dumps({"info": {"grossMargins": 0.4}}))
+    (config_dir / "rules.yaml").write_text(yaml.safe_dump({"fundamentals": {
+        "total": {"min": 0, "max": 100, "round": 2},
+        "rules": [{"name": "gross_margin", "metric": "gross_margin", "type": "linear", "weight": 10, "zero_at": 0, "full_at": 1}],
+    }}))
+    with open(config_path, 'r') as f:
+        config = yaml.safe_load(f)
+    config['fundamentals'].update(provider="fixture", fixture_directory=str(fixtures))
+    config['scoring']['rules_file'] = "rules.yaml"
+    with open(config_path, 'w') as f:
+        yaml.safe_dump(config, f)
+
+    # the CEO and the CFO of AAA bought last week
+    handler = insider_trading_db_handler("transactions_bronze", config['database']['file'])
+    for number, (insider, title) in enumerate([("Alice", "CEO"), ("Bob", "CFO")]):
+        trade_date = date.today() - timedelta(days=7 - number)
+        handler.write_many(FIELD_NAMES, [("", f"{trade_date} 16:00:00", str(trade_date), "AAA", "AAA Inc", insider, title,
+                                          "P - Purchase", 10.0, 10_000.0, 20_000.0, 100.0, 100_000.0)])
+    handler.close()
+    elsewhere = tmp_path / "elsewhere"
+    elsewhere.mkdir()
+    monkeypatch.chdir(elsewhere)
+
+    cleaner.main(config_path=config_path)
+    scorer.main(config_path)
+    conn = sqlite3.connect(config['database']['file'])
+    assert conn.execute("SELECT ticker, score FROM watchlist_companies_gold").fetchall() == [("AAA", 4.0)]
+    conn.close()
+    assert (tmp_path / "cache" / "fundamentals.db").exists() and list(elsewhere.iterdir()) == []
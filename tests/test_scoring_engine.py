@@ -0,0 +1,107 @@
+import math
+import numpy as np
+import pandas as pd
+import pytest
+from scoring_engine import load_models, score_metrics
+from conftest import REPO_DIR
+
+# The scoring code scorer2.score_stock and multi_scorer.score_stocks had before the models moved to
+# scoring_rules.yaml, kept verbatim as the reference the models have to reproduce.
+
+def legacy_fundamentals_score(metrics: dict) -> float:
+    score_components = []
+    for key in ["gross_margin", "operating_margin", "net_margin", "roe", "roa"]:
+        val = metrics.get(key, 0)
+        if np.isnan(val):
+            val = 0
+        val = max(0, min(val, 0.5)) / 0.5
+        score_components.append(val * 6)
+    for key in ["revenue_growth", "eps_growth"]:
+        val = metrics.get(key, 0)
+        if np.isnan(val):
+            val = 0
+        val = max(0, min(val, 0.3)) / 0.3
+        score_components.append(val * 10)
+    de = metrics.get("de_ratio", np.nan)
+    if np.isnan(de):
+        de_score = 0.5
+    else:
+        de_score = max(0, min(2, 2 - de)) / 2
+    score_components.append(de_score * 10)
+    cr = metrics.get("current_ratio", np.nan)
+    if np.isnan(cr):
+        cr_score = 0.5
+    else:
+        cr_score = max(0, min(3, cr)) / 3
+    score_components.append(cr_score * 10)
+    pe = metrics.get("pe_ratio", np.nan)
+    if np.isnan(pe) or pe <= 0:
+        pe_score = 0.5
+    else:
+        pe_score = max(0, min(50, 50 - pe)) / 50
+    score_components.append(pe_score * 15)
+    pb = metrics.get("pb_ratio", np.nan)
+    if np.isnan(pb) or pb <= 0:
+        pb_score = 0.5
+    else:
+        pb_score = max(0, min(10, 10 - pb)) / 10
+    score_components.append(pb_score * 15)
+    total_score = sum(score_components)
+    total_score = max(0, min(100, total_score))
+    return round(total_score, 2)
+
+def legacy_multi_score(metrics: dict) -> int:
+    score = 0
+    if metrics["profit_margin"] is not None:
+        if metrics["profit_margin"] > 0.1: score += 20
+        elif metrics["profit_margin"] > 0: score += 10
+    if metrics["revenue_growth"] is not None:
+        if metrics["revenue_growth"] > 0.1: score += 25
+        elif metrics["revenue_growth"] > 0.05: score += 15
+    if metrics["de_ratio"] is not None:
+        if metrics["de_ratio"] < 1: score += 20
+        elif metrics["de_ratio"] < 2: score += 10
+    if metrics["pe_ratio"] is not None:
+        if 5 <= metrics["pe_ratio"] <= 25: score += 20
+        elif 0 < metrics["pe_ratio"] <= 40: score += 10
+    return min(score, 100)
+
+FUNDAMENTAL_METRICS = ["gross_margin", "operating_margin", "net_margin", "roe", "roa", "revenue_growth",
+                       "eps_growth", "de_ratio", "current_ratio", "pe_ratio", "pb_ratio"]
+MULTI_METRICS = ["profit_margin", "revenue_growth", "de_ratio", "pe_ratio"]
+
+# Missing values, the caps and breakpoints of every rule and either side of them
+EDGE_VALUES = [np.nan, -1.0, -0.01, 0.0, 0.01, 0.05, 0.1, 0.3, 0.5, 0.75, 1.0, 1.99, 2.0, 3.0, 4.0, 5.0,
+               10.0, 25.0, 40.0, 50.0, 60.0]
+
+@pytest.fixture(scope="module")
+def models():
+    return load_models(str(REPO_DIR / "scoring_rules.yaml"))
+
+def metrics_table(columns: list, missing) -> pd.DataFrame:
+    # every edge value in every column, shifted per column so the rows mix them, then random rows
+    rows = [[EDGE_VALUES[(i + 7 * k) % len(EDGE_VALUES)] for k in range(len(columns))] for i in range(len(EDGE_VALUES))]
+    rng = np.random.default_rng(0)
+    random_rows = rng.choice(np.array(EDGE_VALUES), size=(500, len(columns)))
+    # ratios live around 0-1, multiples around 0-60
+    uniform = rng.uniform(-1, 1, random_rows.shape) * rng.choice([1, 60], size=random_rows.shape)
+    random_rows = np.where(rng.random(random_rows.shape) < 0.8, uniform, random_rows)
+    rows += random_rows.tolist()
+    # rows of nothing but missing values and nothing but one value
+    rows += [[np.nan] * len(columns)] + [[value] * len(columns) for value in EDGE_VALUES]
+    table = pd.DataFrame(rows, columns=columns, index=[f"T{i}" for i in range(len(rows))])
+    return table.astype(object).where(table.notna(), missing)
+
+def test_fundamentals_matches_scorer2(models):
+    metrics = metrics_table(FUNDAMENTAL_METRICS, np.nan)
+    scores = score_metrics(metrics, models["fundamentals"])["score"]
+    for ticker, row in metrics.iterrows():
+        assert scores[ticker] == legacy_fundamentals_score(row.astype(float).to_dict()), ticker
+
+def test_multi_matches_multi_scorer(models):
+    # multi_scorer reports metrics it couldn't compute as None
+    metrics = metrics_table(MULTI_METRICS, None)
+    scores = score_metrics(metrics, models["multi"])["score"]
+    for ticker, row in metrics.iterrows():
+        legacy = legacy_multi_score(row.to_dict())
+        assert int(scores[ticker]) == legacy and not math.isnan(scores[ticker]), ticker
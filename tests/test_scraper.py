@@ -0,0 +1,236 @@
+import csv
+import hashlib
+import threading
+from datetime import date, datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+import pytest
+import yaml
+import screener_query
+from benchmarks.synthetic import generate_bronze_rows, screener_page
+from openinsider_scraper import OpenInsiderScraper
+from range_planner import RangeRequest
+from screener_query import TRADE_TYPE_PARAMS
+
+TODAY = date.today()
+# Three closed months and the open one
+FIRST_MONTH = (TODAY.replace(day=1) - timedelta(days=80)).replace(day=1)
+
+class ScreenerServer(ThreadingHTTPServer):
+    """
+    Local stand-in for the screener that applies the query of the request to a fixed set of rows. Pages carry
+    an ETag and a matching If-None-Match is answered with 304.
+    """
+    def __init__(self, rows):
+        super().__init__(("127.0.0.1", 0), ScreenerHandler)
+        self.rows = sorted(rows, key=lambda row: row[1], reverse=True)
+        self.lock = threading.Lock()
+        self.requests = []
+        self.not_modified = []
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/screener"
+
+    def select(self, query: dict) -> list:
+        start, end = (datetime.strptime(day.strip(), "%m/%d/%Y").date() for day in query['fdr'][0].split(" - "))
+        codes = [code for code, param in TRADE_TYPE_PARAMS.items() if query.get(param) == ["1"]]
+        value_min = float(query['vl'][0]) * 1000 if query.get('vl') else None
+        ticker = query.get('s', [""])[0]
+        selected = [
+            row for row in self.rows
+            if start <= date.fromisoformat(row[1][:10]) <= end and row[7].split(" - ")[0] in codes
+            and (value_min is None or row[12] >= value_min) and (not ticker or row[3] == ticker)
+        ]
+        page, count = int(query['page'][0]), int(query['cnt'][0])
+        return selected[(page - 1) * count:page * count]
+
+class ScreenerHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        with self.server.lock:
+            self.server.requests.append(self.path)
+        body = screener_page(self.server.select(parse_qs(urlsplit(self.path).query))).encode()
+        etag = f'"{hashlib.sha1(body).hexdigest()}"'
+        if self.headers.get("If-None-Match") == etag:
+            with self.server.lock:
+                self.server.not_modified.append(self.path)
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+@pytest.fixture
+def screener(monkeypatch):
+    rows = next(generate_bronze_rows(400, seed=3, start=FIRST_MONTH, end=TODAY))
+    server = ScreenerServer(rows)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setattr(screener_query, "SCREENER_URL", server.url)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def update_config(config_path: str, section: str, **values) -> None:
+    with open(config_path, 'r') as f:
+        config = yaml.safe_load(f)
+    config[section].update(values)
+    with open(config_path, 'w') as f:
+        yaml.safe_dump(config, f)
+
+@pytest.fixture
+def scraper_config(config_path) -> str:
+    update_config(config_path, 'scraping', start_year=FIRST_MONTH.year, start_month=FIRST_MONTH.month,
+                  requests_per_second=0, parse_workers=1, max_workers=4)
+    return config_path
+
+def run(config_path: str, engine: str = "threads") -> OpenInsiderScraper:
+    scraper = OpenInsiderScraper(config_path)
+    scraper.scrape_async() if engine == "async" else scraper.scrape()
+    return scraper
+
+def exported(scraper: OpenInsiderScraper) -> set:
+    path = f"{scraper.config.output_dir}/{scraper.config.output_file}"
+    with open(path, 'r', newline='') as f:
+        return {(row['ticker'], row['insider_name'], row['filing_date'], float(row['value'])) for row in csv.DictReader(f)}
+
+def served(server: ScreenerServer, trade_types=("P", "S"), min_value: float = 0) -> set:
+    """Rows the scraper keeps with the given filters, sales have negative values and never pass min_value."""
+    return {(row[3], row[5], row[1], row[12]) for row in server.rows
+            if row[7][0] in trade_types and row[12] >= min_value and row[9] >= 0}
+
+@pytest.mark.parametrize("engine", ["threads", "async"])
+def test_incremental_run_keeps_the_whole_export(screener, scraper_config, engine):
+    update_config(scraper_config, 'cache', enabled=False, raw_enabled=False)
+    scraper = run(scraper_config, engine)
+    first_requests = len(screener.requests)
+    assert exported(scraper) == served(screener)
+
+    # the second run only fetches the open month, the output still holds every month
+    scraper = run(scraper_config, engine)
+    assert len(screener.requests) - first_requests == 1
+    assert exported(scraper) == served(screener)
+
+def test_changed_filters_refetch_final_months(screener, scraper_config):
+    update_config(scraper_config, 'cache', enabled=False, raw_enabled=False)
+    update_config(scraper_config, 'filters', min_transaction_value=100_000)
+    scraper = run(scraper_config)
+    assert exported(scraper) == served(screener, min_value=100_000)
+
+    # months that were final under the narrower filter are fetched again with the new one
+    update_config(scraper_config, 'filters', min_transaction_value=0)
+    requests_before = len(screener.requests)
+    scraper = run(scraper_config)
+    assert len(screener.requests) - requests_before == 4
+    assert exported(scraper) == served(screener)
+
+def test_async_engine_writes_the_cache_off_the_event_loop(screener, scraper_config, monkeypatch):
+    scraper = OpenInsiderScraper(scraper_config)
+    put, threads = scraper.raw_cache.put, set()
+
+    def recording_put(*args, **kwargs):
+        threads.add(threading.current_thread())
+        return put(*args, **kwargs)
+
+    monkeypatch.setattr(scraper.raw_cache, "put", recording_put)
+    scraper.scrape_async()
+    assert len(threads) > 0 and threading.main_thread() not in threads
+    assert exported(scraper) == served(screener)
+
+def test_narrower_filters_reuse_cached_pages(screener, scraper_config):
+    # bronze is rebuilt by every run, so the export shows what the pages of this run hold
+    update_config(scraper_config, 'cache', enabled=False)
+    update_config(scraper_config, 'scraping', incremental=False)
+    run(scraper_config)
+    requests_before = len(screener.requests)
+
+    # purchases above $100k are all on the cached pages of purchases and sales of any value
+    update_config(scraper_config, 'filters', min_transaction_value=100_000, transaction_types=["P"])
+    scraper = run(scraper_config)
+    assert len(screener.requests) == requests_before
+    assert exported(scraper) == served(screener, trade_types=("P",), min_value=100_000)
+
+    # wider filters than any cached page are fetched, and recorded with the pages
+    update_config(scraper_config, 'filters', min_transaction_value=0, transaction_types=["P", "S", "A"])
+    scraper = run(scraper_config)
+    assert len(screener.requests) - requests_before == 4
+    assert all("&xa=1&" in path for path in screener.requests[requests_before:])
+    recorded = {tuple(entry['meta']['screener_filter']['trade_types']) for entry in scraper.raw_cache.entries()}
+    assert recorded == {("P", "S"), ("P", "S", "A")}
+
+def test_reparse_warns_about_pages_with_narrower_filters(screener, scraper_config, caplog):
+    update_config(scraper_config, 'cache', enabled=False)
+    update_config(scraper_config, 'filters', min_transaction_value=100_000)
+    run(scraper_config)
+
+    update_config(scraper_config, 'filters', min_transaction_value=200_000)
+    OpenInsiderScraper(scraper_config).reparse_from_cache()
+    assert "narrower server-side filters" not in caplog.text
+
+    update_config(scraper_config, 'filters', min_transaction_value=0)
+    OpenInsiderScraper(scraper_config).reparse_from_cache()
+    assert "4 cached pages were fetched with narrower server-side filters" in caplog.text
+
+def test_pages_fetched_before_their_month_closed_expire(scraper_config):
+    scraper = OpenInsiderScraper(scraper_config)
+    end = FIRST_MONTH.replace(day=28)
+    request = RangeRequest(FIRST_MONTH.year, FIRST_MONTH.month, FIRST_MONTH, end)
+    url = scraper._build_url(request)
+    scraper.raw_cache.put(url, "<html></html>")
+    entry = scraper.raw_cache._manifest[scraper.raw_cache.url_key(url)]
+    closed_at = scraper._month_closed_at(request.year, request.month).timestamp()
+
+    # fetched after the month closed: final, whatever cache max_age says
+    entry['fetched_at'] = closed_at + 1
+    assert scraper._get_cached_page(request, url) == "<html></html>"
+    entry['fetched_at'] = closed_at - 1
+    assert scraper._get_cached_page(request, url) is None
+
+    # the open month expires after cache max_age
+    open_request = RangeRequest(TODAY.year, TODAY.month, TODAY.replace(day=1), TODAY)
+    open_url = scraper._build_url(open_request)
+    scraper.raw_cache.put(open_url, "<html></html>")
+    assert scraper._get_cached_page(open_request, open_url) == "<html></html>"
+    scraper.raw_cache._manifest[scraper.raw_cache.url_key(open_url)]['fetched_at'] -= scraper.config.cache_max_age * 3600
+    assert scraper._get_cached_page(open_request, open_url) is None
+
+@pytest.mark.parametrize("engine", ["threads", "async"])
+def test_unchanged_open_month_is_answered_with_304(screener, scraper_config, engine):
+    update_config(scraper_config, 'cache', enabled=False, max_age=0)
+    run(scraper_config, engine)
+    requests_before = len(screener.requests)
+
+    scraper = run(scraper_config, engine)
+    assert len(screener.requests) - requests_before == 1
+    assert screener.not_modified == screener.requests[-1:]
+    assert exported(scraper) == served(screener)
+
+@pytest.mark.parametrize("engine", ["threads", "async"])
+def test_304_after_eviction_downloads_the_page(screener, scraper_config, engine, monkeypatch):
+    update_config(scraper_config, 'cache', enabled=False, max_age=0)
+    run(scraper_config, engine)
+    requests_before = len(screener.requests)
+
+    scraper = OpenInsiderScraper(scraper_config)
+    conditional_headers = scraper._conditional_headers
+
+    def evicting_conditional_headers(url):
+        # the cached copy is evicted while the conditional request is on its way
+        headers = conditional_headers(url)
+        for path in scraper.raw_cache.blob_dir.iterdir():
+            path.unlink()
+        return headers
+
+    monkeypatch.setattr(scraper, "_conditional_headers", evicting_conditional_headers)
+    scraper.scrape_async() if engine == "async" else scraper.scrape()
+    open_month_url = screener.requests[-1]
+    assert screener.requests[requests_before:] == [open_month_url, open_month_url]
+    assert screener.not_modified == [open_month_url]
+    assert exported(scraper) == served(screener)
+    assert scraper.raw_cache.entry(screener.url.rsplit("/", 1)[0] + open_month_url) is not None
@@ -0,0 +1,30 @@
+from pathlib import Path
+import pytest
+from screener_parser import lxml_html, parse_rows
+
+FIXTURE_DIR = Path(__file__).parent / "fixtures" / "screener"
+PAGES = sorted(FIXTURE_DIR.glob("*.html"))
+N_FIELDS = 13
+
+pytestmark = pytest.mark.skipif(lxml_html is None, reason="lxml is not installed")
+
+def _page(name: str) -> str:
+    return (FIXTURE_DIR / name).read_text(encoding='utf-8')
+
+@pytest.mark.parametrize("path", PAGES, ids=lambda path: path.stem)
+def test_lxml_matches_bs4(path):
+    page = path.read_text(encoding='utf-8')
+    assert parse_rows(page, N_FIELDS, "lxml") == parse_rows(page, N_FIELDS, "bs4")
+
+def test_page_without_table():
+    page = _page("no_results.html")
+    assert parse_rows(page, N_FIELDS, "lxml") is None
+    assert parse_rows(page, N_FIELDS, "bs4") is None
+
+def test_rows_are_parsed():
+    # guards against both backends agreeing on an empty result
+    rows = parse_rows(_page("cluster_buys.html"), N_FIELDS, "lxml")
+    assert len(rows) == 8
+    assert rows[1] == ["", "2024-01-31 16:02:10", "2024-01-29", "KRUS", "Kura Sushi USA, Inc.", "Kaneko Shintaro", "Dir",
+                       "P - Purchase", "$77.95", "+1,000", "1,000", "New", "+$77,950"]
+    assert rows[7][4] == "Johnson & Johnson"
@@ -0,0 +1,34 @@
+from datetime import date
+from types import SimpleNamespace
+import pytest
+from screener_query import ScreenerFilter, build_screener_url
+
+def config(transaction_types=(), min_transaction_value=0):
+    return SimpleNamespace(transaction_types=list(transaction_types), min_transaction_value=min_transaction_value)
+
+def test_filter_from_config():
+    assert ScreenerFilter.from_config(config()) == ScreenerFilter(("P", "S"), None, "")
+    # codes in screener order, the value rounded down to $K, unknown types fall back to the default request
+    assert ScreenerFilter.from_config(config(["S - Sale", "P"], 12_345), "AAA") == ScreenerFilter(("P", "S"), 12, "AAA")
+    assert ScreenerFilter.from_config(config(["Z"], 999)) == ScreenerFilter(("P", "S"), None, "")
+
+@pytest.mark.parametrize("screener_filter", [
+    ScreenerFilter(), ScreenerFilter(("P",), 10, "BRK.B"), ScreenerFilter(("P", "S", "A", "M"), 0, ""),
+])
+def test_filter_survives_the_url_and_the_manifest(screener_filter):
+    url = build_screener_url(date(2024, 1, 1), date(2024, 1, 31), 2, 5000, screener_filter)
+    assert ScreenerFilter.from_url(url) == screener_filter
+    assert ScreenerFilter.from_dict(screener_filter.to_dict()) == screener_filter
+
+def test_url_of_the_default_filter():
+    url = build_screener_url(date(2024, 1, 1), date(2024, 1, 31), 1, 5000, ScreenerFilter())
+    assert "&xp=1&xs=1&vl=&" in url and url.endswith("&cnt=5000&page=1") and "fdr=01/01/2024+-+01/31/2024" in url
+
+@pytest.mark.parametrize("wider, narrower", [
+    (ScreenerFilter(("P", "S"), None, ""), ScreenerFilter(("P",), 10, "AAA")),
+    (ScreenerFilter(("P", "S"), 5, ""), ScreenerFilter(("S",), 10, "")),
+    (ScreenerFilter(("P",), 0, ""), ScreenerFilter(("P",), 0, "")),
+])
+def test_covers(wider, narrower):
+    assert wider.covers(narrower)
+    assert wider == narrower or not narrower.covers(wider)
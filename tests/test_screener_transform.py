@@ -0,0 +1,19 @@
+import numpy as np
+from screener_transform import NUMERIC_FIELDS, clean_batch
+
+FIELD_NAMES = ["X", "filing_date", "trade_date", "ticker", "company_name", "insider_name", "title", "trade_type",
+               "price", "quantity", "owned", "dOwnedPc", "value"]
+
+def row(price: str, quantity: str, owned: str, owned_change: str, value: str) -> list:
+    return ["", "2024-01-31 16:02:10", "2024-01-29", "AAA", "A Inc.", "Doe John", "Dir", "P - Purchase",
+            price, quantity, owned, owned_change, value]
+
+def test_fallback_matches_the_fast_path():
+    rows = [row("$78", "+1,000", "1,000", "New", "+$78,000"), row("$5", "+200", "1,200", "+20%", "+$1,000")]
+    fast = clean_batch(rows, FIELD_NAMES)
+    # a cell the CSV reader can't parse sends the whole page down the column-wise path
+    fallback = clean_batch(rows + [row("$1", "+1", "garbled", ">999%", "+$1")], FIELD_NAMES)
+    for field in NUMERIC_FIELDS:
+        assert fast[field].dtype == fallback[field].dtype == np.float64
+        assert fast[field].tolist() == fallback[field].tolist()[:2]
+    assert fallback["owned"].tolist()[2] == 0.0 and fallback["dOwnedPc"].tolist()[2] == 999.0
@@ -0,0 +1,171 @@
+import itertools
+import sqlite3
+from datetime import date, timedelta
+import numpy as np
+import pytest
+import cleaner
+from database_handler import insider_trading_db_handler
+from roles import ROLE_BITS
+from scorer import create_sql_query, create_stats_query, get_signals
+from signal_engine import SECONDS_PER_DAY, SWEEP_COLUMNS, build_purchases, cluster_buy_signals, load_purchases, sweep_signals
+
+FIELD_NAMES = ["X", "filing_date", "trade_date", "ticker", "company_name", "insider_name", "title", "trade_type",
+               "price", "quantity", "owned", "dOwnedPc", "value"]
+FIRST_DAY = date(2024, 1, 1)
+# Windows cleaner.py precomputes into company_window_stats for the fixture
+MATERIALIZED_WINDOWS = [1, 29.5, 30, 90]
+
+# (ticker, insider, title, trade type, day, value)
+TRADES = [
+    # the CFO buys exactly 30 days after the CEO, on the edge of a 30 day window
+    ("AAA", "Alice", "CEO", "P - Purchase", 0, 60_000),
+    ("AAA", "Bob", "CFO", "P - Purchase", 30, 10_000),
+    # one day past the edge
+    ("BBB", "Carol", "CEO", "P - Purchase", 0, 60_000),
+    ("BBB", "Dan", "CFO", "P - Purchase", 31, 60_000),
+    # one insider holding both roles buys repeatedly, a second insider joins on the edge of the last purchase's window
+    ("CCC", "Eve", "CEO, CFO", "P - Purchase", 0, 70_000),
+    ("CCC", "Eve", "CEO, CFO", "P - Purchase", 5, 70_000),
+    ("CCC", "Eve", "CEO, CFO", "P - Purchase", 10, 70_000),
+    ("CCC", "Frank", "Dir", "P - Purchase", 40, 20_000),
+    # repeat insiders whose early cluster stays at the value threshold, a later one passes it
+    ("DDD", "Gina", "Dir", "P - Purchase", 0, 5_000),
+    ("DDD", "Gina", "Dir", "P - Purchase", 3, 5_000),
+    ("DDD", "Hank", "Dir", "P - Purchase", 3, 5_000),
+    ("DDD", "Hank", "Dir", "P - Purchase", 20, 50_000),
+    ("DDD", "Ivy", "CEO", "P - Purchase", 60, 80_000),
+    ("DDD", "Gina", "Dir", "P - Purchase", 62, 1_000),
+    # sales never count
+    ("EEE", "Jack", "CEO", "S - Sale", 0, -90_000),
+    ("EEE", "Kim", "CFO", "S - Sale", 2, -90_000),
+    # two insiders on the same day, the later purchase is on its own
+    ("FFF", "Liam", "CFO", "P - Purchase", 100, 100_000),
+    ("FFF", "Mia", "CEO", "P - Purchase", 100, 1_000),
+    ("FFF", "Liam", "CFO", "P - Purchase", 200, 100_000),
+]
+
+@pytest.fixture(scope="module")
+def conn(tmp_path_factory):
+    db_file = str(tmp_path_factory.mktemp("signals") / "signals.db")
+    handler = insider_trading_db_handler("transactions_bronze", db_file)
+    rows = []
+    for number, (ticker, insider, title, trade_type, day, value) in enumerate(TRADES):
+        trade_date = FIRST_DAY + timedelta(days=day)
+        filing_date = f"{trade_date + timedelta(days=2)} 16:{number:02d}:00"
+        rows.append(("", filing_date, str(trade_date), ticker, f"{ticker} Inc", insider, title, trade_type,
+                     10.0, value / 10.0, 1_000.0 + number, 0.0, float(value)))
+    handler.write_many(FIELD_NAMES, rows)
+    handler.close()
+
+    conn = sqlite3.connect(db_file)
+    cleaner.update_gold(conn, True, MATERIALIZED_WINDOWS)
+    yield conn
+    conn.close()
+
+def _sql_signals(conn, *args):
+    return sorted(conn.execute(create_sql_query(*args)).fetchall())
+
+def _day(ticker_date):
+    ticker, trade_date = ticker_date
+    return ticker, (date.fromtimestamp(trade_date) - FIRST_DAY).days
+
+def test_default_signals(conn):
+    signals = cluster_buy_signals(load_purchases(conn))
+    assert [_day(signal) for signal in signals] == [("AAA", 30), ("CCC", 40), ("FFF", 100)]
+    assert signals == _sql_signals(conn)
+
+@pytest.mark.parametrize("requiredRoles, minimumInsiders, minimumInvestmentValue, slidingWindowDays", list(itertools.product(
+    [["CEO", "CFO"], [], ["Dir"], ["CEO"]], [1, 2, 3], [0, 50_000], [1, 29.5, 30, 31, 90],
+)))
+def test_matches_sql(conn, requiredRoles, minimumInsiders, minimumInvestmentValue, slidingWindowDays):
+    args = (requiredRoles, minimumInsiders, minimumInvestmentValue, slidingWindowDays)
+    assert cluster_buy_signals(load_purchases(conn), *args) == _sql_signals(conn, *args)
+
+@pytest.mark.parametrize("requiredRoles, minimumInsiders, minimumInvestmentValue, slidingWindowDays", list(itertools.product(
+    [["CEO", "CFO"], [], ["Dir"], ["CEO"]], [1, 2, 3], [0, 50_000], [1, 29.5, 30, 31, 90],
+)))
+def test_materialized_windows_match_sql(conn, requiredRoles, minimumInsiders, minimumInvestmentValue, slidingWindowDays):
+    args = (requiredRoles, minimumInsiders, minimumInvestmentValue, slidingWindowDays)
+    expected = _sql_signals(conn, *args)
+    if slidingWindowDays in MATERIALIZED_WINDOWS:
+        assert sorted(conn.execute(create_stats_query(*args)).fetchall()) == expected
+    # since keeps the companies whose latest signal is on or after it, from before, on and after every signal date
+    dates = sorted({signal_date for _, signal_date in _sql_signals(conn, [], 1, 0, slidingWindowDays)})
+    for since in [None, *(signal_date + shift for signal_date in dates for shift in (-1, 0, 1))]:
+        assert sorted(get_signals(conn, *args, since)) == [row for row in expected if since is None or row[1] >= since]
+
+SWEEP_GRID = {
+    "slidingWindowDays": [1, 7.5, 30, 90],
+    "minimumInsiders": [1, 2, 3, 5],
+    "minimumInvestmentValues": [0, 25_000, 100_000],
+    "requiredRoles": [[], ["CEO"], ["CEO", "CFO"], ["Dir"]],
+}
+
+def random_purchases(seed: int, companies: int = 40):
+    """Purchases of companies with one to 60 purchases each, a third of them with a single one."""
+    rng = np.random.default_rng(seed)
+    counts = np.where(rng.random(companies) < 1 / 3, 1, rng.integers(2, 60, companies))
+    company_id = np.repeat(np.arange(1, companies + 1) * 7, counts)
+    n = len(company_id)
+    # purchases on the same day and exactly a window length apart are common on the screener
+    trade_date = rng.integers(0, 200, n) * SECONDS_PER_DAY + rng.choice([0, 3600], n)
+    insider_id = company_id * 100 + rng.integers(0, 6, n)
+    bits = np.array(list(ROLE_BITS.values()))
+    roles_mask = np.array([int(np.bitwise_or.reduce(rng.choice(bits, rng.integers(0, 3), replace=False), initial=0)) for _ in range(n)])
+    value = rng.choice([1_000, 25_000, 60_000, 150_000], n).astype(np.float64)
+    tickers = {int(company): f"T{company:04d}" for company in np.unique(company_id)}
+    return build_purchases(company_id, trade_date, insider_id, roles_mask, value, tickers)
+
+def looped_signals(purchases, grid: dict) -> list:
+    """The rows of sweep_signals from one cluster_buy_signals call per combination, in the sweep's order."""
+    rows = []
+    for window, value, roles, insiders in itertools.product(grid["slidingWindowDays"], grid["minimumInvestmentValues"],
+                                                            grid["requiredRoles"], grid["minimumInsiders"]):
+        for ticker, signal_date in cluster_buy_signals(purchases, roles, insiders, value, window):
+            rows.append((window, insiders, value, ",".join(roles), ticker, signal_date))
+    return rows
+
+def swept(purchases, grid: dict, processes: int = 1) -> list:
+    frame = sweep_signals(purchases, grid["slidingWindowDays"], grid["minimumInsiders"], grid["minimumInvestmentValues"],
+                          grid["requiredRoles"], processes)
+    assert list(frame.columns) == SWEEP_COLUMNS
+    return [(window, int(insiders), value, roles, ticker, int(signal_date)) for window, insiders, value, roles, ticker, signal_date
+            in frame.itertuples(index=False)]
+
+@pytest.mark.parametrize("seed", range(3))
+def test_sweep_matches_cluster_buy_signals(seed):
+    purchases = random_purchases(seed)
+    expected = looped_signals(purchases, SWEEP_GRID)
+    assert len(expected) > 0
+    assert swept(purchases, SWEEP_GRID) == expected
+
+@pytest.mark.parametrize("processes", [2, 3, 64])
+def test_sweep_in_processes_matches_one(processes):
+    # 64 processes is more than there are companies, chunks are never empty
+    purchases = random_purchases(1)
+    assert swept(purchases, SWEEP_GRID, processes) == looped_signals(purchases, SWEEP_GRID)
+
+def test_sweep_of_single_purchases():
+    purchases = build_purchases(np.array([1, 2, 3]), np.array([0, SECONDS_PER_DAY, 0]), np.array([10, 11, 12]),
+                                np.array([ROLE_BITS["CEO"], 0, ROLE_BITS["CEO"] | ROLE_BITS["CFO"]]),
+                                np.array([60_000.0, 60_000.0, 10_000.0]), {1: "AAA", 2: "BBB", 3: "CCC"})
+    grid = {"slidingWindowDays": [30], "minimumInsiders": [1, 2], "minimumInvestmentValues": [0, 50_000],
+            "requiredRoles": [[], ["CEO"]]}
+    rows = swept(purchases, grid)
+    assert rows == looped_signals(purchases, grid)
+    # a lone purchase never has two insiders
+    assert all(insiders == 1 for _, insiders, *_ in rows)
+
+@pytest.mark.parametrize("empty", ["slidingWindowDays", "minimumInsiders", "minimumInvestmentValues", "requiredRoles"])
+def test_sweep_of_an_empty_grid(empty):
+    frame = sweep_signals(random_purchases(0), **{**SWEEP_GRID, empty: []})
+    assert frame.empty and list(frame.columns) == SWEEP_COLUMNS
+
+def test_sweep_matches_on_the_window_edges(conn):
+    purchases = load_purchases(conn)
+    assert swept(purchases, SWEEP_GRID) == looped_signals(purchases, SWEEP_GRID)
+
+def test_sweep_without_purchases():
+    purchases = random_purchases(0, companies=0)
+    assert swept(purchases, SWEEP_GRID) == []
+    assert swept(purchases, SWEEP_GRID, processes=2) == []